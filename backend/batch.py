@@ -0,0 +1,316 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, List
+from config import *
+from constants import *
+from cache import get_file_digest, make_cache_key
+from pipeline import check_generation_parameters, run_bpmn_generation_logic
+
+STATE_FILE_NAME = ".batch_state.json"
+REPORT_FILE_NAME = "batch_report.json"
+
+# the same defaults as the form fields of /generate_bpmn/
+DEFAULT_PARAMETERS = {
+    "role_field_name": "Resource",
+    "activity_field_name": "Activity",
+    "case_id_field_name": "Case ID",
+    "timestamp_field_name": "Start Timestamp",
+    "role_conflict_policy": DEFAULT_ROLE_CONFLICT_POLICY,
+    "lane_order": DEFAULT_LANE_ORDER,
+    "layout": DEFAULT_LAYOUT,
+    "timestamp_format": None,
+    "miner": DEFAULT_MINER,
+    "noise_threshold": DEFAULT_NOISE_THRESHOLD,
+    "max_variants": None,
+    "variant_coverage": None,
+    "sample": None,
+    "sample_seed": 0,
+}
+PARAMETER_TYPES = {
+    "timestamp_format": str,
+    "noise_threshold": float,
+    "max_variants": int,
+    "variant_coverage": float,
+    "sample": float,
+    "sample_seed": int,
+}
+COMPRESSED_EXTENSIONS = (".gz", ".zst")
+
+
+def get_output_name(log_path: str) -> str:
+    name = os.path.basename(log_path)
+    if name.endswith(COMPRESSED_EXTENSIONS):
+        name = os.path.splitext(name)[0]
+    return os.path.splitext(name)[0] + ".bpmn"
+
+
+def read_manifest(
+    manifest_path: str, parameters: Dict[str, Any]
+) -> List[Dict[str, Any]]:
+    # a JSON list of logs, each with its "path", optionally its "output" file name and any of
+    # the /generate_bpmn/ form fields; relative paths are relative to the manifest
+    with open(manifest_path) as manifest_file:
+        manifest = json.load(manifest_file)
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+
+    entries = []
+    for item in manifest:
+        item = dict(item)
+        log_path = os.path.join(base_dir, item.pop("path"))
+        output_name = item.pop("output", None) or get_output_name(log_path)
+        entries.append(
+            {
+                "log_path": log_path,
+                "output_name": output_name,
+                "parameters": {**parameters, **item},
+            }
+        )
+    return entries
+
+
+def read_directory(directory: str, parameters: Dict[str, Any]) -> List[Dict[str, Any]]:
+    # every file of the directory is a log, the format is detected from the content
+    return [
+        {
+            "log_path": os.path.join(directory, name),
+            "output_name": get_output_name(name),
+            "parameters": dict(parameters),
+        }
+        for name in sorted(os.listdir(directory))
+        if not name.startswith(".") and os.path.isfile(os.path.join(directory, name))
+    ]
+
+
+def coerce_parameter(name: str, value: Any) -> Any:
+    # manifests are written by hand, so numbers given as strings are accepted like the form
+    # fields of the API, anything else of the wrong type is an error
+    parameter_type = PARAMETER_TYPES.get(name, str)
+    if value is None and DEFAULT_PARAMETERS[name] is None:
+        return None
+    error = ValueError(f"{name} must be {parameter_type.__name__}, got {value!r}")
+    if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+        raise error
+    if parameter_type is str:
+        if not isinstance(value, str):
+            raise error
+        return value
+    if parameter_type is int and isinstance(value, float) and not value.is_integer():
+        raise error
+    try:
+        return parameter_type(value)
+    except ValueError:
+        raise error
+
+
+def get_entry_parameters(parameters: Dict[str, Any]) -> Dict[str, Any]:
+    unknown_parameters = set(parameters) - set(DEFAULT_PARAMETERS)
+    if unknown_parameters:
+        raise ValueError(f"unknown fields {sorted(unknown_parameters)}")
+    parameters = {
+        name: coerce_parameter(name, value) for name, value in parameters.items()
+    }
+    # the same checks as for the form fields of the API
+    check_generation_parameters(**parameters)
+    return parameters
+
+
+def validate_entries(entries: List[Dict[str, Any]]) -> List[str]:
+    # an entry with invalid fields keeps its error and is reported as failed in the batch
+    # report, only an output used twice stops the whole batch
+    errors = []
+    output_names = set()
+    for entry in entries:
+        try:
+            entry["parameters"] = get_entry_parameters(entry["parameters"])
+        except ValueError as e:
+            entry["error"] = str(e)
+        if entry["output_name"] in output_names:
+            errors.append(
+                f"{entry['log_path']}: output {entry['output_name']} is used twice, "
+                "set a different 'output' in the manifest"
+            )
+        output_names.add(entry["output_name"])
+    return errors
+
+
+def generate_diagram(
+    log_path: str, output_bpmn_path: str, parameters: Dict[str, Any]
+) -> Dict[str, Any]:
+    # runs in a worker process; failures are returned, so that one broken log does not stop the batch
+    start = time.perf_counter()
+    try:
+        report = run_bpmn_generation_logic(
+            log_path, output_bpmn_path=output_bpmn_path, **parameters
+        )
+    except Exception as e:
+        return {
+            "status": "failed",
+            "error": f"{type(e).__name__}: {e}",
+            "wall_seconds": time.perf_counter() - start,
+        }
+
+    result = {"status": "generated", "wall_seconds": time.perf_counter() - start}
+    if report is not None:
+        result["stages"] = {
+            stage["name"]: stage["wall_seconds"] for stage in report["stages"]
+        }
+        result["sizes"] = report["sizes"]
+    return result
+
+
+def load_state(output_dir: str) -> Dict[str, str]:
+    state_path = os.path.join(output_dir, STATE_FILE_NAME)
+    if not os.path.exists(state_path):
+        return {}
+    with open(state_path) as state_file:
+        return json.load(state_file)
+
+
+def write_json(path: str, content: Any) -> None:
+    # written next to the target and renamed, so an interrupted run never leaves half a file
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w") as output_file:
+        json.dump(content, output_file, indent=2)
+    os.replace(temp_path, path)
+
+
+def run_batch(
+    entries: List[Dict[str, Any]],
+    output_dir: str,
+    workers: int,
+    force: bool = False,
+) -> Dict[str, Any]:
+    os.makedirs(output_dir, exist_ok=True)
+    # the output of a log is only generated again when the log or its parameters changed
+    state = load_state(output_dir)
+    start = time.perf_counter()
+
+    results: Dict[str, Dict[str, Any]] = {}
+    keys: Dict[str, str] = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {}
+        for entry in entries:
+            output_name = entry["output_name"]
+            output_bpmn_path = os.path.join(output_dir, output_name)
+            results[output_name] = {"log_path": entry["log_path"]}
+            if "error" in entry:
+                results[output_name].update(status="failed", error=entry["error"])
+                state.pop(output_name, None)
+                print(
+                    f"ERROR: Invalid fields for {entry['log_path']}. Reason: {entry['error']}"
+                )
+                continue
+            try:
+                keys[output_name] = make_cache_key(
+                    get_file_digest(entry["log_path"]), **entry["parameters"]
+                )
+            except OSError as e:
+                results[output_name].update(status="failed", error=str(e))
+                print(f"ERROR: Failed to read {entry['log_path']}. Reason: {e}")
+                continue
+
+            if (
+                not force
+                and state.get(output_name) == keys[output_name]
+                and os.path.exists(output_bpmn_path)
+            ):
+                results[output_name]["status"] = "skipped"
+                continue
+
+            future = executor.submit(
+                generate_diagram,
+                entry["log_path"],
+                output_bpmn_path,
+                entry["parameters"],
+            )
+            futures[future] = output_name
+
+        for future in as_completed(futures):
+            output_name = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                # the worker itself failed, e.g. it was killed and broke the pool, which fails
+                # the logs still running in it but not the others
+                result = {"status": "failed", "error": f"{type(e).__name__}: {e}"}
+            results[output_name].update(result)
+            if result["status"] == "generated":
+                state[output_name] = keys[output_name]
+                print(
+                    f"INFO: Generated {output_name} in {result['wall_seconds']:.2f} s"
+                )
+            else:
+                state.pop(output_name, None)
+                print(
+                    f"ERROR: Failed to generate {output_name}. Reason: {result['error']}"
+                )
+
+    write_json(os.path.join(output_dir, STATE_FILE_NAME), state)
+
+    statuses = [result["status"] for result in results.values()]
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "workers": workers,
+        "wall_seconds": time.perf_counter() - start,
+        "generated": statuses.count("generated"),
+        "skipped": statuses.count("skipped"),
+        "failed": statuses.count("failed"),
+        "logs": results,
+    }
+    write_json(os.path.join(output_dir, REPORT_FILE_NAME), report)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Generates the BPMN diagrams of many event logs"
+    )
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--directory", help="directory with one event log per file")
+    source.add_argument(
+        "--manifest", help="JSON list of logs with their own field names"
+    )
+    parser.add_argument("--output-dir", required=True)
+    parser.add_argument("--workers", type=int, default=WORKER_PROCESSES)
+    parser.add_argument(
+        "--force", action="store_true", help="also regenerate unchanged logs"
+    )
+    for name, default in DEFAULT_PARAMETERS.items():
+        # the defaults of every log, a manifest can override them per log
+        parser.add_argument(
+            f"--{name.replace('_', '-')}",
+            dest=name,
+            default=default,
+            type=PARAMETER_TYPES.get(name, str),
+        )
+    args = parser.parse_args()
+
+    parameters = {name: getattr(args, name) for name in DEFAULT_PARAMETERS}
+    if args.directory is not None:
+        entries = read_directory(args.directory, parameters)
+    else:
+        entries = read_manifest(args.manifest, parameters)
+
+    errors = validate_entries(entries)
+    if errors:
+        for error in errors:
+            print(f"ERROR: {error}")
+        sys.exit(2)
+
+    report = run_batch(entries, args.output_dir, args.workers, force=args.force)
+    print(
+        f"INFO: {report['generated']} generated, {report['skipped']} skipped and "
+        f"{report['failed']} failed in {report['wall_seconds']:.2f} s, "
+        f"see {os.path.join(args.output_dir, REPORT_FILE_NAME)}"
+    )
+    if report["failed"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
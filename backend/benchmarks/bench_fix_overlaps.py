@@ -0,0 +1,90 @@
+import argparse
+import os
+import random
+import sys
+import time
+import xml.etree.ElementTree as ET
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from constants import *
+from bpmn_index import BpmnIndex
+from geometry import GeometryStore
+from pipeline import fix_overlaps
+
+
+def build_synthetic_plane(shape_count: int, seed: int = 0) -> ET.Element:
+    # shapes are dropped on lane rows, the same way fix_tasks aligns them, so that
+    # a realistic share of them ends up colliding with each other
+    rng = random.Random(seed)
+    lane_count = max(1, shape_count // 50)
+    root = ET.Element(f"{{{NS['bpmn']}}}definitions")
+    diagram = ET.SubElement(root, f"{{{NS['bpmndi']}}}BPMNDiagram")
+    plane = ET.SubElement(diagram, f"{{{NS['bpmndi']}}}BPMNPlane")
+    for i in range(shape_count):
+        shape = ET.SubElement(
+            plane,
+            f"{{{NS['bpmndi']}}}BPMNShape",
+            {"id": f"shape_{i}_gui", "bpmnElement": f"shape_{i}"},
+        )
+        lane = rng.randrange(lane_count)
+        ET.SubElement(
+            shape,
+            f"{{{NS['omgdc']}}}Bounds",
+            {
+                "x": str(float(rng.randrange(shape_count) * 120)),
+                "y": str(float(lane * LANE_HEIGHT + LANE_HEIGHT // 2 - 18)),
+                "width": "100.0",
+                "height": "60.0",
+            },
+        )
+    return root
+
+
+def count_candidate_pairs_naively(geometry: GeometryStore) -> int:
+    shapes = list(geometry.shapes.values())
+    pairs = 0
+    for shape in shapes:
+        for other_shape in shapes:
+            if shape is other_shape:
+                continue
+            if (
+                abs(shape.x - other_shape.x) < MAXIMUM_HORIZONTAL_DIFF_TO_FIX_LAYOUT
+                and abs(shape.y - other_shape.y) < MAXIMUM_VERTICAL_DIFF_TO_FIX_LAYOUT
+            ):
+                pairs += 1
+    return pairs // 2
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measures how fix_overlaps scales")
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[100, 500, 1000, 2500, 5000, 10000]
+    )
+    parser.add_argument(
+        "--naive-limit",
+        type=int,
+        default=2500,
+        help="largest size for which the old all-pairs comparison is timed as well",
+    )
+    args = parser.parse_args()
+
+    print(f"{'shapes':>8} {'fix_overlaps [ms]':>18} {'all pairs [ms]':>15}")
+    for size in args.sizes:
+        geometry = GeometryStore(BpmnIndex(build_synthetic_plane(size)))
+        start = time.perf_counter()
+        fix_overlaps(geometry)
+        grid_ms = (time.perf_counter() - start) * 1000
+
+        naive = "-"
+        if size <= args.naive_limit:
+            geometry = GeometryStore(BpmnIndex(build_synthetic_plane(size)))
+            start = time.perf_counter()
+            count_candidate_pairs_naively(geometry)
+            naive = f"{(time.perf_counter() - start) * 1000:.1f}"
+
+        print(f"{size:>8} {grid_ms:>18.1f} {naive:>15}")
+
+
+if __name__ == "__main__":
+    main()
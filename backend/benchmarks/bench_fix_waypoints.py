@@ -0,0 +1,66 @@
+import argparse
+import os
+import random
+import sys
+import time
+import xml.etree.ElementTree as ET
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from constants import *
+from bpmn_index import BpmnIndex
+from geometry import GeometryStore
+from pipeline import fix_waypoints
+from bench_fix_overlaps import build_synthetic_plane
+
+
+def add_synthetic_flows(root: ET.Element, shape_count: int, seed: int = 0) -> None:
+    # every shape gets two outgoing flows to shapes a few columns further, like in a mined model
+    rng = random.Random(seed)
+    process = ET.SubElement(root, f"{{{NS['bpmn']}}}process")
+    plane = root.find("bpmndi:BPMNDiagram/bpmndi:BPMNPlane", NS)
+    for i in range(shape_count):
+        for j in range(2):
+            flow_id = f"flow_{i}_{j}"
+            target = min(shape_count - 1, i + rng.randrange(1, 20))
+            ET.SubElement(
+                process,
+                f"{{{NS['bpmn']}}}sequenceFlow",
+                {
+                    "id": flow_id,
+                    "sourceRef": f"shape_{i}",
+                    "targetRef": f"shape_{target}",
+                },
+            )
+            edge = ET.SubElement(
+                plane,
+                f"{{{NS['bpmndi']}}}BPMNEdge",
+                {"id": f"{flow_id}_gui", "bpmnElement": flow_id},
+            )
+            for _ in range(2):
+                ET.SubElement(edge, f"{{{NS['ns6']}}}waypoint", {"x": "0", "y": "0"})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measures how fix_waypoints scales")
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[100, 500, 1000, 2500, 5000, 10000]
+    )
+    args = parser.parse_args()
+
+    print(f"{'flows':>8} {'fix_waypoints [ms]':>19} {'per flow [us]':>14}")
+    for size in args.sizes:
+        root = build_synthetic_plane(size)
+        add_synthetic_flows(root, size)
+        index = BpmnIndex(root)
+        geometry = GeometryStore(index)
+        start = time.perf_counter()
+        fix_waypoints(index, geometry)
+        elapsed = time.perf_counter() - start
+
+        flows = len(index.sequence_flows)
+        print(f"{flows:>8} {elapsed * 1000:>19.1f} {elapsed / flows * 1e6:>14.2f}")
+
+
+if __name__ == "__main__":
+    main()
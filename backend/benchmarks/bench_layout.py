@@ -0,0 +1,104 @@
+import argparse
+import os
+import sys
+import tempfile
+import xml.etree.ElementTree as ET
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from typing import Dict
+from constants import *
+from metrics import StageMetrics
+from bpmn_index import BpmnIndex
+from geometry import GeometryStore
+from pipeline import run_bpmn_generation_logic
+from generate_log import (
+    ACTIVITY_FIELD_NAME,
+    CASE_ID_FIELD_NAME,
+    ROLE_FIELD_NAME,
+    TIMESTAMP_FIELD_NAME,
+    add_generator_arguments,
+)
+from bench_pipeline import get_log_path
+
+
+def count_overlapping_shapes(bpmn_path: str) -> int:
+    # pairs of shapes whose bounds intersect, lanes left out; shapes are sorted by x so that
+    # only the ones that can still reach the current shape are compared
+    index = BpmnIndex(ET.parse(bpmn_path).getroot())
+    geometry = GeometryStore(index)
+    shapes = sorted(
+        (
+            shape
+            for name, shape in geometry.shapes.items()
+            if not name.startswith("Lane")
+        ),
+        key=lambda shape: shape.x,
+    )
+    overlaps = 0
+    for i, shape in enumerate(shapes):
+        for other_shape in shapes[i + 1 :]:
+            if other_shape.x >= shape.x + shape.width:
+                break
+            if (
+                other_shape.y < shape.y + shape.height
+                and shape.y < other_shape.y + other_shape.height
+            ):
+                overlaps += 1
+    return overlaps
+
+
+def run_layout(
+    log_path: str, miner: str, layout: str, output_bpmn_path: str
+) -> Dict[str, float]:
+    metrics = StageMetrics()
+    run_bpmn_generation_logic(
+        log_path,
+        case_id_field_name=CASE_ID_FIELD_NAME,
+        activity_field_name=ACTIVITY_FIELD_NAME,
+        timestamp_field_name=TIMESTAMP_FIELD_NAME,
+        role_field_name=ROLE_FIELD_NAME,
+        output_bpmn_path=output_bpmn_path,
+        role_conflict_policy="most_frequent",
+        layout=layout,
+        miner=miner,
+        progress=metrics,
+    )
+    stages = {
+        stage["name"]: stage["wall_seconds"] for stage in metrics.report()["stages"]
+    }
+    # graphviz runs while the model is serialized, so that stage is part of the pm4py layout
+    return {
+        "serialize": stages["serialize"],
+        "layout": stages["layout"],
+        "overlaps": count_overlapping_shapes(output_bpmn_path),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compares the layout engines in speed and overlapping shapes"
+    )
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10_000, 100_000])
+    parser.add_argument("--miner", choices=MINERS, default=DEFAULT_MINER)
+    add_generator_arguments(parser)
+    args = parser.parse_args()
+
+    print(
+        f"{'events':>10} {'layout':>8} {'serialize [ms]':>15} {'layout [ms]':>12} "
+        f"{'overlaps':>9}"
+    )
+    with tempfile.TemporaryDirectory() as output_dir:
+        for events in args.sizes:
+            log_path = get_log_path(events, args)
+            for layout in LAYOUTS:
+                output_bpmn_path = os.path.join(output_dir, f"{events}_{layout}.bpmn")
+                result = run_layout(log_path, args.miner, layout, output_bpmn_path)
+                print(
+                    f"{events:>10} {layout:>8} {result['serialize'] * 1000:>15.1f} "
+                    f"{result['layout'] * 1000:>12.1f} {result['overlaps']:>9}"
+                )
+
+
+if __name__ == "__main__":
+    main()
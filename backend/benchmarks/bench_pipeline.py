@@ -0,0 +1,203 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from typing import Any, Dict, List, Union
+from constants import *
+from metrics import StageMetrics
+from pipeline import run_bpmn_generation_logic
+from generate_log import (
+    ACTIVITY_FIELD_NAME,
+    CASE_ID_FIELD_NAME,
+    ROLE_FIELD_NAME,
+    TIMESTAMP_FIELD_NAME,
+    add_generator_arguments,
+    generate_log,
+)
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BENCHMARKS_DIR, "data")
+RESULTS_DIR = os.path.join(BENCHMARKS_DIR, "results")
+
+
+def get_commit() -> Union[str, None]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=BENCHMARKS_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def get_log_path(events: int, args: argparse.Namespace) -> str:
+    # generated logs are kept, so repeated runs and runs on other commits use the same input
+    name = (
+        f"log_{events}_a{args.activities}_r{args.roles}_p{args.parallelism}"
+        f"_l{args.loop_density}_t{args.trace_templates}_s{args.seed}.csv"
+    )
+    log_path = os.path.join(DATA_DIR, name)
+    if not os.path.exists(log_path):
+        os.makedirs(DATA_DIR, exist_ok=True)
+        print(f"INFO: Generating {log_path}")
+        dataframe = generate_log(
+            events,
+            activities=args.activities,
+            roles=args.roles,
+            parallelism=args.parallelism,
+            loop_density=args.loop_density,
+            trace_templates=args.trace_templates,
+            seed=args.seed,
+        )
+        dataframe.to_csv(log_path, index=False)
+    return log_path
+
+
+def run_once(log_path: str, miner: str, output_bpmn_path: str) -> Dict[str, Any]:
+    metrics = StageMetrics()
+    start = time.perf_counter()
+    run_bpmn_generation_logic(
+        log_path,
+        case_id_field_name=CASE_ID_FIELD_NAME,
+        activity_field_name=ACTIVITY_FIELD_NAME,
+        timestamp_field_name=TIMESTAMP_FIELD_NAME,
+        role_field_name=ROLE_FIELD_NAME,
+        output_bpmn_path=output_bpmn_path,
+        role_conflict_policy="most_frequent",
+        miner=miner,
+        progress=metrics,
+    )
+    report = metrics.report()
+    report["total_wall_seconds"] = time.perf_counter() - start
+    return report
+
+
+def summarize_runs(reports: List[Dict[str, Any]]) -> Dict[str, Any]:
+    # the median of every stage, which is less sensitive to a single slow run than the mean
+    stages = {}
+    for name in dict.fromkeys(stage["name"] for stage in reports[0]["stages"]):
+        runs = [
+            stage
+            for report in reports
+            for stage in report["stages"]
+            if stage["name"] == name
+        ]
+        stages[name] = {
+            "wall_seconds": statistics.median(stage["wall_seconds"] for stage in runs),
+            "cpu_seconds": statistics.median(stage["cpu_seconds"] for stage in runs),
+            "peak_rss_bytes": max((stage["peak_rss_bytes"] or 0) for stage in runs),
+        }
+    return {
+        "sizes": reports[0]["sizes"],
+        "total_wall_seconds": statistics.median(
+            report["total_wall_seconds"] for report in reports
+        ),
+        "stages": stages,
+    }
+
+
+def print_comparison(results: Dict[str, Any], baseline: Dict[str, Any]) -> None:
+    baseline_runs = {run["events"]: run for run in baseline["runs"]}
+    print(
+        f"\ncompared to {baseline.get('commit')} ({baseline.get('created_at')}), "
+        "current / baseline wall time:"
+    )
+    for run in results["runs"]:
+        baseline_run = baseline_runs.get(run["events"])
+        if baseline_run is None:
+            continue
+        for name, stage in run["stages"].items():
+            baseline_stage = baseline_run["stages"].get(name)
+            if baseline_stage is None or baseline_stage["wall_seconds"] == 0:
+                continue
+            ratio = stage["wall_seconds"] / baseline_stage["wall_seconds"]
+            print(f"{run['events']:>10} {name:>14} {ratio:>8.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Times every stage of the BPMN generation on synthetic logs"
+    )
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[1000, 10_000, 100_000, 1_000_000],
+        help="approximate numbers of events, e.g. add 10000000 for the largest runs",
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--miner", choices=MINERS, default=DEFAULT_MINER)
+    parser.add_argument("--output", help="JSON file to write the results to")
+    parser.add_argument("--compare", help="JSON results of an earlier run")
+    add_generator_arguments(parser)
+    args = parser.parse_args()
+
+    results = {
+        "commit": get_commit(),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "miner": args.miner,
+        "generator": {
+            "activities": args.activities,
+            "roles": args.roles,
+            "parallelism": args.parallelism,
+            "loop_density": args.loop_density,
+            "trace_templates": args.trace_templates,
+            "seed": args.seed,
+        },
+        "runs": [],
+    }
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        for events in args.sizes:
+            log_path = get_log_path(events, args)
+            output_bpmn_path = os.path.join(output_dir, f"{events}.bpmn")
+            reports = [
+                run_once(log_path, args.miner, output_bpmn_path)
+                for _ in range(args.repeat)
+            ]
+            run = {"events": events, **summarize_runs(reports)}
+            results["runs"].append(run)
+
+            print(f"\n{events} events, {run['total_wall_seconds']:.3f} s in total")
+            print(
+                f"{'stage':>14} {'wall [ms]':>12} {'cpu [ms]':>12} {'peak rss [MB]':>14}"
+            )
+            for name, stage in run["stages"].items():
+                print(
+                    f"{name:>14} {stage['wall_seconds'] * 1000:>12.1f} "
+                    f"{stage['cpu_seconds'] * 1000:>12.1f} "
+                    f"{stage['peak_rss_bytes'] / 2**20:>14.1f}"
+                )
+
+    output_path = args.output
+    if output_path is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output_path = os.path.join(
+            RESULTS_DIR,
+            f"pipeline_{results['commit'] or 'unknown'}_{time.strftime('%Y%m%d_%H%M%S')}.json",
+        )
+    with open(output_path, "w") as output_file:
+        json.dump(results, output_file, indent=2)
+    print(f"\nINFO: Results written to {output_path}")
+
+    if args.compare is not None:
+        with open(args.compare) as baseline_file:
+            print_comparison(results, json.load(baseline_file))
+
+
+if __name__ == "__main__":
+    main()
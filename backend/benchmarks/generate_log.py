@@ -0,0 +1,143 @@
+import argparse
+import numpy as np
+import pandas as pd
+
+from typing import List
+
+CASE_ID_FIELD_NAME = "Case ID"
+ACTIVITY_FIELD_NAME = "Activity"
+ROLE_FIELD_NAME = "Resource"
+TIMESTAMP_FIELD_NAME = "Start Timestamp"
+# most logs have many cases but few distinct traces, cases are drawn from that many simulated ones
+DEFAULT_TRACE_TEMPLATES = 1000
+MAXIMUM_LOOP_REPETITIONS = 3
+
+
+def build_process(
+    activities: int, parallelism: float, rng: np.random.Generator
+) -> List[List[int]]:
+    # the process is a sequence of steps, every step is either a single activity or a block
+    # of 2-3 activities that are executed in any order
+    steps = []
+    activity = 0
+    while activity < activities:
+        size = 1
+        if rng.random() < parallelism:
+            size = min(int(rng.integers(2, 4)), activities - activity)
+        steps.append(list(range(activity, activity + size)))
+        activity += size
+    return steps
+
+
+def simulate_trace(
+    steps: List[List[int]], loop_density: float, rng: np.random.Generator
+) -> List[int]:
+    trace = []
+    for step in steps:
+        repetitions = 1
+        while repetitions < MAXIMUM_LOOP_REPETITIONS and rng.random() < loop_density:
+            repetitions += 1
+        for _ in range(repetitions):
+            trace.extend(rng.permutation(step).tolist())
+    return trace
+
+
+def generate_log(
+    events: int,
+    activities: int = 20,
+    roles: int = 5,
+    parallelism: float = 0.2,
+    loop_density: float = 0.1,
+    trace_templates: int = DEFAULT_TRACE_TEMPLATES,
+    seed: int = 0,
+) -> pd.DataFrame:
+    # traces are simulated once per template and then expanded to cases with numpy, so logs
+    # with millions of events are generated in seconds
+    rng = np.random.default_rng(seed)
+    steps = build_process(activities, parallelism, rng)
+    templates = [
+        simulate_trace(steps, loop_density, rng) for _ in range(trace_templates)
+    ]
+
+    template_lengths = np.array([len(template) for template in templates])
+    # frequent traces are much more frequent than rare ones, like in real logs
+    weights = 1 / np.arange(1, len(templates) + 1)
+    weights /= weights.sum()
+    cases = max(1, round(events / float(np.dot(weights, template_lengths))))
+    case_templates = rng.choice(len(templates), size=cases, p=weights)
+
+    case_lengths = template_lengths[case_templates]
+    total_events = int(case_lengths.sum())
+    case_offsets = np.repeat(np.cumsum(case_lengths) - case_lengths, case_lengths)
+    positions = np.arange(total_events) - case_offsets
+    template_offsets = np.cumsum(template_lengths) - template_lengths
+    flat_templates = np.concatenate([np.array(template) for template in templates])
+    activity_indices = flat_templates[
+        np.repeat(template_offsets[case_templates], case_lengths) + positions
+    ]
+
+    # cases start every few minutes, their events follow each other within the hour
+    case_starts = np.cumsum(rng.integers(60, 600, size=cases)).astype("int64")
+    seconds = (
+        np.repeat(case_starts, case_lengths)
+        + positions * 3600
+        + rng.integers(0, 1800, size=total_events)
+    )
+
+    activity_names = np.array([f"Activity {i + 1:03d}" for i in range(activities)])
+    role_names = np.array([f"Role {i % roles + 1:02d}" for i in range(activities)])
+    return pd.DataFrame(
+        {
+            CASE_ID_FIELD_NAME: np.repeat(np.arange(1, cases + 1), case_lengths),
+            ACTIVITY_FIELD_NAME: activity_names[activity_indices],
+            ROLE_FIELD_NAME: role_names[activity_indices],
+            TIMESTAMP_FIELD_NAME: pd.Timestamp("2024-01-01")
+            + pd.to_timedelta(seconds, unit="s"),
+        }
+    )
+
+
+def add_generator_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--activities", type=int, default=20)
+    parser.add_argument("--roles", type=int, default=5)
+    parser.add_argument(
+        "--parallelism",
+        type=float,
+        default=0.2,
+        help="probability of a step being a block of activities executed in any order",
+    )
+    parser.add_argument(
+        "--loop-density",
+        type=float,
+        default=0.1,
+        help="probability of a step being repeated",
+    )
+    parser.add_argument("--trace-templates", type=int, default=DEFAULT_TRACE_TEMPLATES)
+    parser.add_argument("--seed", type=int, default=0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generates a synthetic event log")
+    parser.add_argument("events", type=int, help="approximate number of events")
+    parser.add_argument("output", help="path of the CSV file to write")
+    add_generator_arguments(parser)
+    args = parser.parse_args()
+
+    dataframe = generate_log(
+        args.events,
+        activities=args.activities,
+        roles=args.roles,
+        parallelism=args.parallelism,
+        loop_density=args.loop_density,
+        trace_templates=args.trace_templates,
+        seed=args.seed,
+    )
+    dataframe.to_csv(args.output, index=False)
+    print(
+        f"INFO: Wrote {len(dataframe)} events of "
+        f"{dataframe[CASE_ID_FIELD_NAME].nunique()} cases to {args.output}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+import xml.etree.ElementTree as ET
+
+from typing import Dict, List, Union
+from constants import *
+
+
+class BpmnIndex:
+    # built once after parsing, so that the layout passes do not have to walk the whole tree
+    # for every lookup; elements created later on (lanes) need to be registered with add_element
+    def __init__(self, root: ET.Element):
+        self.root = root
+        self.process: Union[ET.Element, None] = None
+        self.lane_set: Union[ET.Element, None] = None
+        self.plane: Union[ET.Element, None] = None
+        self.start_event: Union[ET.Element, None] = None
+        self.end_event: Union[ET.Element, None] = None
+        self.tasks: List[ET.Element] = []
+        self.gateways: List[ET.Element] = []
+        self.sequence_flows: List[ET.Element] = []
+        self.elements_by_id: Dict[str, ET.Element] = {}
+        self.shapes_by_bpmn_element: Dict[str, ET.Element] = {}
+        self.edges_by_bpmn_element: Dict[str, ET.Element] = {}
+        self.bounds_by_shape: Dict[ET.Element, ET.Element] = {}
+
+        self.add_element(root)
+
+    def add_element(self, element: ET.Element) -> None:
+        for item in element.iter():
+            self._register(item)
+
+    def _register(self, element: ET.Element) -> None:
+        element_id = element.get("id")
+        if element_id is not None and element_id not in self.elements_by_id:
+            self.elements_by_id[element_id] = element
+
+        tag = element.tag
+        if tag.endswith("process") and self.process is None:
+            self.process = element
+        elif tag.endswith("laneSet") and self.lane_set is None:
+            self.lane_set = element
+        elif tag.endswith("BPMNPlane") and self.plane is None:
+            self.plane = element
+        elif tag.endswith("startEvent") and self.start_event is None:
+            self.start_event = element
+        elif tag.endswith("endEvent") and self.end_event is None:
+            self.end_event = element
+        elif tag.endswith("task"):
+            self.tasks.append(element)
+        elif tag.endswith("exclusiveGateway") or tag.endswith("parallelGateway"):
+            self.gateways.append(element)
+        elif tag.endswith("sequenceFlow"):
+            self.sequence_flows.append(element)
+        elif tag.endswith("BPMNShape"):
+            self.shapes_by_bpmn_element.setdefault(element.get("bpmnElement"), element)
+            bounds = element.find("omgdc:Bounds", NS)
+            if bounds is not None:
+                self.bounds_by_shape[element] = bounds
+        elif tag.endswith("BPMNEdge"):
+            self.edges_by_bpmn_element.setdefault(element.get("bpmnElement"), element)
+
+    def get_element(self, id: str) -> Union[ET.Element, None]:
+        return self.elements_by_id.get(id)
+
+    def get_shape(self, bpmn_element: str) -> Union[ET.Element, None]:
+        return self.shapes_by_bpmn_element.get(bpmn_element)
+
+    def get_edge(self, bpmn_element: str) -> Union[ET.Element, None]:
+        return self.edges_by_bpmn_element.get(bpmn_element)
+
+    def get_bounds(self, shape: ET.Element) -> Union[ET.Element, None]:
+        return self.bounds_by_shape.get(shape)
@@ -0,0 +1,216 @@
+import hashlib
+import json
+import os
+import re
+import time
+import uuid
+
+from typing import BinaryIO, List, Tuple, Union
+
+COPY_CHUNK_SIZE = 1024 * 1024
+TEMP_FILE_SUFFIX = ".tmp"
+# temp files this old were left behind by a process that died while writing them
+TEMP_FILE_MAX_AGE_SECONDS = 60 * 60
+
+
+def copy_file_with_digest(source: BinaryIO, destination: BinaryIO) -> str:
+    digest = hashlib.sha256()
+    while True:
+        chunk = source.read(COPY_CHUNK_SIZE)
+        if not chunk:
+            break
+        digest.update(chunk)
+        destination.write(chunk)
+    return digest.hexdigest()
+
+
+def get_file_digest(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as source:
+        while True:
+            chunk = source.read(COPY_CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def read_file_with_digest(source: BinaryIO) -> Tuple[bytes, str]:
+    digest = hashlib.sha256()
+    chunks = []
+    while True:
+        chunk = source.read(COPY_CHUNK_SIZE)
+        if not chunk:
+            break
+        digest.update(chunk)
+        chunks.append(chunk)
+    return b"".join(chunks), digest.hexdigest()
+
+
+def make_cache_key(content_digest: str, **parameters) -> str:
+    # parameters are sorted, so the key does not depend on the order they were passed in
+    payload = json.dumps([content_digest, sorted(parameters.items())], default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def write_file_atomically(path: str, content: bytes) -> None:
+    # readers never see a partly written file; concurrent writers of the same file (other requests
+    # or other server processes) each use their own temp file and the last rename wins
+    temp_path = f"{path}.{uuid.uuid4().hex}{TEMP_FILE_SUFFIX}"
+    try:
+        with open(temp_path, "wb") as output:
+            output.write(content)
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def is_cache_key(key: str) -> bool:
+    return re.fullmatch(r"[0-9a-f]{64}", key) is not None
+
+
+class FileCache:
+    # every entry is a single file named after its key; the modification time is bumped on
+    # every hit, so the directory itself keeps the LRU order and entries survive restarts;
+    # files derived from an entry (companions) are named after the same key and removed with it.
+    # Several processes can share the directory: all state is in the files, and entries used within
+    # min_age_seconds are never evicted for space, so a file is not removed while it is handed out
+    def __init__(
+        self,
+        directory: str,
+        suffix: str,
+        max_entries: int,
+        max_age_seconds: Union[int, None] = None,
+        companion_suffixes: Tuple[str, ...] = (),
+        max_bytes: Union[int, None] = None,
+        min_age_seconds: int = 0,
+    ):
+        self.directory = directory
+        self.suffix = suffix
+        self.companion_suffixes = companion_suffixes
+        self.max_entries = max_entries
+        self.max_age_seconds = max_age_seconds
+        self.max_bytes = max_bytes
+        self.min_age_seconds = min_age_seconds
+
+    def create_directory(self) -> None:
+        # not done on construction, so that modules defining caches can be imported without
+        # creating directories
+        os.makedirs(self.directory, exist_ok=True)
+
+    def get_filename(self, key: str) -> str:
+        return f"{key}{self.suffix}"
+
+    def get_path(self, key: str) -> str:
+        return os.path.join(self.directory, self.get_filename(key))
+
+    def get_companion_path(self, key: str, suffix: str) -> str:
+        return os.path.join(self.directory, f"{key}{suffix}")
+
+    def get(self, key: str) -> Union[str, None]:
+        path = self.get_path(key)
+        # the entry may be evicted by another worker at any point, which counts as a miss
+        try:
+            modified_at = os.path.getmtime(path)
+            if self._is_expired(modified_at, time.time()):
+                self._remove(path)
+                return None
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def read(self, key: str) -> Union[bytes, None]:
+        path = self.get(key)
+        if path is None:
+            return None
+        try:
+            with open(path, "rb") as file:
+                return file.read()
+        except FileNotFoundError:
+            return None
+
+    def evict(self) -> None:
+        now = time.time()
+        self._remove_stale_temp_files(now)
+        entries = []
+        for path in self._list_entries():
+            try:
+                modified_at = os.path.getmtime(path)
+            except FileNotFoundError:
+                continue
+            if self._is_expired(modified_at, now):
+                self._remove(path)
+            else:
+                entries.append((modified_at, path, self._get_entry_size(path)))
+
+        # the most recently used entries are kept until the count or the size is reached,
+        # everything older than the first entry that does not fit is evicted
+        entries.sort(reverse=True)
+        kept_entries, kept_bytes = 0, 0
+        full = False
+        for modified_at, path, size in entries:
+            full = full or (
+                kept_entries >= self.max_entries
+                or self.max_bytes is not None
+                and kept_bytes + size > self.max_bytes
+            )
+            if full and now - modified_at >= self.min_age_seconds:
+                self._remove(path)
+            else:
+                kept_entries += 1
+                kept_bytes += size
+
+    def _get_entry_size(self, path: str) -> int:
+        stem = path[: -len(self.suffix)]
+        size = 0
+        for entry_path in [path] + [
+            f"{stem}{suffix}" for suffix in self.companion_suffixes
+        ]:
+            try:
+                size += os.path.getsize(entry_path)
+            except FileNotFoundError:
+                pass
+        return size
+
+    def _remove_stale_temp_files(self, now: float) -> None:
+        for filename in os.listdir(self.directory):
+            if not filename.endswith(TEMP_FILE_SUFFIX):
+                continue
+            path = os.path.join(self.directory, filename)
+            try:
+                if now - os.path.getmtime(path) > TEMP_FILE_MAX_AGE_SECONDS:
+                    os.unlink(path)
+            except FileNotFoundError:
+                pass
+
+    def _is_expired(self, modified_at: float, now: float) -> bool:
+        return (
+            self.max_age_seconds is not None
+            and now - modified_at > self.max_age_seconds
+        )
+
+    def _list_entries(self) -> List[str]:
+        return [
+            os.path.join(self.directory, filename)
+            for filename in os.listdir(self.directory)
+            if filename.endswith(self.suffix)
+        ]
+
+    def _remove(self, path: str) -> None:
+        stem = path[: -len(self.suffix)]
+        for suffix in self.companion_suffixes:
+            try:
+                os.unlink(f"{stem}{suffix}")
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                print(f"ERROR: Failed to evict {stem}{suffix}. Reason: {e}")
+        try:
+            os.unlink(path)
+            print(f"INFO: Evicted {path} from cache.")
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"ERROR: Failed to evict {path}. Reason: {e}")
@@ -0,0 +1,228 @@
+import hashlib
+import xml.etree.ElementTree as ET
+
+from collections import defaultdict, deque
+from typing import Callable, Dict, List, Tuple
+from constants import *
+from pm4py.objects.bpmn.obj import BPMN
+
+REFERENCE_ATTRIBUTES = ("sourceRef", "targetRef", "bpmnElement")
+REFERENCE_TAGS = ("incoming", "outgoing")
+
+
+def get_local_name(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1]
+
+
+def get_digest(*parts: str) -> str:
+    return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()
+
+
+def get_node_labels(
+    node_keys: Dict[str, str],
+    predecessors: Dict[str, List[str]],
+    successors: Dict[str, List[str]],
+) -> Dict[str, str]:
+    # nodes start out labelled by their type and name, every round adds the labels of their
+    # neighbours, until no more nodes can be told apart; unnamed gateways end up labelled by
+    # where they sit in the model
+    labels = {node_id: get_digest(key) for node_id, key in node_keys.items()}
+    classes = len(set(labels.values()))
+    for _ in range(len(node_keys)):
+        labels = {
+            node_id: get_digest(
+                label,
+                ",".join(sorted(labels[other] for other in predecessors[node_id])),
+                ",".join(sorted(labels[other] for other in successors[node_id])),
+            )
+            for node_id, label in labels.items()
+        }
+        new_classes = len(set(labels.values()))
+        if new_classes == classes:
+            break
+        classes = new_classes
+    return labels
+
+
+def get_levels(
+    start_nodes: List[str], successors: Dict[str, List[str]]
+) -> Dict[str, int]:
+    # distance from the start event, so that the elements are listed roughly from left to right
+    queue = deque(start_nodes)
+    levels = {node_id: 0 for node_id in queue}
+    while queue:
+        node_id = queue.popleft()
+        for successor in successors[node_id]:
+            if successor not in levels:
+                levels[successor] = levels[node_id] + 1
+                queue.append(successor)
+    return levels
+
+
+def get_canonical_order(
+    node_keys: Dict[str, str],
+    flows: List[Tuple[str, str, str]],
+    start_nodes: List[str],
+) -> Tuple[List[str], List[Tuple[str, str, str]]]:
+    # nodes are given by id with a key of their type and name, flows as (id, source, target);
+    # nodes that still share a label cannot be told apart, so their order does not matter
+    predecessors: Dict[str, List[str]] = defaultdict(list)
+    successors: Dict[str, List[str]] = defaultdict(list)
+    for _, source, target in flows:
+        successors[source].append(target)
+        predecessors[target].append(source)
+
+    labels = get_node_labels(node_keys, predecessors, successors)
+    levels = get_levels(start_nodes, successors)
+    nodes = sorted(
+        node_keys,
+        key=lambda node_id: (levels.get(node_id, len(node_keys)), labels[node_id]),
+    )
+    positions = {node_id: position for position, node_id in enumerate(nodes)}
+    flows = sorted(flows, key=lambda flow: (positions[flow[1]], positions[flow[2]]))
+    return nodes, flows
+
+
+def get_model_node_key(node: BPMN.BPMNNode) -> str:
+    direction = ""
+    if isinstance(node, BPMN.Gateway):
+        direction = str(node.get_gateway_direction())
+    return "|".join((type(node).__name__, node.get_name(), direction))
+
+
+def sort_bpmn_model(bpmn_model: BPMN) -> None:
+    # graphviz places the nodes depending on the order they are declared in, which pm4py takes
+    # from the insertion order of its graph, so the graph is rebuilt in the canonical order
+    # before pm4py's layout runs
+    nodes = {node.get_id(): node for node in bpmn_model.get_nodes()}
+    node_keys = {node_id: get_model_node_key(node) for node_id, node in nodes.items()}
+    flows = {flow.get_id(): flow for flow in bpmn_model.get_flows()}
+    ordered_nodes, ordered_flows = get_canonical_order(
+        node_keys,
+        [
+            (flow_id, flow.get_source().get_id(), flow.get_target().get_id())
+            for flow_id, flow in flows.items()
+        ],
+        [
+            node_id
+            for node_id, node in nodes.items()
+            if isinstance(node, BPMN.StartEvent)
+        ],
+    )
+
+    graph = bpmn_model.get_graph()
+    graph.clear()
+    for node_id in ordered_nodes:
+        graph.add_node(nodes[node_id])
+    for flow_id, _, _ in ordered_flows:
+        flow = flows[flow_id]
+        graph.add_edge(
+            flow.get_source(),
+            flow.get_target(),
+            id=flow.get_id(),
+            name=flow.get_name(),
+        )
+
+
+def sort_children(parent: ET.Element, key: Callable[[ET.Element], int]) -> None:
+    # the whitespace after a child stays at its position, the last child is indented differently
+    tails = [child.tail for child in parent]
+    parent[:] = sorted(parent, key=key)
+    for child, tail in zip(parent, tails):
+        child.tail = tail
+
+
+def canonicalize_bpmn(root: ET.Element) -> None:
+    # pm4py names elements with random uuids and lists them in set order, so the same model would
+    # be written differently by every run; ids are replaced by digests of the type, the name and
+    # the position of an element, and elements are sorted, which makes the output reproducible
+    process = root.find("bpmn:process", NS)
+    if process is None:
+        return
+
+    flow_elements = {
+        flow.get("id"): flow for flow in process.findall("bpmn:sequenceFlow", NS)
+    }
+    node_elements = {
+        child.get("id"): child
+        for child in process
+        if child.get("id") is not None and get_local_name(child.tag) != "sequenceFlow"
+    }
+    ordered_nodes, ordered_flows = get_canonical_order(
+        {
+            node_id: "|".join(
+                (
+                    get_local_name(node.tag),
+                    node.get("name", ""),
+                    node.get("gatewayDirection", ""),
+                )
+            )
+            for node_id, node in node_elements.items()
+        },
+        [
+            (flow_id, flow.get("sourceRef"), flow.get("targetRef"))
+            for flow_id, flow in flow_elements.items()
+        ],
+        [
+            node_id
+            for node_id, node in node_elements.items()
+            if get_local_name(node.tag) == "startEvent"
+        ],
+    )
+
+    new_ids = {}
+    ordinals: Dict[str, int] = defaultdict(int)
+
+    def rename(element: ET.Element, *parts: str) -> None:
+        key = "|".join(parts)
+        new_ids[element.get("id")] = f"id{get_digest(key, str(ordinals[key]))[:32]}"
+        ordinals[key] += 1
+
+    for node_id in ordered_nodes:
+        node = node_elements[node_id]
+        rename(node, get_local_name(node.tag), node.get("name", ""))
+    for flow_id, source, target in ordered_flows:
+        rename(flow_elements[flow_id], "sequenceFlow", new_ids[source], new_ids[target])
+    positions = {
+        element_id: position
+        for position, element_id in enumerate(
+            ordered_nodes + [flow_id for flow_id, _, _ in ordered_flows]
+        )
+    }
+
+    # everything else, e.g. the process and the diagram, occurs once and keeps its document order
+    for element in root.iter():
+        if element.get("id") is not None and element.get("id") not in new_ids:
+            if element.get("bpmnElement") is None:
+                rename(element, get_local_name(element.tag))
+
+    for element in root.iter():
+        for attribute in REFERENCE_ATTRIBUTES:
+            if element.get(attribute) in new_ids:
+                element.set(attribute, new_ids[element.get(attribute)])
+        if get_local_name(element.tag) in REFERENCE_TAGS and element.text in new_ids:
+            element.text = new_ids[element.text]
+        # shapes and edges are named after the element they draw, like pm4py does
+        if element.get("bpmnElement") is not None and element.get("id") is not None:
+            element.set("id", f"{element.get('bpmnElement')}_gui")
+        elif element.get("id") in new_ids:
+            element.set("id", new_ids[element.get("id")])
+
+    new_positions = {
+        new_ids[old_id]: position for old_id, position in positions.items()
+    }
+
+    def get_position(element: ET.Element) -> int:
+        reference = element.get("id")
+        if get_local_name(element.tag) in REFERENCE_TAGS:
+            reference = element.text
+        elif element.get("bpmnElement") is not None:
+            reference = element.get("bpmnElement")
+        return new_positions.get(reference, len(new_positions))
+
+    # sorting is stable, so children that are not part of the model keep their order at the end
+    for node in node_elements.values():
+        sort_children(node, get_position)
+    sort_children(process, get_position)
+    for plane in root.iter(f"{{{NS['bpmndi']}}}BPMNPlane"):
+        sort_children(plane, get_position)
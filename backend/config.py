@@ -0,0 +1,71 @@
+import os
+
+from typing import Union
+
+
+# settings that depend on the deployment, each of them can be overridden with an environment variable
+def get_int_setting(name: str, default: Union[int, None]) -> Union[int, None]:
+    value = os.environ.get(name)
+    if value is None or value == "":
+        return default
+    return int(value)
+
+
+def get_bool_setting(name: str, default: bool) -> bool:
+    value = os.environ.get(name)
+    if value is None or value == "":
+        return default
+    return value.lower() in ("1", "true", "yes", "on")
+
+
+# parser used for uploaded CSV logs - "c" (pandas default) or "pyarrow" (needs pyarrow installed)
+CSV_ENGINE = os.environ.get("BPMN_CSV_ENGINE", "c")
+# when set, CSV logs are parsed in chunks of that many rows, which bounds the memory used by the parser
+CSV_CHUNK_SIZE = get_int_setting("BPMN_CSV_CHUNK_SIZE", None)
+# generated diagrams are kept and reused for identical uploads, up to that many files and that age
+RESULT_CACHE_MAX_ENTRIES = get_int_setting("BPMN_RESULT_CACHE_MAX_ENTRIES", 256)
+RESULT_CACHE_TTL_SECONDS = get_int_setting(
+    "BPMN_RESULT_CACHE_TTL_SECONDS", 24 * 60 * 60
+)
+RESULT_CACHE_MAX_BYTES = get_int_setting(
+    "BPMN_RESULT_CACHE_MAX_BYTES", 1024 * 1024 * 1024
+)
+# mined process models are kept apart from the lanes, so that changing only the role field skips mining
+MODEL_CACHE_MAX_ENTRIES = get_int_setting("BPMN_MODEL_CACHE_MAX_ENTRIES", 64)
+MODEL_CACHE_TTL_SECONDS = get_int_setting("BPMN_MODEL_CACHE_TTL_SECONDS", 24 * 60 * 60)
+MODEL_CACHE_MAX_BYTES = get_int_setting("BPMN_MODEL_CACHE_MAX_BYTES", 256 * 1024 * 1024)
+# caches are evicted in the background every that many seconds, files used more recently than
+# the minimum age are only removed once they expire, so they are not deleted while being downloaded
+CACHE_EVICTION_INTERVAL_SECONDS = get_int_setting(
+    "BPMN_CACHE_EVICTION_INTERVAL_SECONDS", 60
+)
+CACHE_MIN_AGE_SECONDS = get_int_setting("BPMN_CACHE_MIN_AGE_SECONDS", 5 * 60)
+# address the server is reached at by clients, used for the URLs of generated diagrams
+PUBLIC_BASE_URL = os.environ.get(
+    "BPMN_PUBLIC_BASE_URL", "http://localhost:8000"
+).rstrip("/")
+# diagrams are generated in a pool of worker processes; requests above workers + queue size get a 503
+WORKER_PROCESSES = get_int_setting("BPMN_WORKER_PROCESSES", os.cpu_count() or 1)
+WORKER_QUEUE_SIZE = get_int_setting("BPMN_WORKER_QUEUE_SIZE", 8)
+RETRY_AFTER_SECONDS = get_int_setting("BPMN_RETRY_AFTER_SECONDS", 10)
+# state of jobs started through /jobs/, shared by the API and the worker processes
+JOB_DATABASE_PATH = os.environ.get("BPMN_JOB_DATABASE_PATH", "jobs.sqlite3")
+JOB_TTL_SECONDS = get_int_setting("BPMN_JOB_TTL_SECONDS", 24 * 60 * 60)
+# uploads up to that size are parsed from memory, bigger ones are written to a temp file first
+UPLOAD_MEMORY_LIMIT_BYTES = get_int_setting(
+    "BPMN_UPLOAD_MEMORY_LIMIT_BYTES", 64 * 1024 * 1024
+)
+# state of logs updated incrementally through /logs/{log_id}/events/, kept for that many logs and that long
+LOG_STATE_MAX_ENTRIES = get_int_setting("BPMN_LOG_STATE_MAX_ENTRIES", 64)
+LOG_STATE_TTL_SECONDS = get_int_setting("BPMN_LOG_STATE_TTL_SECONDS", 7 * 24 * 60 * 60)
+# the SVG preview is rendered right after the layout, otherwise previews are only rendered on request;
+# PNG previews bigger than that many pixels on a side are scaled down
+PREVIEW_SVG = get_bool_setting("BPMN_PREVIEW_SVG", True)
+PREVIEW_PNG_MAX_SIDE = get_int_setting("BPMN_PREVIEW_PNG_MAX_SIDE", 8192)
+# per stage timings of every generation, sent as a Server-Timing header, logged and served on /metrics
+METRICS_SERVER_TIMING = get_bool_setting("BPMN_METRICS_SERVER_TIMING", True)
+METRICS_LOG = get_bool_setting("BPMN_METRICS_LOG", True)
+METRICS_ENDPOINT = get_bool_setting("BPMN_METRICS_ENDPOINT", True)
+# tracemalloc gives the peak Python memory of every stage, but slows generation down noticeably
+METRICS_TRACEMALLOC = get_bool_setting("BPMN_METRICS_TRACEMALLOC", False)
+METRICS_ENABLED = METRICS_SERVER_TIMING or METRICS_LOG or METRICS_ENDPOINT
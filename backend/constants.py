@@ -13,3 +13,52 @@ INITIAL_LANE_HORIZONTAL_SHIFT_RIGHT = 250
 INITIAL_LANE_VERTICAL_SHIFT = 20
 MAXIMUM_HORIZONTAL_DIFF_TO_FIX_LAYOUT = 90
 MAXIMUM_VERTICAL_DIFF_TO_FIX_LAYOUT = 10
+# sequence flows are routed orthogonally: shapes closer than that vertically share a row and closer
+# than that horizontally are connected directly, other flows run along a horizontal channel that
+# far from the shapes, with parallel flows in the same channel that far apart
+SAME_ROW_MAXIMUM_VERTICAL_DIFF = 150
+DIRECT_FLOW_MAXIMUM_HORIZONTAL_DIFF = 125
+FLOW_CHANNEL_DISTANCE = 80
+FLOW_CHANNEL_SPACING = 8
+FLOW_STUB_LENGTH = 10
+
+# layout engines: the coordinates of pm4py (graphviz) fixed up to fit the lanes, or a layered
+# layout computed from the sequence flows, which does not need graphviz
+LAYOUT_PM4PY = "pm4py"
+LAYOUT_LAYERED = "layered"
+LAYOUTS = [LAYOUT_PM4PY, LAYOUT_LAYERED]
+DEFAULT_LAYOUT = LAYOUT_PM4PY
+LAYERED_TASK_WIDTH = 100
+LAYERED_TASK_HEIGHT = 60
+LAYERED_GATEWAY_SIZE = 50
+LAYERED_EVENT_SIZE = 36
+LAYERED_LAYER_GAP = 50
+LAYERED_NODE_GAP = 10
+LAYERED_ORDERING_SWEEPS = 4
+
+# previews of generated diagrams, drawn from the computed layout without bpmn-js
+PREVIEW_FORMATS = ["svg", "png"]
+PREVIEW_MARGIN = 20
+PREVIEW_FONT_SIZE = 12
+PREVIEW_LANE_LABEL_WIDTH = 30
+PREVIEW_PNG_SCALE = 1.0
+
+# how to choose the lane of an activity that is performed by more than one role:
+# the role of its last event, the role performing it most often, or reject the log
+ROLE_CONFLICT_POLICIES = ["last", "most_frequent", "report"]
+DEFAULT_ROLE_CONFLICT_POLICY = "last"
+
+# order of the lanes from top to bottom: the order in which their roles first show up in the log,
+# alphabetical, or from the role with the most events down
+LANE_ORDERS = ["appearance", "name", "frequency"]
+DEFAULT_LANE_ORDER = "appearance"
+
+# process discovery algorithms, from the most faithful to the fastest:
+# the inductive miner, the inductive miner dropping infrequent behaviour below the noise threshold,
+# and a directly-follows graph with exclusive gateways only, made for very large logs
+MINER_INDUCTIVE = "inductive"
+MINER_INDUCTIVE_INFREQUENT = "inductive_infrequent"
+MINER_DFG = "dfg"
+MINERS = [MINER_INDUCTIVE, MINER_INDUCTIVE_INFREQUENT, MINER_DFG]
+DEFAULT_MINER = MINER_INDUCTIVE
+DEFAULT_NOISE_THRESHOLD = 0.2
@@ -0,0 +1,191 @@
+import heapq
+import math
+import xml.etree.ElementTree as ET
+
+from collections import defaultdict, deque
+from typing import Dict, List, Set, Tuple, Union
+from constants import *
+from bpmn_index import BpmnIndex
+
+
+class ShapeGeometry:
+    __slots__ = ("bpmn_element", "shape", "x", "y", "width", "height")
+
+    def __init__(
+        self,
+        bpmn_element: str,
+        shape: ET.Element,
+        x: float,
+        y: float,
+        width: float,
+        height: float,
+    ):
+        self.bpmn_element = bpmn_element
+        self.shape = shape
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+
+
+class EdgeGeometry:
+    __slots__ = ("bpmn_element", "edge", "waypoints")
+
+    def __init__(
+        self, bpmn_element: str, edge: ET.Element, waypoints: List[Tuple[float, float]]
+    ):
+        self.bpmn_element = bpmn_element
+        self.edge = edge
+        self.waypoints = waypoints
+
+
+class GeometryStore:
+    # the layout passes work on plain floats kept here and the XML is only updated once,
+    # by write_back, right before the tree gets written
+    def __init__(self, index: BpmnIndex):
+        self.index = index
+        self.shapes: Dict[str, ShapeGeometry] = {}
+        self.edges: Dict[str, EdgeGeometry] = {}
+
+        for bpmn_element, shape in index.shapes_by_bpmn_element.items():
+            self._add_shape(bpmn_element, shape)
+        for bpmn_element, edge in index.edges_by_bpmn_element.items():
+            waypoints = [
+                (float(waypoint.get("x")), float(waypoint.get("y")))
+                for waypoint in edge.findall("ns6:waypoint", NS)
+            ]
+            self.edges[bpmn_element] = EdgeGeometry(bpmn_element, edge, waypoints)
+
+    def _add_shape(self, bpmn_element: str, shape: ET.Element) -> None:
+        bounds = self.index.get_bounds(shape)
+        if bounds is None:
+            return
+        self.shapes[bpmn_element] = ShapeGeometry(
+            bpmn_element,
+            shape,
+            float(bounds.get("x")),
+            float(bounds.get("y")),
+            float(bounds.get("width")),
+            float(bounds.get("height")),
+        )
+
+    def add_shape(self, shape: ET.Element) -> Union[ShapeGeometry, None]:
+        bpmn_element = shape.get("bpmnElement")
+        self._add_shape(bpmn_element, shape)
+        return self.shapes.get(bpmn_element)
+
+    def get_shape(self, bpmn_element: str) -> Union[ShapeGeometry, None]:
+        return self.shapes.get(bpmn_element)
+
+    def get_edge(self, bpmn_element: str) -> Union[EdgeGeometry, None]:
+        return self.edges.get(bpmn_element)
+
+    def write_back(self) -> None:
+        for geometry in self.shapes.values():
+            bounds = self.index.get_bounds(geometry.shape)
+            bounds.set("x", str(geometry.x))
+            bounds.set("y", str(geometry.y))
+            bounds.set("width", str(geometry.width))
+            bounds.set("height", str(geometry.height))
+
+        for geometry in self.edges.values():
+            edge = geometry.edge
+            for waypoint in edge.findall("ns6:waypoint", NS):
+                edge.remove(waypoint)
+            for x, y in geometry.waypoints:
+                ET.SubElement(
+                    edge,
+                    f"{{{NS['ns6']}}}waypoint",
+                    {
+                        "x": str(x),
+                        "y": str(y),
+                    },
+                )
+
+
+def find_overlapping_clusters(
+    shapes: List[ShapeGeometry],
+    max_horizontal_diff: float = MAXIMUM_HORIZONTAL_DIFF_TO_FIX_LAYOUT,
+    max_vertical_diff: float = MAXIMUM_VERTICAL_DIFF_TO_FIX_LAYOUT,
+) -> List[List[ShapeGeometry]]:
+    # shapes are bucketed into a uniform grid with cells as big as the conflict thresholds,
+    # so only the 8 surrounding cells have to be checked for every shape
+    grid: Dict[Tuple[int, int], List[int]] = defaultdict(list)
+    for i, shape in enumerate(shapes):
+        cell = (
+            math.floor(shape.x / max_horizontal_diff),
+            math.floor(shape.y / max_vertical_diff),
+        )
+        grid[cell].append(i)
+
+    def conflict(i: int, j: int) -> bool:
+        return (
+            abs(shapes[i].x - shapes[j].x) < max_horizontal_diff
+            and abs(shapes[i].y - shapes[j].y) < max_vertical_diff
+        )
+
+    neighbours: Dict[int, List[int]] = defaultdict(list)
+    for (cell_x, cell_y), members in grid.items():
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                for j in grid.get((cell_x + dx, cell_y + dy), []):
+                    for i in members:
+                        if i != j and conflict(i, j):
+                            neighbours[i].append(j)
+
+    # a cluster only holds shapes that all conflict with each other; conflicts are not chained,
+    # so a row of shapes each touching the next does not end up spread as one big cluster
+    clustered = set()
+    clusters = []
+    for i in range(len(shapes)):
+        if i in clustered or i not in neighbours:
+            continue
+        cluster = [i]
+        for j in sorted(neighbours[i]):
+            if j not in clustered and all(conflict(j, k) for k in cluster[1:]):
+                cluster.append(j)
+        if len(cluster) > 1:
+            clustered.update(cluster)
+            clusters.append([shapes[k] for k in cluster])
+    return clusters
+
+
+def find_nearest_tasks(
+    tasks: List[str], neighbours: Dict[str, List[str]], gateway_ids: Set[str]
+) -> Dict[str, str]:
+    # breadth-first search from all tasks at once, walking only through gateways, so every gateway
+    # gets the task the fewest flows away; ties go to the task that comes first in the document
+    nearest_tasks = {}
+    queue = deque()
+    for task_id in tasks:
+        queue.append((task_id, task_id))
+    while queue:
+        node_id, task_id = queue.popleft()
+        for neighbour in neighbours.get(node_id, []):
+            if neighbour in gateway_ids and neighbour not in nearest_tasks:
+                nearest_tasks[neighbour] = task_id
+                queue.append((neighbour, task_id))
+    return nearest_tasks
+
+
+def assign_channel_tracks(intervals: List[Tuple[float, float]]) -> List[int]:
+    # intervals sharing a channel get different tracks wherever they overlap, using as few tracks
+    # as possible; intervals are taken from left to right and ties keep their order, so the result
+    # only depends on the input
+    order = sorted(range(len(intervals)), key=lambda i: intervals[i])
+    tracks = [0] * len(intervals)
+    busy_tracks: List[Tuple[float, int]] = []
+    free_tracks: List[int] = []
+    track_count = 0
+    for i in order:
+        left, right = intervals[i]
+        while busy_tracks and busy_tracks[0][0] <= left:
+            heapq.heappush(free_tracks, heapq.heappop(busy_tracks)[1])
+        if free_tracks:
+            track = heapq.heappop(free_tracks)
+        else:
+            track = track_count
+            track_count += 1
+        tracks[i] = track
+        heapq.heappush(busy_tracks, (right, track))
+    return tracks
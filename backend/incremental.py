@@ -0,0 +1,181 @@
+import fcntl
+import os
+import pickle
+import numpy as np
+import pandas as pd
+
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, Iterator, Tuple, Union
+from constants import *
+from utils import TaskRoleConflictError, count_task_roles, get_task_role_events
+from cache import make_cache_key, write_file_atomically
+from miners import END_NODE, START_NODE, filter_directly_follows
+
+LOCK_FILE_SUFFIX = ".lock"
+
+
+class LogStateMismatchError(ValueError):
+    pass
+
+
+class LogState:
+    # everything needed to mine and lay out a growing log without its events: the variant of every
+    # case seen so far, the variant table, the directly-follows counts and the roles of activities;
+    # appended events only update the entries of their own cases
+    def __init__(self, fields: Dict[str, Union[str, None]]):
+        self.fields = fields
+        self.events = 0
+        self.case_variants: Dict[str, Tuple[str, ...]] = {}
+        self.variants: Counter = Counter()
+        # cases of the same variant share one tuple, which keeps the state small when it is pickled
+        self.variant_tuples: Dict[Tuple[str, ...], Tuple[str, ...]] = {}
+        self.directly_follows: Counter = Counter()
+        self.task_role_counts: Dict[str, Dict[str, int]] = {}
+        self.task_last_role: Dict[str, str] = {}
+
+    def check_fields(self, fields: Dict[str, Union[str, None]]) -> None:
+        if fields != self.fields:
+            raise LogStateMismatchError(
+                f"The log was started with other fields {self.fields}, delete it to start over"
+            )
+
+    def add_events(self, dataframe: pd.DataFrame) -> None:
+        case_id_key = self.fields["case_id_field_name"]
+        activity_key = self.fields["activity_field_name"]
+        events = dataframe.sort_values(
+            [case_id_key, self.fields["timestamp_field_name"]], kind="stable"
+        )
+        cases = events[case_id_key].astype(str).to_numpy()
+        activities = events[activity_key].astype(str).to_numpy().tolist()
+        self.events += len(activities)
+
+        if len(activities) > 0:
+            case_starts = np.flatnonzero(np.r_[True, cases[1:] != cases[:-1]]).tolist()
+            case_bounds = zip(case_starts, case_starts[1:] + [len(activities)])
+            for start, end in case_bounds:
+                self.extend_case(cases[start], tuple(activities[start:end]))
+
+        # roles are counted in the order of the file, like for a full log
+        self.add_roles(dataframe)
+
+    def extend_case(self, case: str, activities: Tuple[str, ...]) -> None:
+        # appended events are expected to follow the events of their case that were already seen
+        previous_variant = self.case_variants.get(case, ())
+        if previous_variant:
+            self.variants[previous_variant] -= 1
+            if self.variants[previous_variant] == 0:
+                del self.variants[previous_variant]
+                del self.variant_tuples[previous_variant]
+            self.directly_follows[(previous_variant[-1], END_NODE)] -= 1
+
+        trace = (previous_variant[-1:] or (START_NODE,)) + activities + (END_NODE,)
+        for arc in zip(trace, trace[1:]):
+            self.directly_follows[arc] += 1
+
+        variant = previous_variant + activities
+        variant = self.variant_tuples.setdefault(variant, variant)
+        self.variants[variant] += 1
+        self.case_variants[case] = variant
+
+    def add_roles(self, dataframe: pd.DataFrame) -> None:
+        task_field_name = self.fields["activity_field_name"]
+        role_field_name = self.fields["role_field_name"]
+        counts = count_task_roles(dataframe, task_field_name, role_field_name)
+        for (task, role), count in counts.items():
+            roles = self.task_role_counts.setdefault(task, {})
+            roles[role] = roles.get(role, 0) + int(count)
+
+        role_events = get_task_role_events(dataframe, task_field_name, role_field_name)
+        last_events = role_events.drop_duplicates(subset="task", keep="last")
+        roles = last_events["role"].astype(str).str.replace(" ", "_", regex=False)
+        self.task_last_role.update(zip(last_events["task"], roles))
+
+    def get_directly_follows(self) -> Dict[Tuple[str, str], int]:
+        return {arc: count for arc, count in self.directly_follows.items() if count > 0}
+
+    def get_task_role_map(
+        self, conflict_policy: str = DEFAULT_ROLE_CONFLICT_POLICY
+    ) -> Dict[str, str]:
+        # the same result as utils.get_task_role_map on all events of the log
+        if conflict_policy == "most_frequent":
+            # on a tie the role that showed up first wins
+            return {
+                task: max(roles, key=roles.get)
+                for task, roles in self.task_role_counts.items()
+            }
+
+        if conflict_policy == "report":
+            conflicts = {
+                task: list(roles)
+                for task, roles in self.task_role_counts.items()
+                if len(roles) > 1
+            }
+            if conflicts:
+                raise TaskRoleConflictError(conflicts)
+
+        return {task: self.task_last_role[task] for task in self.task_role_counts}
+
+    def get_role_event_counts(self) -> Dict[str, int]:
+        role_event_counts: Dict[str, int] = Counter()
+        for roles in self.task_role_counts.values():
+            role_event_counts.update(roles)
+        return dict(role_event_counts)
+
+    def describe(self) -> Dict[str, int]:
+        return {
+            "events": self.events,
+            "cases": len(self.case_variants),
+            "variants": len(self.variants),
+        }
+
+
+def get_model_key(
+    variants: Counter,
+    directly_follows: Dict[Tuple[str, str], int],
+    miner: str = DEFAULT_MINER,
+    noise_threshold: float = DEFAULT_NOISE_THRESHOLD,
+) -> str:
+    # covers only what the miner looks at, so appended events that leave it as it is reuse the model
+    if miner == MINER_DFG:
+        structure = sorted(filter_directly_follows(directly_follows, noise_threshold))
+    elif miner == MINER_INDUCTIVE_INFREQUENT:
+        structure = sorted(variants.items())
+    else:
+        # the inductive miner only looks at which variants occur, not at how often
+        structure = sorted(variants)
+    return make_cache_key(
+        "", miner=miner, noise_threshold=noise_threshold, structure=structure
+    )
+
+
+def load_log_state(path: str) -> LogState:
+    with open(path, "rb") as state_file:
+        return pickle.load(state_file)
+
+
+def save_log_state(state: LogState, path: str) -> None:
+    # written next to the target and renamed, so a failed write keeps the previous state
+    write_file_atomically(path, pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+@contextmanager
+def lock_log_state(path: str) -> Iterator[None]:
+    # the lock is held on a file next to the state, so updates of the same log coming from
+    # different worker processes are applied one after the other; the lock file is left in place,
+    # since removing it would let a second process lock a new file while the old one is held
+    with open(f"{path}{LOCK_FILE_SUFFIX}", "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def remove_log_state(path: str) -> bool:
+    with lock_log_state(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            return False
+    return True
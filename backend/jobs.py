@@ -0,0 +1,166 @@
+import contextlib
+import json
+import sqlite3
+import time
+
+from typing import Any, Dict, Iterator, List, Union
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+FINISHED_JOB_STATUSES = [JOB_DONE, JOB_FAILED, JOB_CANCELLED]
+
+
+class JobCancelledError(Exception):
+    pass
+
+
+class PipelineProgress:
+    # the generation pipeline reports its phases and the size of its input through this object;
+    # the default one does nothing
+    @contextlib.contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        yield
+
+    def record(self, name: str, value: int) -> None:
+        pass
+
+
+class JobStore:
+    # jobs live in SQLite, so that worker processes can report progress without any broker;
+    # a new connection is opened for every operation, which keeps the store safe to pickle
+    def __init__(self, database_path: str, max_age_seconds: Union[int, None] = None):
+        self.database_path = database_path
+        self.max_age_seconds = max_age_seconds
+        with self._connect() as connection:
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    finished_at REAL,
+                    phases TEXT NOT NULL DEFAULT '[]',
+                    diagram_url TEXT,
+                    error TEXT,
+                    cancel_requested INTEGER NOT NULL DEFAULT 0
+                )
+                """)
+
+    @contextlib.contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        connection = sqlite3.connect(self.database_path, timeout=30)
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def create(self, job_id: str) -> None:
+        now = time.time()
+        with self._connect() as connection:
+            if self.max_age_seconds is not None:
+                connection.execute(
+                    "DELETE FROM jobs WHERE created_at < ?",
+                    (now - self.max_age_seconds,),
+                )
+            connection.execute(
+                "INSERT INTO jobs (id, status, created_at) VALUES (?, ?, ?)",
+                (job_id, JOB_QUEUED, now),
+            )
+
+    def get(self, job_id: str) -> Union[Dict[str, Any], None]:
+        with self._connect() as connection:
+            connection.row_factory = sqlite3.Row
+            row = connection.execute(
+                "SELECT * FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+
+        job = dict(row)
+        job["phases"] = json.loads(job["phases"])
+        job["cancel_requested"] = bool(job["cancel_requested"])
+        return job
+
+    def is_cancel_requested(self, job_id: str) -> bool:
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        return row is not None and bool(row[0])
+
+    def request_cancel(self, job_id: str) -> None:
+        with self._connect() as connection:
+            connection.execute(
+                "UPDATE jobs SET cancel_requested = 1 WHERE id = ?", (job_id,)
+            )
+
+    def start_phase(self, job_id: str, name: str) -> None:
+        self._update_phases(
+            job_id, lambda phases: phases + [{"name": name, "started_at": time.time()}]
+        )
+
+    def finish_phase(self, job_id: str, name: str, failed: bool = False) -> None:
+        def finish(phases: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+            for phase in reversed(phases):
+                if phase["name"] == name and "finished_at" not in phase:
+                    phase["finished_at"] = time.time()
+                    phase["duration_seconds"] = (
+                        phase["finished_at"] - phase["started_at"]
+                    )
+                    if failed:
+                        phase["failed"] = True
+                    break
+            return phases
+
+        self._update_phases(job_id, finish)
+
+    def _update_phases(self, job_id: str, update) -> None:
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT phases FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+            if row is None:
+                return
+            phases = update(json.loads(row[0]))
+            # the first reported phase moves a queued job to running
+            connection.execute(
+                "UPDATE jobs SET phases = ?, status = CASE WHEN status = ? THEN ? ELSE status END WHERE id = ?",
+                (json.dumps(phases), JOB_QUEUED, JOB_RUNNING, job_id),
+            )
+
+    def finish(
+        self,
+        job_id: str,
+        status: str,
+        diagram_url: Union[str, None] = None,
+        error: Union[str, None] = None,
+    ) -> None:
+        with self._connect() as connection:
+            connection.execute(
+                "UPDATE jobs SET status = ?, finished_at = ?, diagram_url = ?, error = ? WHERE id = ?",
+                (status, time.time(), diagram_url, error, job_id),
+            )
+
+
+class JobProgress(PipelineProgress):
+    def __init__(self, store: JobStore, job_id: str):
+        self.store = store
+        self.job_id = job_id
+
+    @contextlib.contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        # cancellation is cooperative, it is honoured whenever the next phase is about to start
+        if self.store.is_cancel_requested(self.job_id):
+            raise JobCancelledError(f"Job {self.job_id} was cancelled")
+        self.store.start_phase(self.job_id, name)
+        # a phase that raised is still finished, marked as failed, so the job does not look
+        # like it is stuck in it
+        failed = True
+        try:
+            yield
+            failed = False
+        finally:
+            self.store.finish_phase(self.job_id, name, failed=failed)
@@ -0,0 +1,207 @@
+from collections import defaultdict, deque
+from typing import Dict, List, Set, Tuple
+from constants import *
+from bpmn_index import BpmnIndex
+from geometry import GeometryStore, find_nearest_tasks
+
+
+class FlowGraph:
+    # the sequence flows between the shapes of the diagram, built once for all layout steps;
+    # nodes keep the order of the document, which makes every step deterministic
+    def __init__(self, index: BpmnIndex, geometry: GeometryStore):
+        self.nodes = [
+            bpmn_element
+            for bpmn_element in geometry.shapes
+            if not bpmn_element.startswith("Lane")
+        ]
+        self.successors: Dict[str, List[str]] = defaultdict(list)
+        self.predecessors: Dict[str, List[str]] = defaultdict(list)
+        node_ids = set(self.nodes)
+        for arrow in index.sequence_flows:
+            source, target = arrow.get("sourceRef"), arrow.get("targetRef")
+            if source in node_ids and target in node_ids:
+                self.successors[source].append(target)
+                self.predecessors[target].append(source)
+
+    def get_back_edges(self, roots: List[str]) -> Set[Tuple[str, str]]:
+        # depth-first search from the roots first; an edge to a node still on the stack closes
+        # a loop and is left out of the layering
+        back_edges = set()
+        visited = set()
+        on_stack = set()
+        for root in roots + self.nodes:
+            if root in visited:
+                continue
+            visited.add(root)
+            on_stack.add(root)
+            stack = [(root, iter(self.successors[root]))]
+            while stack:
+                node, successors = stack[-1]
+                successor = next(successors, None)
+                if successor is None:
+                    stack.pop()
+                    on_stack.discard(node)
+                elif successor in on_stack:
+                    back_edges.add((node, successor))
+                elif successor not in visited:
+                    visited.add(successor)
+                    on_stack.add(successor)
+                    stack.append((successor, iter(self.successors[successor])))
+        return back_edges
+
+    def assign_layers(self, back_edges: Set[Tuple[str, str]]) -> Dict[str, int]:
+        # longest path layering: every node is one layer right of its furthest predecessor
+        in_degrees = {node: 0 for node in self.nodes}
+        for node in self.nodes:
+            for successor in self.successors[node]:
+                if (node, successor) not in back_edges:
+                    in_degrees[successor] += 1
+
+        layers = {node: 0 for node in self.nodes}
+        queue = deque(node for node in self.nodes if in_degrees[node] == 0)
+        while queue:
+            node = queue.popleft()
+            for successor in self.successors[node]:
+                if (node, successor) in back_edges:
+                    continue
+                layers[successor] = max(layers[successor], layers[node] + 1)
+                in_degrees[successor] -= 1
+                if in_degrees[successor] == 0:
+                    queue.append(successor)
+        return layers
+
+
+def get_node_lanes(
+    index: BpmnIndex,
+    graph: FlowGraph,
+    task_to_role: Dict[str, str],
+    default_lane: str,
+) -> Dict[str, str]:
+    # tasks are in the lane of their role, splits and events in the lane of the task before them
+    # and joins in the lane of the task after them, like fix_gateways does; nodes not connected
+    # to any task go to the default lane
+    node_lanes = {}
+    tasks = []
+    for task in index.tasks:
+        task_id = task.get("id")
+        if task_id in graph.successors or task_id in graph.predecessors:
+            tasks.append(task_id)
+        node_lanes[task_id] = task_to_role[task.get("name")]
+
+    other_nodes = set(graph.nodes) - set(node_lanes)
+    previous_tasks = find_nearest_tasks(tasks, graph.successors, other_nodes)
+    next_tasks = find_nearest_tasks(tasks, graph.predecessors, other_nodes)
+    converging = {
+        gateway.get("id")
+        for gateway in index.gateways
+        if gateway.get("gatewayDirection") == "Converging"
+    }
+    for node in graph.nodes:
+        if node in node_lanes:
+            continue
+        if node in converging:
+            task_id = next_tasks.get(node) or previous_tasks.get(node)
+        else:
+            task_id = previous_tasks.get(node) or next_tasks.get(node)
+        node_lanes[node] = node_lanes[task_id] if task_id is not None else default_lane
+    return node_lanes
+
+
+def order_layers(
+    graph: FlowGraph,
+    layers: Dict[str, int],
+    lane_positions: Dict[str, int],
+    back_edges: Set[Tuple[str, str]],
+    sweeps: int = LAYERED_ORDERING_SWEEPS,
+) -> List[List[str]]:
+    # nodes of a layer are kept grouped by lane and ordered within their lane by the barycenter
+    # of their neighbours in the previous layer, sweeping left to right and back again
+    layer_count = max(layers.values(), default=-1) + 1
+    ordered_layers: List[List[str]] = [[] for _ in range(layer_count)]
+    for node in graph.nodes:
+        ordered_layers[layers[node]].append(node)
+
+    positions: Dict[str, float] = {}
+
+    def sort_layer(layer: List[str], neighbours: Dict[str, List[str]]) -> None:
+        barycenters = {}
+        for node in layer:
+            neighbour_positions = [
+                positions[neighbour]
+                for neighbour in neighbours[node]
+                if (node, neighbour) not in back_edges
+                and (neighbour, node) not in back_edges
+            ]
+            if neighbour_positions:
+                barycenters[node] = sum(neighbour_positions) / len(neighbour_positions)
+            else:
+                barycenters[node] = positions[node]
+        layer.sort(key=lambda node: (lane_positions[node], barycenters[node]))
+        for position, node in enumerate(layer):
+            positions[node] = position
+
+    for layer in ordered_layers:
+        layer.sort(key=lambda node: lane_positions[node])
+        for position, node in enumerate(layer):
+            positions[node] = position
+
+    for sweep in range(sweeps):
+        if sweep % 2 == 0:
+            for layer in ordered_layers[1:]:
+                sort_layer(layer, graph.predecessors)
+        else:
+            for layer in reversed(ordered_layers[:-1]):
+                sort_layer(layer, graph.successors)
+    return ordered_layers
+
+
+def get_node_size(index: BpmnIndex, node: str) -> Tuple[float, float]:
+    element = index.get_element(node)
+    tag = element.tag if element is not None else ""
+    if tag.endswith("task"):
+        return LAYERED_TASK_WIDTH, LAYERED_TASK_HEIGHT
+    if tag.endswith("Gateway"):
+        return LAYERED_GATEWAY_SIZE, LAYERED_GATEWAY_SIZE
+    return LAYERED_EVENT_SIZE, LAYERED_EVENT_SIZE
+
+
+def place_layers(
+    index: BpmnIndex, geometry: GeometryStore, ordered_layers: List[List[str]]
+) -> None:
+    # every layer is a column as wide as the widest shape; vertical positions are only set once
+    # the lanes exist, by place_rows
+    column_width = max(LAYERED_TASK_WIDTH, LAYERED_GATEWAY_SIZE, LAYERED_EVENT_SIZE)
+    for layer_number, layer in enumerate(ordered_layers):
+        for node in layer:
+            shape = geometry.get_shape(node)
+            shape.width, shape.height = get_node_size(index, node)
+            shape.x = (
+                layer_number * (column_width + LAYERED_LAYER_GAP)
+                + (column_width - shape.width) / 2
+            )
+            shape.y = 0.0
+
+
+def place_rows(
+    geometry: GeometryStore,
+    ordered_layers: List[List[str]],
+    node_lanes: Dict[str, str],
+    role_to_vertical_position: Dict[str, float],
+) -> None:
+    # the nodes of a layer in the same lane are spread around the middle of the lane, closer
+    # together when there are more of them than fit
+    for layer in ordered_layers:
+        lane_nodes: Dict[str, List[str]] = defaultdict(list)
+        for node in layer:
+            lane_nodes[node_lanes[node]].append(node)
+
+        for role, nodes in lane_nodes.items():
+            middle = role_to_vertical_position[role] + LANE_HEIGHT / 2
+            step = min(
+                LAYERED_TASK_HEIGHT + LAYERED_NODE_GAP,
+                (LANE_HEIGHT - LAYERED_NODE_GAP) / len(nodes),
+            )
+            for position, node in enumerate(nodes):
+                shape = geometry.get_shape(node)
+                center = middle + (position - (len(nodes) - 1) / 2) * step
+                shape.y = center - shape.height / 2
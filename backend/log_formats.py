@@ -0,0 +1,205 @@
+import gzip
+import io
+import pandas as pd
+
+from typing import Dict, List, Tuple, Union
+from config import *
+from utils import LogFormatError, concat_chunks
+from sampling import CaseSample
+
+LOG_FORMAT_CSV = "csv"
+LOG_FORMAT_PARQUET = "parquet"
+LOG_FORMAT_FEATHER = "feather"
+LOG_FORMAT_XES = "xes"
+
+COMPRESSION_GZIP = "gzip"
+COMPRESSION_ZSTD = "zstd"
+
+# the longest magic number below, plus room for a BOM and whitespace in front of an XML declaration
+LOG_HEADER_SIZE = 64
+
+PARQUET_MAGIC = b"PAR1"
+# Arrow IPC files (Feather v2) and the older Feather v1 files
+FEATHER_MAGICS = (b"ARROW1", b"FEA1")
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+# CSV logs are streamed in chunks of that many rows when a sample is taken, unless CSV_CHUNK_SIZE is set
+SAMPLE_CHUNK_SIZE = 100_000
+
+# an uploaded log is either kept in memory or, above UPLOAD_MEMORY_LIMIT_BYTES, in a temp file
+LogSource = Union[str, bytes]
+
+
+def import_optional(module_name: str, log_format: str):
+    # pyarrow and zstandard come with the Pipfile, but are only needed for some formats, so an
+    # environment without them still reads the other ones
+    try:
+        return __import__(module_name, fromlist=["*"])
+    except ImportError as e:
+        raise LogFormatError(
+            f"Reading {log_format} logs needs the '{module_name.split('.')[0]}' package installed"
+        ) from e
+
+
+def read_log_header(log_source: LogSource) -> bytes:
+    if isinstance(log_source, bytes):
+        return log_source[:LOG_HEADER_SIZE]
+    with open(log_source, "rb") as log_file:
+        return log_file.read(LOG_HEADER_SIZE)
+
+
+def is_xml(header: bytes) -> bool:
+    return header.lstrip(b"\xef\xbb\xbf \t\r\n").startswith(b"<")
+
+
+def open_decompressed(log_source: LogSource, compression: str) -> io.BufferedIOBase:
+    if isinstance(log_source, bytes):
+        log_source = io.BytesIO(log_source)
+    if compression == COMPRESSION_GZIP:
+        return gzip.open(log_source)
+    zstandard = import_optional("zstandard", "zstd compressed")
+    raw = log_source if isinstance(log_source, io.BytesIO) else open(log_source, "rb")
+    return zstandard.ZstdDecompressor().stream_reader(
+        raw, read_across_frames=True, closefd=True
+    )
+
+
+def detect_log_format(log_source: LogSource) -> Tuple[str, Union[str, None]]:
+    # the format is taken from the content, so uploads do not depend on the file name
+    header = read_log_header(log_source)
+    if header.startswith(PARQUET_MAGIC):
+        return LOG_FORMAT_PARQUET, None
+    if header.startswith(FEATHER_MAGICS):
+        return LOG_FORMAT_FEATHER, None
+
+    compression = None
+    if header.startswith(GZIP_MAGIC):
+        compression = COMPRESSION_GZIP
+    elif header.startswith(ZSTD_MAGIC):
+        compression = COMPRESSION_ZSTD
+    if compression is not None:
+        with open_decompressed(log_source, compression) as log_file:
+            header = log_file.read(LOG_HEADER_SIZE)
+
+    if is_xml(header):
+        return LOG_FORMAT_XES, compression
+    return LOG_FORMAT_CSV, compression
+
+
+def read_csv_log(
+    log_source: LogSource,
+    columns: Union[List[str], None],
+    dtype: Dict[str, str],
+    compression: Union[str, None],
+    sample: Union[CaseSample, None] = None,
+) -> pd.DataFrame:
+    if isinstance(log_source, bytes):
+        log_source = io.BytesIO(log_source)
+    if compression == COMPRESSION_ZSTD:
+        import_optional("zstandard", "zstd compressed")
+
+    if sample is not None:
+        # the sample is taken chunk by chunk, so the whole log is never held in memory
+        chunks = pd.read_csv(
+            log_source,
+            usecols=columns,
+            dtype=dtype,
+            compression=compression,
+            chunksize=CSV_CHUNK_SIZE or SAMPLE_CHUNK_SIZE,
+        )
+        return sample.finish(concat_chunks([sample.filter(chunk) for chunk in chunks]))
+    if CSV_ENGINE == "pyarrow":
+        return pd.read_csv(
+            log_source,
+            usecols=columns,
+            dtype=dtype,
+            compression=compression,
+            engine="pyarrow",
+        )
+    if CSV_CHUNK_SIZE is not None:
+        chunks = pd.read_csv(
+            log_source,
+            usecols=columns,
+            dtype=dtype,
+            compression=compression,
+            chunksize=CSV_CHUNK_SIZE,
+        )
+        return concat_chunks(list(chunks))
+    return pd.read_csv(
+        log_source, usecols=columns, dtype=dtype, compression=compression
+    )
+
+
+def read_arrow_log(
+    log_source: LogSource, columns: Union[List[str], None], log_format: str
+) -> pd.DataFrame:
+    pyarrow = import_optional("pyarrow", log_format)
+    if log_format == LOG_FORMAT_PARQUET:
+        reader = import_optional("pyarrow.parquet", log_format)
+    else:
+        reader = import_optional("pyarrow.feather", log_format)
+
+    # files are memory-mapped and buffers are wrapped without a copy; only the needed
+    # columns are read in both cases
+    if isinstance(log_source, bytes):
+        source, memory_map = pyarrow.BufferReader(log_source), False
+    else:
+        source, memory_map = log_source, True
+
+    try:
+        table = reader.read_table(source, columns=columns, memory_map=memory_map)
+    except (pyarrow.ArrowException, KeyError) as e:
+        raise LogFormatError(f"Cannot read {log_format} log: {e}") from e
+    return table.to_pandas()
+
+
+def read_xes_log(log_source: LogSource, compression: Union[str, None]) -> pd.DataFrame:
+    import pm4py
+    from pm4py.objects.log.importer.xes import importer as xes_importer
+
+    if compression is not None:
+        with open_decompressed(log_source, compression) as log_file:
+            content = log_file.read()
+    elif isinstance(log_source, bytes):
+        content = log_source
+    else:
+        with open(log_source, "rb") as log_file:
+            content = log_file.read()
+
+    try:
+        event_log = xes_importer.deserialize(content)
+    except Exception as e:
+        raise LogFormatError(f"Cannot read XES log: {e}") from e
+    return pm4py.convert_to_dataframe(event_log)
+
+
+def read_log(
+    log_source: LogSource,
+    columns: Union[List[str], None] = None,
+    categorical_columns: Union[List[str], None] = None,
+    sample: Union[CaseSample, None] = None,
+) -> pd.DataFrame:
+    dtype = {column: "category" for column in categorical_columns or []}
+    log_format, compression = detect_log_format(log_source)
+
+    if log_format == LOG_FORMAT_CSV:
+        return read_csv_log(log_source, columns, dtype, compression, sample)
+
+    if log_format == LOG_FORMAT_XES:
+        dataframe = read_xes_log(log_source, compression)
+    else:
+        dataframe = read_arrow_log(log_source, columns, log_format)
+
+    if columns is not None:
+        missing_columns = [
+            column for column in columns if column not in dataframe.columns
+        ]
+        if missing_columns:
+            raise LogFormatError(
+                f"Columns missing from the {log_format} log: {missing_columns}"
+            )
+        dataframe = dataframe[columns]
+    if sample is not None:
+        dataframe = sample.finish(sample.filter(dataframe))
+    return dataframe.astype(dtype)
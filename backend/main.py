@@ -1,591 +1,452 @@
 from utils import *
-from fastapi import FastAPI, File, UploadFile, Form
-from fastapi.responses import FileResponse, JSONResponse
+from config import *
+from cache import (
+    copy_file_with_digest,
+    is_cache_key,
+    make_cache_key,
+    read_file_with_digest,
+)
+from workers import GenerationPool, PoolSaturatedError
+from jobs import *
+from log_formats import LogSource
+from incremental import LogStateMismatchError, remove_log_state
+from metrics import MetricsRegistry, format_log_line, format_server_timing
+from render import PREVIEW_MEDIA_TYPES, RenderError, render_preview
+from pipeline import *
+from fastapi import FastAPI, File, UploadFile, Form, HTTPException, Depends
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
+from contextlib import asynccontextmanager
+from collections import defaultdict
+from typing import Any
 import uvicorn
-import shutil
+import asyncio
 import os
 import uuid
-import random
-
-
-STATIC_FILES_DIR = "generated_bpmns"
-os.makedirs(STATIC_FILES_DIR, exist_ok=True)
-
+import time
 
-def cleanup_all_static_bpmn_files():
-    if os.path.exists(STATIC_FILES_DIR):
-        for filename in os.listdir(STATIC_FILES_DIR):
-            file_path = os.path.join(STATIC_FILES_DIR, filename)
+METRICS_REGISTRY = MetricsRegistry()
+GENERATION_POOL = GenerationPool(
+    max_workers=WORKER_PROCESSES, max_queued=WORKER_QUEUE_SIZE
+)
+JOB_STORE = JobStore(JOB_DATABASE_PATH, max_age_seconds=JOB_TTL_SECONDS)
+# keeps references to the background tasks of jobs started by this process
+RUNNING_JOBS: Dict[str, asyncio.Task] = {}
+# updates of the same incremental log are applied one after the other; across server processes
+# this is done by the file lock taken in run_incremental_generation_logic, the lock here only
+# keeps the requests of this process from taking more than one worker while they wait
+LOG_STATE_LOCKS: Dict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+
+for cache in (RESULT_CACHE, MODEL_CACHE, LOG_STATE_CACHE):
+    cache.create_directory()
+
+
+async def evict_caches_periodically() -> None:
+    # eviction walks the cache directories, so it runs off the request path; with several server
+    # processes every one of them runs it, which is harmless as all state is in the files
+    while True:
+        await asyncio.sleep(CACHE_EVICTION_INTERVAL_SECONDS)
+        for cache in (RESULT_CACHE, MODEL_CACHE, LOG_STATE_CACHE):
             try:
-                if os.path.isfile(file_path) or os.path.islink(file_path):
-                    os.unlink(file_path)
-                    print(f"INFO: Deleted {file_path}.")
-            except Exception as e:
-                print(f"ERROR: Failed to delete {file_path}. Reason: {e}")
-    else:
-        print(f"INFO: Directory {STATIC_FILES_DIR} not found, no cleanup needed.")
-
-
-def parse_bpmn_file(bpmn_file_path: Union[str, None]) -> ET.ElementTree:
-    if bpmn_file_path is None:
-        bpmn_file_path = "input_diagram.bpmn"
-    tree = ET.parse(bpmn_file_path)
-    return tree
-
-
-def create_bpmn_from_dataframe(
-    dataframe: pd.DataFrame,
-    case_id_key: str = "Case ID",
-    activity_key: str = "Activity",
-    timestamp_key: str = "Timestamp",
-) -> pm4py.BPMN:
-    dataframe = pm4py.format_dataframe(
-        dataframe,
-        case_id=case_id_key,
-        activity_key=activity_key,
-        timestamp_key=timestamp_key,
-    )
-    event_log = pm4py.convert_to_event_log(dataframe)
-    bpmn_model = pm4py.discover_bpmn_inductive(event_log)
-    return bpmn_model
-
-
-def convert_log_to_dataframe(log_path: str) -> pd.DataFrame:
-    dataframe = pd.read_csv(log_path)
-    return dataframe
-
-
-def convert_log_to_bpmn(
-    log_path,
-    case_id_field_name,
-    activity_field_name,
-    timestamp_field_name,
-    path_to_save_bpmn="input_diagram.bpmn",
-) -> pd.DataFrame:
-    dataframe = convert_log_to_dataframe(log_path)
-    bpmn_model = create_bpmn_from_dataframe(
-        dataframe, case_id_field_name, activity_field_name, timestamp_field_name
-    )
-    pm4py.write_bpmn(bpmn_model, path_to_save_bpmn)
-    return dataframe
-
-
-def add_roles_to_bpmn(
-    root: ET.Element, task_to_role: Dict[str, str]
-) -> Dict[str, float]:
-
-    add_lane_set(root, "custom_laneSet")
-
-    unique_roles = set(task_to_role.values())
-    role_to_vertical_position = {}
-    for role in unique_roles:
-        lane = add_lane(root, role)
-        _, y, bpmn_lane_id = add_lane_di(root, lane)
-        role = find_element_by_id(root, bpmn_lane_id)
-        role_to_vertical_position[role.get("name")] = y
-
-    return role_to_vertical_position
-
-
-def fix_tasks(
-    root: ET.Element,
-    role_to_vertical_position: Dict[str, float],
-    task_to_role: Dict[str, str],
-) -> Dict[str, float]:
-    tasks = get_all_tasks(root)
-    task_to_vertical_position = {}
-    for task in tasks:
-        task_id = task.get("id")
-        task_name = task.get("name")
-
-        bpmn_shape = find_bpmn_shape_by_bpmn_element(root, task_id)
-        bounds = bpmn_shape.findall("omgdc:Bounds", NS)[0]
-        bpmn_shape.remove(bounds)
-        role = task_to_role[task_name]
-        create_bounds_element(
-            parent=bpmn_shape,
-            x=float(bounds.get("x")),
-            y=role_to_vertical_position[role] + LANE_HEIGHT // 2 - 18,
-            width=float(bounds.get("width")),
-            height=float(bounds.get("height")),
-        )
-        task_to_vertical_position[task] = (
-            role_to_vertical_position[role] + LANE_HEIGHT // 2
-        )
+                await run_in_threadpool(cache.evict)
+            except OSError as e:
+                print(f"ERROR: Failed to evict {cache.directory}. Reason: {e}")
 
-    return task_to_vertical_position
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    GENERATION_POOL.start()
+    eviction = asyncio.create_task(evict_caches_periodically())
+    yield
+    eviction.cancel()
+    GENERATION_POOL.shutdown()
 
-def fix_starting_node(
-    root: ET.Element, task_to_vertical_position: Dict[ET.Element, float]
-) -> None:
 
-    start_event = find_bpmn_start_event(root)
-    bpmn_element = find_element_by_id(root, start_event.get("id"))
-    find_bpmn_shape_by_bpmn_element(root, bpmn_element)
-
-    tasks = task_to_vertical_position.keys()
-    bpmn_shapes = [
-        find_bpmn_shape_by_bpmn_element(root, task.get("id")) for task in tasks
-    ]
-    bounds_of_shapes = [shape.findall("omgdc:Bounds", NS)[0] for shape in bpmn_shapes]
-    x = float("inf")
-    right_y = float("inf")
-    for bound in bounds_of_shapes:
-        if float(bound.get("x")) < x:
-            x = float(bound.get("x"))
-            right_y = float(bound.get("y"))
-    bpmn_shape = find_bpmn_shape_by_bpmn_element(root, bpmn_element.get("id"))
-    bounds = bpmn_shape.findall("omgdc:Bounds", NS)[0]
-    bpmn_shape.remove(bounds)
-    create_bounds_element(
-        parent=bpmn_shape,
-        x=bounds.get("x"),
-        y=right_y,
-        width=bounds.get("width"),
-        height=bounds.get("height"),
-    )
+app = FastAPI(lifespan=lifespan)
 
+origins = [
+    "http://localhost:5173",
+    "http://localhost:3000",
+    "http://127.0.0.1:5173",
+    "http://localhost:8000",
+]
 
-def find_closest_left_task(root, tuples_of_positions_for_task, gateway_bounds):
-    found_x = float("inf")
-    found_y = float("inf")
-
-    gateway_x = float(gateway_bounds.get("x"))
-    gateway_y = float(gateway_bounds.get("y"))
-    for x, y in tuples_of_positions_for_task:
-        if abs(x - gateway_x) < abs(found_x - gateway_x):
-            found_x = x
-            found_y = y
-
-    if found_y == float("inf"):
-        start_event = find_bpmn_start_event(root)
-        bpmn_shape = find_bpmn_shape_by_bpmn_element(root, start_event.get("id"))
-        bounds = bpmn_shape.findall("omgdc:Bounds", NS)[0]
-        found_x = bounds.get("x")
-        found_y = bounds.get("y")
-
-    return found_x, found_y
-
-
-def fix_gateways(root: ET.Element, task_to_vertical_position):
-    tasks = task_to_vertical_position.keys()
-
-    bpmn_shapes = [
-        find_bpmn_shape_by_bpmn_element(root, task.get("id")) for task in tasks
-    ]
-
-    bounds_of_shapes = [shape.findall("omgdc:Bounds", NS)[0] for shape in bpmn_shapes]
-    tuples_of_positions_for_tasks = [
-        (float(bounds.get("x")), float(bounds.get("y"))) for bounds in bounds_of_shapes
-    ]
-
-    gateways = []
-    for item in root.iter():
-        if item.tag.endswith("exclusiveGateway") or item.tag.endswith(
-            "parallelGateway"
-        ):
-            gateways.append(item)
-
-    positions = []
-    gateway_shapes = []
-    for gateway in gateways:
-        gateway_shape = find_bpmn_shape_by_bpmn_element(root, gateway.get("id"))
-        gateway_bounds = gateway_shape.findall("omgdc:Bounds", NS)[0]
-        x, y = find_closest_left_task(
-            root, tuples_of_positions_for_tasks, gateway_bounds
-        )
-        gateway_shapes.append(gateway_shape)
-        positions.append((x, y))
-
-    for gateway_shape, (desired_x, desired_y) in zip(gateway_shapes, positions):
-        bounds = gateway_shape.findall("omgdc:Bounds", NS)[0]
-        gateway_shape.remove(bounds)
-
-        create_bounds_element(
-            parent=gateway_shape,
-            x=float(bounds.get("x")),
-            y=desired_y,
-            width=float(bounds.get("width")),
-            height=float(bounds.get("height")),
-        )
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=origins,
+    allow_credentials=True,
+    allow_methods=["GET", "POST", "DELETE"],
+    expose_headers=["Server-Timing"],
+    allow_headers=["Content-Type"],
+)
 
+app.mount(
+    f"/{STATIC_FILES_DIR}", StaticFiles(directory=STATIC_FILES_DIR), name="static_files"
+)
 
-def fix_ending_node(
-    root: ET.Element, task_to_vertical_position: Dict[ET.Element, float]
-) -> None:
 
-    start_event = find_bpmn_end_event(root)
-    bpmn_element = find_element_by_id(root, start_event.get("id"))
-    find_bpmn_shape_by_bpmn_element(root, bpmn_element)
-
-    tasks = task_to_vertical_position.keys()
-    bpmn_shapes = [
-        find_bpmn_shape_by_bpmn_element(root, task.get("id")) for task in tasks
-    ]
-    bounds_of_shapes = [shape.findall("omgdc:Bounds", NS)[0] for shape in bpmn_shapes]
-    x = -float("inf")
-    right_y = float("inf")
-    for bound in bounds_of_shapes:
-        if float(bound.get("x")) > x:
-            x = float(bound.get("x"))
-            right_y = float(bound.get("y"))
-    bpmn_shape = find_bpmn_shape_by_bpmn_element(root, bpmn_element.get("id"))
-    bounds = bpmn_shape.findall("omgdc:Bounds", NS)[0]
-    bpmn_shape.remove(bounds)
-    create_bounds_element(
-        parent=bpmn_shape,
-        x=bounds.get("x"),
-        y=right_y,
-        width=bounds.get("width"),
-        height=bounds.get("height"),
+def generation_parameters(
+    role_field_name: str = Form("Resource"),
+    activity_field_name: str = Form("Activity"),
+    case_id_field_name: str = Form("Case ID"),
+    timestamp_field_name: str = Form("Start Timestamp"),
+    role_conflict_policy: str = Form(DEFAULT_ROLE_CONFLICT_POLICY),
+    lane_order: str = Form(DEFAULT_LANE_ORDER),
+    layout: str = Form(DEFAULT_LAYOUT),
+    timestamp_format: Union[str, None] = Form(None),
+    miner: str = Form(DEFAULT_MINER),
+    noise_threshold: float = Form(DEFAULT_NOISE_THRESHOLD),
+    max_variants: Union[int, None] = Form(None),
+    variant_coverage: Union[float, None] = Form(None),
+    sample: Union[float, None] = Form(None),
+    sample_seed: int = Form(0),
+) -> Dict[str, Union[str, float, None]]:
+    parameters = {
+        "role_field_name": role_field_name,
+        "activity_field_name": activity_field_name,
+        "case_id_field_name": case_id_field_name,
+        "timestamp_field_name": timestamp_field_name,
+        "role_conflict_policy": role_conflict_policy,
+        "lane_order": lane_order,
+        "layout": layout,
+        "timestamp_format": timestamp_format,
+        "miner": miner,
+        "noise_threshold": noise_threshold,
+        "max_variants": max_variants,
+        "variant_coverage": variant_coverage,
+        "sample": sample,
+        "sample_seed": sample_seed,
+    }
+    try:
+        check_generation_parameters(**parameters)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return parameters
+
+
+def get_upload_size(csv_file: UploadFile) -> int:
+    if csv_file.size is not None:
+        return csv_file.size
+    size = csv_file.file.seek(0, os.SEEK_END)
+    csv_file.file.seek(0)
+    return size
+
+
+async def receive_upload(csv_file: UploadFile) -> Tuple[LogSource, str]:
+    # small logs are handed to the workers as bytes, only big ones are copied to disk;
+    # requests run concurrently, so uploads with the same file name must not share a temp file
+    if get_upload_size(csv_file) <= UPLOAD_MEMORY_LIMIT_BYTES:
+        return await run_in_threadpool(read_file_with_digest, csv_file.file)
+
+    log_source = f"temp_{uuid.uuid4()}.log"
+    with open(log_source, "wb") as buffer:
+        log_digest = await run_in_threadpool(
+            copy_file_with_digest, csv_file.file, buffer
+        )
+    return log_source, log_digest
+
+
+def get_cache_keys(
+    log_digest: str, parameters: Dict[str, Union[str, float, None]]
+) -> Tuple[str, str]:
+    cache_key = make_cache_key(log_digest, **parameters)
+    model_cache_key = make_cache_key(
+        log_digest,
+        activity_field_name=parameters["activity_field_name"],
+        case_id_field_name=parameters["case_id_field_name"],
+        timestamp_field_name=parameters["timestamp_field_name"],
+        timestamp_format=parameters["timestamp_format"],
+        miner=parameters["miner"],
+        noise_threshold=parameters["noise_threshold"],
+        max_variants=parameters["max_variants"],
+        variant_coverage=parameters["variant_coverage"],
+        sample=parameters["sample"],
+        sample_seed=parameters["sample_seed"],
+        layout=parameters["layout"],
     )
+    return cache_key, model_cache_key
 
 
-def fix_overlaps(root):
-    bpmn_plane = find_BPMN_plane(root)
-    shapes = []
-    for item in bpmn_plane.iter():
-        if item.tag.endswith("BPMNShape") and not item.get("bpmnElement").startswith(
-            "Lane"
-        ):
-            shapes.append(item)
-
-    bounds_list = []
-    for shape in shapes:
-        bounds = shape.findall(f"omgdc:Bounds", NS)[0]
-        bounds_list.append(bounds)
-
-    possible_conflicts = []
-    for shape, bounds in zip(shapes, bounds_list):
-        possible_conflict = []
-        for other_shape, other_bounds in zip(shapes, bounds_list):
-            if shape.get("id") == other_shape.get("id"):
-                continue
-            if (
-                (
-                    abs(float(bounds.get("x")) - float(other_bounds.get("x")))
-                    < MAXIMUM_HORIZONTAL_DIFF_TO_FIX_LAYOUT
-                )
-            ) and (
-                abs(float(bounds.get("y")) - float(other_bounds.get("y")))
-                < MAXIMUM_VERTICAL_DIFF_TO_FIX_LAYOUT
-            ):
-                possible_conflict.append(other_shape)
-        possible_conflict.append(shape)
-        possible_conflicts.append(possible_conflict)
-    possible_conflicts = [
-        possible_conflict
-        for possible_conflict in possible_conflicts
-        if len(possible_conflict) > 1
-    ]
-
-    for possible_conflict in possible_conflicts:
-        if len(possible_conflict) == 2:
-            shape1 = possible_conflict[0]
-            shape2 = possible_conflict[1]
-
-            bounds1 = shape1.findall(f"{{{NS['omgdc']}}}Bounds")[0]
-            bounds2 = shape2.findall(f"{{{NS['omgdc']}}}Bounds")[0]
-
-            if shape1.get("id") == shape2.get("id"):
-                continue
-
-            # case already solved
-            if (
-                abs(float(bounds1.get("y")) - float(bounds2.get("y")))
-                > MAXIMUM_VERTICAL_DIFF_TO_FIX_LAYOUT
-            ):
-                continue
-
-            shape1.remove(bounds1)
-            shape2.remove(bounds2)
-
-            bigger_height = max(
-                float(bounds1.get("height")), float(bounds2.get("height"))
-            )
+def describe_sample(
+    parameters: Dict[str, Union[str, float, None]],
+) -> Union[Dict[str, Union[int, float, None]], None]:
+    case_sample = make_case_sample(
+        parameters["case_id_field_name"],
+        parameters["sample"],
+        parameters["sample_seed"],
+    )
+    return case_sample.describe() if case_sample is not None else None
+
+
+def observe_generation(
+    report: Union[Dict[str, Any], None], wall_seconds: float
+) -> Dict[str, str]:
+    # returns the headers to send with the response
+    if report is None:
+        return {}
+    report["total_wall_seconds"] = wall_seconds
+    if METRICS_ENDPOINT:
+        METRICS_REGISTRY.observe(report)
+    if METRICS_LOG:
+        print(f"INFO: Generation metrics {format_log_line(report)}")
+    if METRICS_SERVER_TIMING:
+        return {"Server-Timing": format_server_timing(report)}
+    return {}
+
+
+def get_diagram_url(cache_key: str) -> str:
+    return (
+        f"{PUBLIC_BASE_URL}/{STATIC_FILES_DIR}/{RESULT_CACHE.get_filename(cache_key)}"
+    )
 
-            create_bounds_element(
-                parent=shape1,
-                x=float(bounds1.get("x")),
-                y=float(bounds1.get("y")) - LANE_HEIGHT / 4,
-                width=float(bounds1.get("width")),
-                height=float(bounds1.get("height")),
-            )
 
-            create_bounds_element(
-                parent=shape2,
-                x=float(bounds2.get("x")),
-                y=float(bounds2.get("y")) + LANE_HEIGHT / 4,
-                width=float(bounds2.get("width")),
-                height=float(bounds2.get("height")),
-            )
+def get_preview_url(cache_key: str) -> str:
+    return f"{PUBLIC_BASE_URL}/diagrams/{cache_key}/preview"
 
-        if len(possible_conflict) == 3:
-            shape1 = possible_conflict[0]
-            shape2 = possible_conflict[1]
-            shape3 = possible_conflict[2]
-
-            bounds1 = shape1.findall(f"{{{NS['omgdc']}}}Bounds")[0]
-            bounds2 = shape2.findall(f"{{{NS['omgdc']}}}Bounds")[0]
-            bounds3 = shape3.findall(f"{{{NS['omgdc']}}}Bounds")[0]
-
-            if (
-                shape1.get("id") == shape2.get("id")
-                or shape2.get("id") == shape3.get("id")
-                or shape1.get("id") == shape3.get("id")
-            ):
-                continue
-
-            # case already solved
-            if (
-                abs(float(bounds1.get("y")) - float(bounds2.get("y")))
-                > MAXIMUM_VERTICAL_DIFF_TO_FIX_LAYOUT
-            ):
-                continue
-
-            if (
-                abs(float(bounds2.get("y")) - float(bounds3.get("y")))
-                > MAXIMUM_VERTICAL_DIFF_TO_FIX_LAYOUT
-            ):
-                continue
-
-            if (
-                abs(float(bounds1.get("y")) - float(bounds3.get("y")))
-                > MAXIMUM_VERTICAL_DIFF_TO_FIX_LAYOUT
-            ):
-                continue
-
-            shape1.remove(bounds1)
-            shape3.remove(bounds3)
-            bigger_height = max(
-                float(bounds1.get("height")),
-                float(bounds2.get("height")),
-                float(bounds3.get("height")),
-            )
 
-            create_bounds_element(
-                parent=shape1,
-                x=float(bounds1.get("x")),
-                y=float(bounds1.get("y")) - bigger_height,
-                width=float(bounds1.get("width")),
-                height=float(bounds1.get("height")),
-            )
+def remove_temp_file(log_source: LogSource) -> None:
+    if isinstance(log_source, str) and os.path.exists(log_source):
+        os.remove(log_source)
 
-            create_bounds_element(
-                parent=shape3,
-                x=float(bounds3.get("x")),
-                y=float(bounds3.get("y")) + bigger_height,
-                width=float(bounds3.get("width")),
-                height=float(bounds3.get("height")),
-            )
 
+def saturated_pool_exception(e: PoolSaturatedError) -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail=f"{e}, please try again later",
+        headers={"Retry-After": str(RETRY_AFTER_SECONDS)},
+    )
 
-def fix_waypoints(root):
 
-    arrows = []
-    for item in root.iter():
-        if item.tag.endswith("sequenceFlow"):
-            arrows.append(item)
+@app.post("/generate_bpmn/")
+async def generate_bpmn_api(
+    csv_file: UploadFile = File(...),
+    parameters: Dict[str, Union[str, float, None]] = Depends(generation_parameters),
+):
+    log_source, log_digest = await receive_upload(csv_file)
+    cache_key, model_cache_key = get_cache_keys(log_digest, parameters)
+    # the sample is deterministic, so the same request can later be repeated without it
+    content = {
+        "diagram_url": get_diagram_url(cache_key),
+        "preview_url": get_preview_url(cache_key),
+        "sample": describe_sample(parameters),
+    }
 
-    sources = []
-    targets = []
-    graphical_arrows = []
-    for arrow in arrows:
-        sources.append(find_bpmn_shape_by_bpmn_element(root, arrow.get("sourceRef")))
-        targets.append(find_bpmn_shape_by_bpmn_element(root, arrow.get("targetRef")))
-        graphical_arrows.append(find_bpmn_edge_by_bpmn_element(root, arrow.get("id")))
+    try:
+        if RESULT_CACHE.get(cache_key) is not None:
+            print(f"INFO: Serving cached diagram {cache_key}.")
+            METRICS_REGISTRY.increment("result_cache_hits")
+            headers = {}
+            if METRICS_SERVER_TIMING:
+                headers["Server-Timing"] = 'cache;desc="hit"'
+            return JSONResponse(content=content, headers=headers)
+
+        # the total includes the time spent waiting for a free worker
+        start = time.perf_counter()
+        report = await GENERATION_POOL.run(
+            run_bpmn_generation_logic,
+            log_source=log_source,
+            output_bpmn_path=RESULT_CACHE.get_path(cache_key),
+            model_cache_key=model_cache_key,
+            output_svg_path=get_svg_output_path(cache_key),
+            **parameters,
+        )
+        headers = observe_generation(report, time.perf_counter() - start)
 
-    for graphical_arrow, graphical_source, graphical_target in zip(
-        graphical_arrows, sources, targets
-    ):
-        waypoints = graphical_arrow.findall(f"ns6:waypoint", NS)
+        return JSONResponse(content=content, headers=headers)
 
-        for waypoint in waypoints:
-            graphical_arrow.remove(waypoint)
+    except (TaskRoleConflictError, LogFormatError) as e:
+        raise HTTPException(status_code=422, detail=str(e))
 
-        waypoints = [
-            (float(waypoint.get("x")), float(waypoint.get("y")))
-            for waypoint in waypoints
-        ]
+    except PoolSaturatedError as e:
+        raise saturated_pool_exception(e)
 
-        source_bounds = graphical_source.find("omgdc:Bounds", NS)
-        target_bounds = graphical_target.find("omgdc:Bounds", NS)
+    finally:
+        remove_temp_file(log_source)
 
-        source_x = float(source_bounds.get("x")) + float(source_bounds.get("width"))
-        target_x = float(target_bounds.get("x"))
 
-        source_y = (
-            float(source_bounds.get("y")) + float(source_bounds.get("height")) / 2
-        )
-        target_y = (
-            float(target_bounds.get("y")) + float(target_bounds.get("height")) / 2
+async def run_job(
+    job_id: str,
+    log_source: LogSource,
+    cache_key: str,
+    model_cache_key: str,
+    parameters: Dict[str, Union[str, float, None]],
+) -> None:
+    try:
+        start = time.perf_counter()
+        report = await GENERATION_POOL.run(
+            run_bpmn_generation_logic,
+            log_source=log_source,
+            output_bpmn_path=RESULT_CACHE.get_path(cache_key),
+            model_cache_key=model_cache_key,
+            output_svg_path=get_svg_output_path(cache_key),
+            progress=JobProgress(JOB_STORE, job_id),
+            **parameters,
         )
+        observe_generation(report, time.perf_counter() - start)
+        JOB_STORE.finish(job_id, JOB_DONE, diagram_url=get_diagram_url(cache_key))
 
-        start = (
-            source_x,
-            source_y,
-        )
-        end = (
-            target_x,
-            target_y,
-        )
+    except JobCancelledError as e:
+        JOB_STORE.finish(job_id, JOB_CANCELLED, error=str(e))
 
-        new_waypoints = [start]
-        random_shift = random.randint(
-            -25, 15
-        )  # random shift to avoid arrow overlapping
-        random_bias = random.randint(1, 5)
-        if abs(source_y - target_y) < 150:  # means they are in the same lane
-            if abs(source_x - target_x) < 125:  # they are not far from each other
-                new_waypoints.append(end)
-            else:
-                new_waypoints.append(
-                    (source_x + random_bias, source_y - 80 + random_shift)
-                )
-                new_waypoints.append(
-                    (target_x - random_bias, source_y - 80 + random_shift)
-                )
-                new_waypoints.append(end)
-        else:  # nie sa w tym samym lanie
-            if source_y - target_y > 0:  # koniec jest wyzej
-                new_waypoints.append(
-                    (
-                        source_x + random_bias,
-                        source_y + 80 - abs(source_y - target_y) + random_shift,
-                    )
-                )
-                new_waypoints.append(
-                    (
-                        target_x - random_bias,
-                        source_y + 80 - abs(source_y - target_y) + random_shift,
-                    )
-                )
-                new_waypoints.append(end)
-            else:  # poczatek jest wyzej
-                new_waypoints.append(
-                    (
-                        source_x + random_bias,
-                        source_y - 80 + abs(source_y - target_y) + random_shift,
-                    )
-                )
-                new_waypoints.append(
-                    (
-                        target_x - random_bias,
-                        source_y - 80 + abs(source_y - target_y) + random_shift,
-                    )
-                )
-                new_waypoints.append(end)
-
-        for x, y in new_waypoints:
-            ET.SubElement(
-                graphical_arrow,
-                f"{{{NS['ns6']}}}waypoint",
-                {
-                    "x": str(x),
-                    "y": str(y),
-                },
-            )
+    except Exception as e:
+        print(f"ERROR: Job {job_id} failed. Reason: {e}")
+        JOB_STORE.finish(job_id, JOB_FAILED, error=str(e))
 
+    finally:
+        remove_temp_file(log_source)
+        RUNNING_JOBS.pop(job_id, None)
 
-app = FastAPI()
 
-origins = [
-    "http://localhost:5173",
-    "http://localhost:3000",
-    "http://127.0.0.1:5173",
-    "http://localhost:8000",
-]
+@app.post("/jobs/", status_code=202)
+async def create_job_api(
+    csv_file: UploadFile = File(...),
+    parameters: Dict[str, Union[str, float, None]] = Depends(generation_parameters),
+):
+    # checked up front, so a saturated server does not accept jobs it cannot queue
+    if GENERATION_POOL.is_saturated():
+        raise saturated_pool_exception(PoolSaturatedError(GENERATION_POOL.describe()))
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=origins,
-    allow_credentials=True,
-    allow_methods=["POST"],
-    allow_headers=["Content-Type"],
-)
+    log_source, log_digest = await receive_upload(csv_file)
+    cache_key, model_cache_key = get_cache_keys(log_digest, parameters)
 
-app.mount(
-    f"/{STATIC_FILES_DIR}", StaticFiles(directory=STATIC_FILES_DIR), name="static_files"
-)
+    job_id = uuid.uuid4().hex
+    JOB_STORE.create(job_id)
 
+    if RESULT_CACHE.get(cache_key) is not None:
+        remove_temp_file(log_source)
+        JOB_STORE.finish(job_id, JOB_DONE, diagram_url=get_diagram_url(cache_key))
+    else:
+        RUNNING_JOBS[job_id] = asyncio.create_task(
+            run_job(job_id, log_source, cache_key, model_cache_key, parameters)
+        )
 
-def run_bpmn_generation_logic(
-    log_path: str,
-    case_id_field_name: str,
-    activity_field_name: str,
-    timestamp_field_name: str,
-    role_field_name: str,
-    input_bpmn_path: str,
-    output_bpmn_path: str,
-):
-    dataframe = convert_log_to_bpmn(
-        log_path=log_path,
-        case_id_field_name=case_id_field_name,
-        activity_field_name=activity_field_name,
-        timestamp_field_name=timestamp_field_name,
-        path_to_save_bpmn=input_bpmn_path,
+    return JSONResponse(
+        status_code=202, content={"job_id": job_id, "status_url": f"/jobs/{job_id}"}
     )
 
-    tree = parse_bpmn_file(input_bpmn_path)
-    root = tree.getroot()
 
-    task_to_role = get_task_role_map(
-        dataframe, task_field_name=activity_field_name, role_field_name=role_field_name
-    )
-    role_to_vertical_position = add_roles_to_bpmn(root, task_to_role)
-    task_to_vertical_position = fix_tasks(root, role_to_vertical_position, task_to_role)
-    fix_starting_node(root, task_to_vertical_position)
-    fix_ending_node(root, task_to_vertical_position)
-    fix_gateways(root, task_to_vertical_position)
-    fix_overlaps(root)
-    fix_waypoints(root)
+@app.get("/jobs/{job_id}")
+async def get_job_api(job_id: str):
+    job = JOB_STORE.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return JSONResponse(content=job)
 
-    tree.write(output_bpmn_path, encoding="utf-8", xml_declaration=True)
-    return dataframe
 
+@app.delete("/jobs/{job_id}")
+async def cancel_job_api(job_id: str):
+    job = JOB_STORE.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    if job["status"] in FINISHED_JOB_STATUSES:
+        raise HTTPException(
+            status_code=409, detail=f"Job {job_id} is already {job['status']}"
+        )
 
-@app.post("/generate_bpmn/")
-async def generate_bpmn_api(
-    csv_file: UploadFile = File(...),
-    role_field_name: str = Form("Resource"),
-    activity_field_name: str = Form("Activity"),
-    case_id_field_name: str = Form("Case ID"),
-    timestamp_field_name: str = Form("Start Timestamp"),
-):
-    cleanup_all_static_bpmn_files()
+    JOB_STORE.request_cancel(job_id)
+    return JSONResponse(status_code=202, content=JOB_STORE.get(job_id))
 
-    temp_csv_path = f"temp_{csv_file.filename}"
 
-    unique_filename = f"{uuid.uuid4()}.bpmn"
-    output_bpmn_path = os.path.join(STATIC_FILES_DIR, unique_filename)
+def get_log_state_key(log_id: str) -> str:
+    # log ids come from the URL, so they are hashed instead of being used as file names
+    return make_cache_key(log_id)
 
-    with open(temp_csv_path, "wb") as buffer:
-        shutil.copyfileobj(csv_file.file, buffer)
 
-    temp_input_bpmn_path = f"temp_input_{uuid.uuid4()}.bpmn"
+@app.post("/logs/{log_id}/events/")
+async def append_log_events_api(
+    log_id: str,
+    csv_file: UploadFile = File(...),
+    parameters: Dict[str, Union[str, float, None]] = Depends(generation_parameters),
+):
+    # csv_file only holds the events appended since the last upload for log_id
+    if parameters["sample"] is not None:
+        raise HTTPException(
+            status_code=422, detail="sample is not supported for incremental logs"
+        )
+    parameters = {
+        name: value
+        for name, value in parameters.items()
+        if name not in ("sample", "sample_seed")
+    }
+    log_source, _ = await receive_upload(csv_file)
 
     try:
-        run_bpmn_generation_logic(
-            log_path=temp_csv_path,
-            case_id_field_name=case_id_field_name,
-            activity_field_name=activity_field_name,
-            timestamp_field_name=timestamp_field_name,
-            role_field_name=role_field_name,
-            input_bpmn_path=temp_input_bpmn_path,
-            output_bpmn_path=output_bpmn_path,
-        )
+        async with LOG_STATE_LOCKS[log_id]:
+            start = time.perf_counter()
+            result = await GENERATION_POOL.run(
+                run_incremental_generation_logic,
+                log_source=log_source,
+                log_state_key=get_log_state_key(log_id),
+                **parameters,
+            )
+        headers = observe_generation(result["report"], time.perf_counter() - start)
+
+        content = {
+            "diagram_url": get_diagram_url(result["cache_key"]),
+            "preview_url": get_preview_url(result["cache_key"]),
+            "log_id": log_id,
+            **result["log"],
+            "model_reused": result["model_reused"],
+            "layout_reused": result["layout_reused"],
+        }
+        return JSONResponse(content=content, headers=headers)
+
+    except LogStateMismatchError as e:
+        raise HTTPException(status_code=409, detail=str(e))
 
-        file_url = f"http://localhost:8000/{STATIC_FILES_DIR}/{unique_filename}"
-        return JSONResponse(content={"diagram_url": file_url})
+    except (TaskRoleConflictError, LogFormatError) as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    except PoolSaturatedError as e:
+        raise saturated_pool_exception(e)
 
     finally:
-        if os.path.exists(temp_csv_path):
-            os.remove(temp_csv_path)
-        if os.path.exists(temp_input_bpmn_path):
-            os.remove(temp_input_bpmn_path)
+        remove_temp_file(log_source)
+
+
+@app.delete("/logs/{log_id}")
+async def delete_log_api(log_id: str):
+    log_state_path = LOG_STATE_CACHE.get(get_log_state_key(log_id))
+    if log_state_path is None:
+        raise HTTPException(status_code=404, detail=f"Log {log_id} not found")
+    async with LOG_STATE_LOCKS[log_id]:
+        removed = await run_in_threadpool(remove_log_state, log_state_path)
+    LOG_STATE_LOCKS.pop(log_id, None)
+    if not removed:
+        raise HTTPException(status_code=404, detail=f"Log {log_id} not found")
+    return JSONResponse(content={"log_id": log_id, "deleted": True})
+
+
+@app.get("/diagrams/{cache_key}/preview")
+async def get_preview_api(cache_key: str, format: str = "svg"):
+    if format not in PREVIEW_FORMATS:
+        raise HTTPException(
+            status_code=422, detail=f"format must be one of {PREVIEW_FORMATS}"
+        )
+    # cache keys come from the URL, anything else than a key is never a file of the cache
+    bpmn_path = RESULT_CACHE.get(cache_key) if is_cache_key(cache_key) else None
+    if bpmn_path is None:
+        raise HTTPException(status_code=404, detail=f"Diagram {cache_key} not found")
+
+    # previews are rendered once and kept next to the diagram until it is evicted
+    preview_path = RESULT_CACHE.get_companion_path(cache_key, f".{format}")
+    if not os.path.exists(preview_path):
+        try:
+            await run_in_threadpool(render_preview, bpmn_path, preview_path, format)
+        except RenderError as e:
+            raise HTTPException(status_code=501, detail=str(e))
+    return FileResponse(preview_path, media_type=PREVIEW_MEDIA_TYPES[format])
+
+
+@app.get("/metrics")
+async def metrics_api():
+    if not METRICS_ENDPOINT:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return PlainTextResponse(
+        METRICS_REGISTRY.render(), media_type="text/plain; version=0.0.4"
+    )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,181 @@
+import contextlib
+import json
+import time
+import tracemalloc
+
+from collections import defaultdict
+from typing import Any, Dict, Iterator, List, Union
+from jobs import PipelineProgress
+
+try:
+    import resource
+except ImportError:
+    # not available on Windows, peak RSS is left out there
+    resource = None
+
+METRICS_PREFIX = "bpmn"
+
+
+def get_peak_rss_bytes() -> Union[int, None]:
+    if resource is None:
+        return None
+    # the peak of the whole process so far, ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class StageMetrics(PipelineProgress):
+    # wraps the progress of a run and measures every phase on the way; the report is plain data,
+    # so that it can be sent back from the worker process
+    def __init__(
+        self, progress: PipelineProgress = PipelineProgress(), trace_memory=False
+    ):
+        self.progress = progress
+        self.trace_memory = trace_memory
+        self.stages: List[Dict[str, Any]] = []
+        self.sizes: Dict[str, int] = {}
+
+    @contextlib.contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        with self.progress.phase(name):
+            if self.trace_memory:
+                if not tracemalloc.is_tracing():
+                    tracemalloc.start()
+                # nested phases reset the peak, so an enclosing phase only sees the peak after them
+                tracemalloc.reset_peak()
+            wall_start = time.perf_counter()
+            cpu_start = time.process_time()
+            yield
+            stage = {
+                "name": name,
+                "wall_seconds": time.perf_counter() - wall_start,
+                "cpu_seconds": time.process_time() - cpu_start,
+                "peak_rss_bytes": get_peak_rss_bytes(),
+            }
+            if self.trace_memory:
+                stage["peak_traced_bytes"] = tracemalloc.get_traced_memory()[1]
+            self.stages.append(stage)
+
+    def record(self, name: str, value: int) -> None:
+        self.sizes[name] = int(value)
+        self.progress.record(name, value)
+
+    def report(self) -> Dict[str, Any]:
+        return {"stages": self.stages, "sizes": self.sizes}
+
+
+def format_server_timing(report: Dict[str, Any]) -> str:
+    durations = [(stage["name"], stage["wall_seconds"]) for stage in report["stages"]]
+    if "total_wall_seconds" in report:
+        durations.append(("total", report["total_wall_seconds"]))
+    return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in durations)
+
+
+def format_log_line(report: Dict[str, Any]) -> str:
+    return json.dumps(report, sort_keys=True)
+
+
+class MetricsRegistry:
+    # aggregates the reports of all generations of this process for the /metrics endpoint;
+    # it is only updated from the event loop, so it needs no lock
+    def __init__(self):
+        self.counters: Dict[str, int] = defaultdict(int)
+        self.total_wall_seconds = 0.0
+        self.stage_runs: Dict[str, int] = defaultdict(int)
+        self.stage_wall_seconds: Dict[str, float] = defaultdict(float)
+        self.stage_cpu_seconds: Dict[str, float] = defaultdict(float)
+        self.stage_peak_rss_bytes: Dict[str, int] = defaultdict(int)
+        self.stage_peak_traced_bytes: Dict[str, int] = defaultdict(int)
+        self.sizes: Dict[str, int] = defaultdict(int)
+
+    def increment(self, name: str) -> None:
+        self.counters[name] += 1
+
+    def observe(self, report: Dict[str, Any]) -> None:
+        self.increment("generations")
+        self.total_wall_seconds += report.get("total_wall_seconds", 0.0)
+        for stage in report["stages"]:
+            name = stage["name"]
+            self.stage_runs[name] += 1
+            self.stage_wall_seconds[name] += stage["wall_seconds"]
+            self.stage_cpu_seconds[name] += stage["cpu_seconds"]
+            if stage["peak_rss_bytes"] is not None:
+                self.stage_peak_rss_bytes[name] = max(
+                    self.stage_peak_rss_bytes[name], stage["peak_rss_bytes"]
+                )
+            if "peak_traced_bytes" in stage:
+                self.stage_peak_traced_bytes[name] = max(
+                    self.stage_peak_traced_bytes[name], stage["peak_traced_bytes"]
+                )
+        for name, value in report["sizes"].items():
+            self.sizes[name] += value
+
+    def render(self) -> str:
+        # Prometheus text exposition format
+        lines = []
+
+        def add_metric(
+            name: str,
+            metric_type: str,
+            help_text: str,
+            values: Dict[str, Union[int, float]],
+            label: Union[str, None] = None,
+        ) -> None:
+            full_name = f"{METRICS_PREFIX}_{name}"
+            lines.append(f"# HELP {full_name} {help_text}")
+            lines.append(f"# TYPE {full_name} {metric_type}")
+            for key, value in sorted(values.items()):
+                labels = f'{{{label}="{key}"}}' if label is not None else ""
+                lines.append(f"{full_name}{labels} {value}")
+
+        for name, value in sorted(self.counters.items()):
+            add_metric(f"{name}_total", "counter", f"Number of {name}", {"": value})
+        add_metric(
+            "generation_wall_seconds_total",
+            "counter",
+            "Wall time of all generations, including the wait for a free worker",
+            {"": self.total_wall_seconds},
+        )
+        add_metric(
+            "stage_runs_total",
+            "counter",
+            "Number of times a stage ran",
+            self.stage_runs,
+            "stage",
+        )
+        add_metric(
+            "stage_wall_seconds_total",
+            "counter",
+            "Wall time spent in a stage",
+            self.stage_wall_seconds,
+            "stage",
+        )
+        add_metric(
+            "stage_cpu_seconds_total",
+            "counter",
+            "CPU time of the worker process spent in a stage",
+            self.stage_cpu_seconds,
+            "stage",
+        )
+        add_metric(
+            "stage_peak_rss_bytes",
+            "gauge",
+            "Highest peak RSS of a worker process at the end of a stage",
+            self.stage_peak_rss_bytes,
+            "stage",
+        )
+        if self.stage_peak_traced_bytes:
+            add_metric(
+                "stage_peak_traced_bytes",
+                "gauge",
+                "Highest peak of memory traced by tracemalloc during a stage",
+                self.stage_peak_traced_bytes,
+                "stage",
+            )
+        add_metric(
+            "input_size_total",
+            "counter",
+            "Sum of the input sizes of all generations",
+            self.sizes,
+            "metric",
+        )
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,171 @@
+import pm4py
+import numpy as np
+import pandas as pd
+
+from collections import Counter, defaultdict
+from typing import Dict, List, Tuple, Union
+from pm4py.algo.discovery.inductive.dtypes.im_ds import IMDataStructureUVCL
+from pm4py.algo.discovery.inductive.variants.im import IMUVCL
+from pm4py.algo.discovery.inductive.variants.imf import IMFUVCL
+from pm4py.objects.bpmn.obj import BPMN
+from pm4py.objects.process_tree.utils import generic as process_tree_utils
+from constants import *
+
+START_NODE = "__start__"
+END_NODE = "__end__"
+
+
+def get_trace_variants(
+    dataframe: pd.DataFrame, case_id_key: str, activity_key: str, timestamp_key: str
+) -> Counter:
+    # cases with the same sequence of activities collapse into one variant with a count, so
+    # the miners work on a few hundred sequences instead of millions of events
+    events = dataframe[[case_id_key, activity_key, timestamp_key]].sort_values(
+        [case_id_key, timestamp_key], kind="stable"
+    )
+    cases = events[case_id_key].to_numpy()
+    activities = events[activity_key].astype(str).to_numpy().tolist()
+    if len(activities) == 0:
+        return Counter()
+
+    case_starts = np.flatnonzero(np.r_[True, cases[1:] != cases[:-1]]).tolist()
+    case_bounds = zip(case_starts, case_starts[1:] + [len(activities)])
+    return Counter(tuple(activities[start:end]) for start, end in case_bounds)
+
+
+def filter_variants(
+    variants: Counter,
+    max_variants: Union[int, None] = None,
+    variant_coverage: Union[float, None] = None,
+) -> Counter:
+    # keeps the most frequent variants, at most max_variants of them and only as many as needed
+    # to cover variant_coverage of all cases
+    kept_variants = variants.most_common(max_variants)
+    if variant_coverage is not None:
+        required_cases = variant_coverage * sum(variants.values())
+        covered_cases = 0
+        for i, (_, count) in enumerate(kept_variants):
+            covered_cases += count
+            if covered_cases >= required_cases:
+                kept_variants = kept_variants[: i + 1]
+                break
+    return Counter(dict(kept_variants))
+
+
+def discover_bpmn(
+    variants: Counter,
+    miner: str = DEFAULT_MINER,
+    noise_threshold: float = DEFAULT_NOISE_THRESHOLD,
+    directly_follows: Union[Dict[Tuple[str, str], int], None] = None,
+) -> pm4py.BPMN:
+    if miner == MINER_DFG:
+        # the counts may be kept up to date by the caller instead of being counted from the variants
+        if directly_follows is None:
+            directly_follows = get_directly_follows_counts(variants)
+        return create_bpmn_from_directly_follows(
+            filter_directly_follows(directly_follows, noise_threshold)
+        )
+
+    # the same steps as pm4py.discover_bpmn_inductive, which cannot be given variants directly
+    if miner == MINER_INDUCTIVE_INFREQUENT:
+        parameters = {"noise_threshold": noise_threshold}
+        process_tree = IMFUVCL(parameters).apply(
+            IMDataStructureUVCL(variants), parameters
+        )
+    else:
+        process_tree = IMUVCL({}).apply(IMDataStructureUVCL(variants), {})
+    process_tree = process_tree_utils.fold(process_tree)
+    process_tree_utils.tree_sort(process_tree)
+    return pm4py.convert_to_bpmn(process_tree)
+
+
+def get_directly_follows_counts(variants: Counter) -> Dict[Tuple[str, str], int]:
+    # the start and end of every case are counted as arcs from START_NODE and to END_NODE
+    directly_follows: Dict[Tuple[str, str], int] = defaultdict(int)
+    for variant, count in variants.items():
+        trace = (START_NODE,) + variant + (END_NODE,)
+        for arc in zip(trace, trace[1:]):
+            directly_follows[arc] += count
+    return dict(directly_follows)
+
+
+def filter_directly_follows(
+    directly_follows: Dict[Tuple[str, str], int], noise_threshold: float
+) -> Dict[Tuple[str, str], int]:
+    # an arc is kept when it is at least noise_threshold times as frequent as the most frequent
+    # arc leaving its source; the most frequent incoming and outgoing arc of every activity is
+    # always kept, so no activity gets disconnected
+    strongest_outgoing: Dict[str, Tuple[str, str]] = {}
+    strongest_incoming: Dict[str, Tuple[str, str]] = {}
+    for arc, count in directly_follows.items():
+        source, target = arc
+        if (
+            source not in strongest_outgoing
+            or count > directly_follows[strongest_outgoing[source]]
+        ):
+            strongest_outgoing[source] = arc
+        if (
+            target not in strongest_incoming
+            or count > directly_follows[strongest_incoming[target]]
+        ):
+            strongest_incoming[target] = arc
+
+    kept_arcs = set(strongest_outgoing.values()) | set(strongest_incoming.values())
+    return {
+        arc: count
+        for arc, count in directly_follows.items()
+        if arc in kept_arcs
+        or count >= noise_threshold * directly_follows[strongest_outgoing[arc[0]]]
+    }
+
+
+def create_bpmn_from_directly_follows(
+    directly_follows: Dict[Tuple[str, str], int],
+) -> pm4py.BPMN:
+    # every activity becomes a task, and every activity with more than one successor or
+    # predecessor gets an exclusive split or join; concurrency is not detected
+    bpmn_model = BPMN()
+    nodes = {
+        START_NODE: BPMN.StartEvent(name="start"),
+        END_NODE: BPMN.NormalEndEvent(name="end"),
+    }
+
+    successors: Dict[str, List[str]] = defaultdict(list)
+    predecessors: Dict[str, List[str]] = defaultdict(list)
+    for source, target in directly_follows:
+        successors[source].append(target)
+        predecessors[target].append(source)
+        for activity in (source, target):
+            if activity not in nodes:
+                nodes[activity] = BPMN.Task(name=activity)
+    for node in nodes.values():
+        bpmn_model.add_node(node)
+
+    def add_flow(source: BPMN.BPMNNode, target: BPMN.BPMNNode) -> None:
+        bpmn_model.add_flow(BPMN.SequenceFlow(source, target))
+
+    exits = {}
+    for activity, targets in successors.items():
+        exits[activity] = nodes[activity]
+        if len(targets) > 1:
+            split = BPMN.ExclusiveGateway(
+                gateway_direction=BPMN.Gateway.Direction.DIVERGING
+            )
+            bpmn_model.add_node(split)
+            add_flow(nodes[activity], split)
+            exits[activity] = split
+
+    entries = {}
+    for activity, sources in predecessors.items():
+        entries[activity] = nodes[activity]
+        if len(sources) > 1:
+            join = BPMN.ExclusiveGateway(
+                gateway_direction=BPMN.Gateway.Direction.CONVERGING
+            )
+            bpmn_model.add_node(join)
+            add_flow(join, nodes[activity])
+            entries[activity] = join
+
+    for source, target in directly_follows:
+        add_flow(exits[source], entries[target])
+    return bpmn_model
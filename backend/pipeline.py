@@ -0,0 +1,803 @@
+from utils import *
+from config import *
+from cache import FileCache, make_cache_key, write_file_atomically
+from jobs import PipelineProgress
+from log_formats import LogSource, read_log
+from miners import (
+    discover_bpmn,
+    filter_variants,
+    get_directly_follows_counts,
+    get_trace_variants,
+)
+from sampling import CaseSample, make_case_sample
+from incremental import (
+    LogState,
+    get_model_key,
+    load_log_state,
+    lock_log_state,
+    save_log_state,
+)
+from metrics import StageMetrics
+from bpmn_index import BpmnIndex
+from canonical import canonicalize_bpmn, sort_bpmn_model
+from render import render_svg
+from geometry import (
+    GeometryStore,
+    ShapeGeometry,
+    assign_channel_tracks,
+    find_nearest_tasks,
+    find_overlapping_clusters,
+)
+from layered_layout import (
+    FlowGraph,
+    get_node_lanes,
+    order_layers,
+    place_layers,
+    place_rows,
+)
+from pm4py.objects.bpmn.exporter.variants import etree as bpmn_exporter
+from pm4py.objects.bpmn.layout import layouter as bpmn_layouter
+from collections import defaultdict
+from typing import Any, Callable
+
+# everything needed to turn a log into a diagram, shared by the API, its worker processes and the
+# batch CLI; importing it has no side effects, the cache directories are created by the server
+
+STATIC_FILES_DIR = "generated_bpmns"
+MODEL_CACHE_DIR = "mined_models"
+LOG_STATE_DIR = "log_states"
+
+
+RESULT_CACHE = FileCache(
+    STATIC_FILES_DIR,
+    suffix=".bpmn",
+    companion_suffixes=tuple(
+        f".{preview_format}" for preview_format in PREVIEW_FORMATS
+    ),
+    max_entries=RESULT_CACHE_MAX_ENTRIES,
+    max_age_seconds=RESULT_CACHE_TTL_SECONDS,
+    max_bytes=RESULT_CACHE_MAX_BYTES,
+    min_age_seconds=CACHE_MIN_AGE_SECONDS,
+)
+MODEL_CACHE = FileCache(
+    MODEL_CACHE_DIR,
+    suffix=".bpmn",
+    max_entries=MODEL_CACHE_MAX_ENTRIES,
+    max_age_seconds=MODEL_CACHE_TTL_SECONDS,
+    max_bytes=MODEL_CACHE_MAX_BYTES,
+    min_age_seconds=CACHE_MIN_AGE_SECONDS,
+)
+LOG_STATE_CACHE = FileCache(
+    LOG_STATE_DIR,
+    suffix=".pickle",
+    max_entries=LOG_STATE_MAX_ENTRIES,
+    max_age_seconds=LOG_STATE_TTL_SECONDS,
+    min_age_seconds=CACHE_MIN_AGE_SECONDS,
+)
+
+
+def serialize_bpmn_model(
+    bpmn_model: pm4py.BPMN, layout: str = DEFAULT_LAYOUT
+) -> ET.Element:
+    # same as pm4py.write_bpmn, but the XML is kept in memory instead of being written to disk;
+    # the layered layout computes all coordinates itself, so graphviz is only run for pm4py's
+    if layout == LAYOUT_PM4PY:
+        sort_bpmn_model(bpmn_model)
+        bpmn_model = bpmn_layouter.apply(bpmn_model)
+    root = parse_bpmn_string(
+        bpmn_exporter.get_xml_string(bpmn_model, parameters={"encoding": "utf-8"})
+    )
+    canonicalize_bpmn(root)
+    return root
+
+
+def parse_bpmn_string(bpmn_xml: bytes) -> ET.Element:
+    # pm4py builds its XML with prefixed tag names, so it has to be parsed once to get namespaced elements
+    return ET.fromstring(bpmn_xml)
+
+
+def write_bpmn_file(path: str, root: ET.Element) -> None:
+    write_file_atomically(
+        path, ET.tostring(root, encoding="utf-8", xml_declaration=True)
+    )
+
+
+def create_bpmn_from_dataframe(
+    dataframe: pd.DataFrame,
+    case_id_key: str = "Case ID",
+    activity_key: str = "Activity",
+    timestamp_key: str = "Timestamp",
+    miner: str = DEFAULT_MINER,
+    noise_threshold: float = DEFAULT_NOISE_THRESHOLD,
+    max_variants: Union[int, None] = None,
+    variant_coverage: Union[float, None] = None,
+    progress: PipelineProgress = PipelineProgress(),
+) -> pm4py.BPMN:
+    with progress.phase("compress"):
+        variants = get_trace_variants(
+            dataframe, case_id_key, activity_key, timestamp_key
+        )
+        progress.record("cases", sum(variants.values()))
+        progress.record("variants", len(variants))
+        variants = filter_variants(variants, max_variants, variant_coverage)
+    with progress.phase("mine"):
+        return discover_bpmn(variants, miner=miner, noise_threshold=noise_threshold)
+
+
+def convert_log_to_dataframe(
+    log_source: LogSource,
+    columns: Union[List[str], None] = None,
+    categorical_columns: Union[List[str], None] = None,
+    timestamp_field_name: Union[str, None] = None,
+    timestamp_format: Union[str, None] = None,
+    sample: Union[CaseSample, None] = None,
+) -> pd.DataFrame:
+    if columns is not None:
+        if sample is not None:
+            columns = columns + [sample.case_id_field_name]
+        # the same column may be used for more than one field
+        columns = list(dict.fromkeys(columns))
+    try:
+        dataframe = read_log(
+            log_source,
+            columns=columns,
+            categorical_columns=categorical_columns,
+            sample=sample,
+        )
+    except ValueError as e:
+        # raised by pandas e.g. when one of the requested columns is missing
+        raise LogFormatError(str(e)) from e
+
+    if timestamp_field_name is not None:
+        dataframe[timestamp_field_name] = parse_timestamp_column(
+            dataframe[timestamp_field_name], timestamp_format
+        )
+    return dataframe
+
+
+def convert_log_to_bpmn(
+    log_source,
+    case_id_field_name,
+    activity_field_name,
+    timestamp_field_name,
+    role_field_name=None,
+    timestamp_format=None,
+    miner: str = DEFAULT_MINER,
+    noise_threshold: float = DEFAULT_NOISE_THRESHOLD,
+    max_variants: Union[int, None] = None,
+    variant_coverage: Union[float, None] = None,
+    sample: Union[CaseSample, None] = None,
+    layout: str = DEFAULT_LAYOUT,
+    progress: PipelineProgress = PipelineProgress(),
+) -> Tuple[pd.DataFrame, ET.Element]:
+    # only the columns used for mining and lanes are loaded
+    columns = [case_id_field_name, activity_field_name, timestamp_field_name]
+    categorical_columns = [activity_field_name]
+    if role_field_name is not None:
+        columns.append(role_field_name)
+        categorical_columns.append(role_field_name)
+
+    with progress.phase("parse"):
+        dataframe = convert_log_to_dataframe(
+            log_source,
+            columns=columns,
+            categorical_columns=categorical_columns,
+            timestamp_field_name=timestamp_field_name,
+            timestamp_format=timestamp_format,
+            sample=sample,
+        )
+        progress.record("events", len(dataframe))
+    bpmn_model = create_bpmn_from_dataframe(
+        dataframe,
+        case_id_field_name,
+        activity_field_name,
+        timestamp_field_name,
+        miner=miner,
+        noise_threshold=noise_threshold,
+        max_variants=max_variants,
+        variant_coverage=variant_coverage,
+        progress=progress,
+    )
+    with progress.phase("serialize"):
+        bpmn_root = serialize_bpmn_model(bpmn_model, layout)
+    return dataframe, bpmn_root
+
+
+def add_roles_to_bpmn(
+    index: BpmnIndex, geometry: GeometryStore, lane_roles: List[str]
+) -> Dict[str, float]:
+    lane_set = add_lane_set(index.process, "custom_laneSet")
+    index.add_element(lane_set)
+
+    # the extent of the diagram is taken once, before any lane is added; the first lane is shifted
+    # to the left and top and the lanes span a bit beyond the rightmost shape, just to look better
+    shapes = geometry.shapes.values()
+    x = min(shape.x for shape in shapes) - INITIAL_LANE_HORIZONTAL_SHIFT_LEFT
+    top = min(shape.y for shape in shapes) - INITIAL_LANE_VERTICAL_SHIFT
+    width = max(shape.x for shape in shapes) + INITIAL_LANE_HORIZONTAL_SHIFT_RIGHT
+
+    role_to_vertical_position = {}
+    for position, role in enumerate(lane_roles):
+        y = top + position * LANE_HEIGHT
+        lane = add_lane(lane_set, role)
+        lane_shape = add_lane_di(index.plane, lane, x, y, width)
+        index.add_element(lane)
+        index.add_element(lane_shape)
+        geometry.add_shape(lane_shape)
+        role_to_vertical_position[role] = y
+
+    return role_to_vertical_position
+
+
+def fix_tasks(
+    index: BpmnIndex,
+    geometry: GeometryStore,
+    role_to_vertical_position: Dict[str, float],
+    task_to_role: Dict[str, str],
+) -> Dict[str, float]:
+    task_to_vertical_position = {}
+    for task in index.tasks:
+        task_id = task.get("id")
+        task_name = task.get("name")
+
+        shape = geometry.get_shape(task_id)
+        role = task_to_role[task_name]
+        shape.y = role_to_vertical_position[role] + LANE_HEIGHT // 2 - 18
+        task_to_vertical_position[task] = (
+            role_to_vertical_position[role] + LANE_HEIGHT // 2
+        )
+
+    return task_to_vertical_position
+
+
+def fix_starting_node(
+    index: BpmnIndex,
+    geometry: GeometryStore,
+    task_to_vertical_position: Dict[ET.Element, float],
+) -> None:
+
+    tasks = task_to_vertical_position.keys()
+    task_shapes = [geometry.get_shape(task.get("id")) for task in tasks]
+    x = float("inf")
+    right_y = float("inf")
+    for task_shape in task_shapes:
+        if task_shape.x < x:
+            x = task_shape.x
+            right_y = task_shape.y
+    geometry.get_shape(index.start_event.get("id")).y = right_y
+
+
+def fix_gateways(index: BpmnIndex, geometry: GeometryStore, task_to_vertical_position):
+    # a split is put on the row of the task right before it and a join on the row of the task
+    # right after it, following the sequence flows; the other side is used when there is no task
+    # on that one, and the start event when there is none at all
+    tasks = [task.get("id") for task in task_to_vertical_position.keys()]
+    gateway_ids = {gateway.get("id") for gateway in index.gateways}
+
+    successors: Dict[str, List[str]] = defaultdict(list)
+    predecessors: Dict[str, List[str]] = defaultdict(list)
+    for arrow in index.sequence_flows:
+        successors[arrow.get("sourceRef")].append(arrow.get("targetRef"))
+        predecessors[arrow.get("targetRef")].append(arrow.get("sourceRef"))
+
+    previous_tasks = find_nearest_tasks(tasks, successors, gateway_ids)
+    next_tasks = find_nearest_tasks(tasks, predecessors, gateway_ids)
+
+    start_shape = geometry.get_shape(index.start_event.get("id"))
+    for gateway in index.gateways:
+        gateway_id = gateway.get("id")
+        if gateway.get("gatewayDirection") == "Converging":
+            task_id = next_tasks.get(gateway_id) or previous_tasks.get(gateway_id)
+        else:
+            task_id = previous_tasks.get(gateway_id) or next_tasks.get(gateway_id)
+        anchor_shape = start_shape if task_id is None else geometry.get_shape(task_id)
+
+        # the gateway is centred on the row of the shape it is aligned with
+        gateway_shape = geometry.get_shape(gateway_id)
+        gateway_shape.y = (
+            anchor_shape.y + anchor_shape.height / 2 - gateway_shape.height / 2
+        )
+
+
+def fix_ending_node(
+    index: BpmnIndex,
+    geometry: GeometryStore,
+    task_to_vertical_position: Dict[ET.Element, float],
+) -> None:
+
+    tasks = task_to_vertical_position.keys()
+    task_shapes = [geometry.get_shape(task.get("id")) for task in tasks]
+    x = -float("inf")
+    right_y = float("inf")
+    for task_shape in task_shapes:
+        if task_shape.x > x:
+            x = task_shape.x
+            right_y = task_shape.y
+    geometry.get_shape(index.end_event.get("id")).y = right_y
+
+
+def fix_overlaps(geometry: GeometryStore):
+    shapes = []
+    lanes = []
+    for shape in geometry.shapes.values():
+        if shape.bpmn_element.startswith("Lane"):
+            lanes.append(shape)
+        else:
+            shapes.append(shape)
+
+    for cluster in find_overlapping_clusters(shapes):
+        # shapes keep their document order when they share the same row
+        cluster.sort(key=lambda shape: shape.y)
+        height = max(shape.height for shape in cluster)
+        if len(cluster) == 2:
+            step = LANE_HEIGHT / 2
+        else:
+            step = height
+        center = sum(shape.y + shape.height / 2 for shape in cluster) / len(cluster)
+
+        # the cluster is spread vertically around its middle, but never beyond the lane it is in,
+        # moving closer together when it does not fit, like place_rows does
+        lane = find_lane(lanes, center)
+        if lane is not None:
+            step = min(step, (lane.height - height) / (len(cluster) - 1))
+            half_span = (len(cluster) - 1) / 2 * step + height / 2
+            center = min(
+                max(center, lane.y + half_span), lane.y + lane.height - half_span
+            )
+
+        middle = (len(cluster) - 1) / 2
+        for position, shape in enumerate(cluster):
+            shape.y = center + (position - middle) * step - shape.height / 2
+
+
+def find_lane(lanes: List[ShapeGeometry], y: float) -> Union[ShapeGeometry, None]:
+    for lane in lanes:
+        if lane.y <= y < lane.y + lane.height:
+            return lane
+    return None
+
+
+def fix_waypoints(index: BpmnIndex, geometry: GeometryStore):
+    # the shapes and edges of all flows are looked up first, then every flow is routed orthogonally
+    # from the right side of its source to the left side of its target
+    flows = []
+    for arrow in index.sequence_flows:
+        flows.append(
+            (
+                geometry.get_edge(arrow.get("id")),
+                geometry.get_shape(arrow.get("sourceRef")),
+                geometry.get_shape(arrow.get("targetRef")),
+            )
+        )
+
+    # flows running along the same channel, with the direction in which their tracks are stacked
+    channels: Dict[Tuple[float, int], List[int]] = defaultdict(list)
+    routes = []
+    for i, (graphical_arrow, graphical_source, graphical_target) in enumerate(flows):
+        source_x = graphical_source.x + graphical_source.width
+        target_x = graphical_target.x
+        source_y = graphical_source.y + graphical_source.height / 2
+        target_y = graphical_target.y + graphical_target.height / 2
+        routes.append((source_x, source_y, target_x, target_y))
+
+        if abs(source_y - target_y) < SAME_ROW_MAXIMUM_VERTICAL_DIFF:
+            if abs(source_x - target_x) < DIRECT_FLOW_MAXIMUM_HORIZONTAL_DIFF:
+                continue
+            # on the same row the flow goes around the shapes in between, above them
+            channel = (source_y - FLOW_CHANNEL_DISTANCE, -1)
+        elif source_y > target_y:
+            # the target is higher, the channel is below it
+            channel = (target_y + FLOW_CHANNEL_DISTANCE, 1)
+        else:
+            channel = (target_y - FLOW_CHANNEL_DISTANCE, -1)
+        channels[channel].append(i)
+
+    channel_y = {}
+    for (y, direction), members in channels.items():
+        intervals = []
+        for i in members:
+            source_x, _, target_x, _ = routes[i]
+            left = source_x + FLOW_STUB_LENGTH
+            right = target_x - FLOW_STUB_LENGTH
+            intervals.append((min(left, right), max(left, right)))
+        for i, track in zip(members, assign_channel_tracks(intervals)):
+            channel_y[i] = y + direction * track * FLOW_CHANNEL_SPACING
+
+    for i, (graphical_arrow, _, _) in enumerate(flows):
+        source_x, source_y, target_x, target_y = routes[i]
+        if i not in channel_y:
+            if source_y == target_y:
+                new_waypoints = [(source_x, source_y), (target_x, target_y)]
+            else:
+                middle_x = (source_x + target_x) / 2
+                new_waypoints = [
+                    (source_x, source_y),
+                    (middle_x, source_y),
+                    (middle_x, target_y),
+                    (target_x, target_y),
+                ]
+        else:
+            y = channel_y[i]
+            new_waypoints = [
+                (source_x, source_y),
+                (source_x + FLOW_STUB_LENGTH, source_y),
+                (source_x + FLOW_STUB_LENGTH, y),
+                (target_x - FLOW_STUB_LENGTH, y),
+                (target_x - FLOW_STUB_LENGTH, target_y),
+                (target_x, target_y),
+            ]
+        graphical_arrow.waypoints = new_waypoints
+
+
+def layout_bpmn(
+    bpmn_root: ET.Element,
+    get_lanes: Callable[[List[str]], Tuple[Dict[str, str], List[str]]],
+    output_bpmn_path: str,
+    layout: str = DEFAULT_LAYOUT,
+    output_svg_path: Union[str, None] = None,
+    progress: PipelineProgress = PipelineProgress(),
+) -> None:
+    # the role map and the order of the lanes are computed within the lanes phase, which is where
+    # they are timed
+    with progress.phase("layout"):
+        index = BpmnIndex(bpmn_root)
+        geometry = GeometryStore(index)
+        progress.record("tasks", len(index.tasks))
+        progress.record("gateways", len(index.gateways))
+        progress.record("flows", len(index.sequence_flows))
+
+        if layout == LAYOUT_LAYERED:
+            layout_layered(index, geometry, get_lanes, progress)
+        else:
+            fix_up_layout(index, geometry, get_lanes, progress)
+
+    with progress.phase("write"):
+        geometry.write_back()
+        write_bpmn_file(output_bpmn_path, bpmn_root)
+
+    # the preview is drawn from the geometry that was just computed, without parsing the diagram
+    if output_svg_path is not None:
+        with progress.phase("render"):
+            write_file_atomically(output_svg_path, render_svg(index, geometry))
+
+
+def get_model_lanes(
+    task_to_role: Dict[str, str],
+    task_names: List[str],
+    lane_order: str = DEFAULT_LANE_ORDER,
+    role_event_counts: Union[Dict[str, int], None] = None,
+) -> Tuple[Dict[str, str], List[str]]:
+    # only the tasks left in the mined model get a lane; activities dropped by the variant or
+    # noise filters would otherwise leave their roles behind as empty lanes
+    task_names = set(task_names)
+    model_task_to_role = {
+        task: role for task, role in task_to_role.items() if task in task_names
+    }
+    return model_task_to_role, get_lane_roles(
+        model_task_to_role, lane_order, role_event_counts
+    )
+
+
+def check_task_roles(index: BpmnIndex, task_to_role: Dict[str, str]) -> None:
+    # events without a role are dropped from the role map, so a task may have no lane at all
+    tasks_without_role = [
+        task.get("name") for task in index.tasks if task.get("name") not in task_to_role
+    ]
+    if len(tasks_without_role) > 0:
+        raise LogFormatError(
+            f"Activities without a role: {', '.join(tasks_without_role)}"
+        )
+
+
+def fix_up_layout(
+    index: BpmnIndex,
+    geometry: GeometryStore,
+    get_lanes: Callable[[List[str]], Tuple[Dict[str, str], List[str]]],
+    progress: PipelineProgress = PipelineProgress(),
+) -> None:
+    # keeps the x coordinates of pm4py and moves the shapes vertically into their lanes
+    with progress.phase("lanes"):
+        task_to_role, lane_roles = get_lanes([task.get("name") for task in index.tasks])
+        check_task_roles(index, task_to_role)
+        role_to_vertical_position = add_roles_to_bpmn(index, geometry, lane_roles)
+    with progress.phase("fix_tasks"):
+        task_to_vertical_position = fix_tasks(
+            index, geometry, role_to_vertical_position, task_to_role
+        )
+    with progress.phase("fix_events"):
+        fix_starting_node(index, geometry, task_to_vertical_position)
+        fix_ending_node(index, geometry, task_to_vertical_position)
+    with progress.phase("fix_gateways"):
+        fix_gateways(index, geometry, task_to_vertical_position)
+    with progress.phase("fix_overlaps"):
+        fix_overlaps(geometry)
+    with progress.phase("fix_waypoints"):
+        fix_waypoints(index, geometry)
+
+
+def layout_layered(
+    index: BpmnIndex,
+    geometry: GeometryStore,
+    get_lanes: Callable[[List[str]], Tuple[Dict[str, str], List[str]]],
+    progress: PipelineProgress = PipelineProgress(),
+) -> None:
+    # replaces all coordinates: layers by longest path from left to right, nodes ordered within
+    # their lane to reduce crossings, then the lanes are added around them and the flows routed
+    graph = FlowGraph(index, geometry)
+    with progress.phase("lanes"):
+        task_to_role, lane_roles = get_lanes([task.get("name") for task in index.tasks])
+        check_task_roles(index, task_to_role)
+        if len(lane_roles) == 0:
+            raise LogFormatError("No roles found in the log")
+        lane_indices = {role: position for position, role in enumerate(lane_roles)}
+        node_lanes = get_node_lanes(index, graph, task_to_role, lane_roles[0])
+    with progress.phase("layers"):
+        roots = [index.start_event.get("id")] if index.start_event is not None else []
+        back_edges = graph.get_back_edges(roots)
+        layers = graph.assign_layers(back_edges)
+        lane_positions = {node: lane_indices[lane] for node, lane in node_lanes.items()}
+        ordered_layers = order_layers(graph, layers, lane_positions, back_edges)
+        place_layers(index, geometry, ordered_layers)
+    with progress.phase("rows"):
+        role_to_vertical_position = add_roles_to_bpmn(index, geometry, lane_roles)
+        place_rows(geometry, ordered_layers, node_lanes, role_to_vertical_position)
+    with progress.phase("fix_waypoints"):
+        fix_waypoints(index, geometry)
+
+
+def get_svg_output_path(cache_key: str) -> Union[str, None]:
+    # without the eager preview, the SVG is rendered from the diagram on its first request
+    if not PREVIEW_SVG:
+        return None
+    return RESULT_CACHE.get_companion_path(cache_key, ".svg")
+
+
+def check_generation_parameters(
+    role_conflict_policy: str = DEFAULT_ROLE_CONFLICT_POLICY,
+    lane_order: str = DEFAULT_LANE_ORDER,
+    layout: str = DEFAULT_LAYOUT,
+    miner: str = DEFAULT_MINER,
+    noise_threshold: float = DEFAULT_NOISE_THRESHOLD,
+    max_variants: Union[int, None] = None,
+    variant_coverage: Union[float, None] = None,
+    sample: Union[float, None] = None,
+    **fields,
+) -> None:
+    # field names, the timestamp format and the sample seed take any value
+    if role_conflict_policy not in ROLE_CONFLICT_POLICIES:
+        raise ValueError(
+            f"role_conflict_policy must be one of {ROLE_CONFLICT_POLICIES}"
+        )
+    if lane_order not in LANE_ORDERS:
+        raise ValueError(f"lane_order must be one of {LANE_ORDERS}")
+    if layout not in LAYOUTS:
+        raise ValueError(f"layout must be one of {LAYOUTS}")
+    if miner not in MINERS:
+        raise ValueError(f"miner must be one of {MINERS}")
+    if not 0 <= noise_threshold <= 1:
+        raise ValueError("noise_threshold must be between 0 and 1")
+    if max_variants is not None and max_variants < 1:
+        raise ValueError("max_variants must be at least 1")
+    if variant_coverage is not None and not 0 < variant_coverage <= 1:
+        raise ValueError("variant_coverage must be between 0 and 1")
+    if sample is not None and (sample <= 0 or sample >= 1 and sample != int(sample)):
+        raise ValueError(
+            "sample must be a fraction between 0 and 1 or a number of cases"
+        )
+
+
+def run_bpmn_generation_logic(
+    log_source: LogSource,
+    case_id_field_name: str,
+    activity_field_name: str,
+    timestamp_field_name: str,
+    role_field_name: str,
+    output_bpmn_path: str,
+    role_conflict_policy: str = DEFAULT_ROLE_CONFLICT_POLICY,
+    lane_order: str = DEFAULT_LANE_ORDER,
+    layout: str = DEFAULT_LAYOUT,
+    timestamp_format: Union[str, None] = None,
+    model_cache_key: Union[str, None] = None,
+    output_svg_path: Union[str, None] = None,
+    miner: str = DEFAULT_MINER,
+    noise_threshold: float = DEFAULT_NOISE_THRESHOLD,
+    max_variants: Union[int, None] = None,
+    variant_coverage: Union[float, None] = None,
+    sample: Union[float, None] = None,
+    sample_seed: int = 0,
+    progress: PipelineProgress = PipelineProgress(),
+) -> Union[Dict[str, Any], None]:
+    case_sample = make_case_sample(case_id_field_name, sample, sample_seed)
+    metrics = None
+    if METRICS_ENABLED:
+        # only the report goes back to the caller, the dataframe would be pickled across processes
+        metrics = StageMetrics(progress, trace_memory=METRICS_TRACEMALLOC)
+        progress = metrics
+
+    # the mined model does not depend on roles, so it is reused when only the lanes change
+    cached_model = None
+    if model_cache_key is not None:
+        cached_model = MODEL_CACHE.read(model_cache_key)
+
+    if cached_model is not None:
+        with progress.phase("parse"):
+            bpmn_root = parse_bpmn_string(cached_model)
+            dataframe = convert_log_to_dataframe(
+                log_source,
+                columns=[activity_field_name, role_field_name],
+                categorical_columns=[activity_field_name, role_field_name],
+                sample=case_sample,
+            )
+            progress.record("events", len(dataframe))
+    else:
+        dataframe, bpmn_root = convert_log_to_bpmn(
+            log_source=log_source,
+            case_id_field_name=case_id_field_name,
+            activity_field_name=activity_field_name,
+            timestamp_field_name=timestamp_field_name,
+            role_field_name=role_field_name,
+            timestamp_format=timestamp_format,
+            miner=miner,
+            noise_threshold=noise_threshold,
+            max_variants=max_variants,
+            variant_coverage=variant_coverage,
+            sample=case_sample,
+            layout=layout,
+            progress=progress,
+        )
+        if model_cache_key is not None:
+            write_bpmn_file(MODEL_CACHE.get_path(model_cache_key), bpmn_root)
+
+    def get_lanes(task_names: List[str]) -> Tuple[Dict[str, str], List[str]]:
+        task_to_role = get_task_role_map(
+            dataframe,
+            task_field_name=activity_field_name,
+            role_field_name=role_field_name,
+            conflict_policy=role_conflict_policy,
+        )
+        role_event_counts = None
+        if lane_order == "frequency":
+            role_event_counts = get_role_event_counts(
+                dataframe, activity_field_name, role_field_name
+            )
+        return get_model_lanes(task_to_role, task_names, lane_order, role_event_counts)
+
+    layout_bpmn(
+        bpmn_root,
+        get_lanes,
+        output_bpmn_path,
+        layout=layout,
+        output_svg_path=output_svg_path,
+        progress=progress,
+    )
+
+    if metrics is not None:
+        return metrics.report()
+    return None
+
+
+def run_incremental_generation_logic(
+    log_source: LogSource,
+    log_state_key: str,
+    case_id_field_name: str,
+    activity_field_name: str,
+    timestamp_field_name: str,
+    role_field_name: str,
+    role_conflict_policy: str = DEFAULT_ROLE_CONFLICT_POLICY,
+    lane_order: str = DEFAULT_LANE_ORDER,
+    layout: str = DEFAULT_LAYOUT,
+    timestamp_format: Union[str, None] = None,
+    miner: str = DEFAULT_MINER,
+    noise_threshold: float = DEFAULT_NOISE_THRESHOLD,
+    max_variants: Union[int, None] = None,
+    variant_coverage: Union[float, None] = None,
+    progress: PipelineProgress = PipelineProgress(),
+) -> Dict[str, Any]:
+    # log_source only holds the events appended since the last call; the state of the log is
+    # only saved once the diagram is written, so a failed call can be repeated with the same events
+    metrics = None
+    if METRICS_ENABLED:
+        metrics = StageMetrics(progress, trace_memory=METRICS_TRACEMALLOC)
+        progress = metrics
+
+    fields = {
+        "case_id_field_name": case_id_field_name,
+        "activity_field_name": activity_field_name,
+        "timestamp_field_name": timestamp_field_name,
+        "role_field_name": role_field_name,
+        "timestamp_format": timestamp_format,
+    }
+    log_state_path = LOG_STATE_CACHE.get_path(log_state_key)
+
+    # the state is loaded, updated and saved under a file lock, so concurrent appends to the same
+    # log from different server processes do not overwrite each other's events
+    with lock_log_state(log_state_path):
+        with progress.phase("parse"):
+            log_state = LogState(fields)
+            if LOG_STATE_CACHE.get(log_state_key) is not None:
+                log_state = load_log_state(log_state_path)
+            log_state.check_fields(fields)
+            columns = [
+                case_id_field_name,
+                activity_field_name,
+                timestamp_field_name,
+                role_field_name,
+            ]
+            dataframe = convert_log_to_dataframe(
+                log_source,
+                columns=columns,
+                categorical_columns=[activity_field_name, role_field_name],
+                timestamp_field_name=timestamp_field_name,
+                timestamp_format=timestamp_format,
+            )
+            progress.record("events", len(dataframe))
+
+        with progress.phase("compress"):
+            log_state.add_events(dataframe)
+            progress.record("cases", len(log_state.case_variants))
+            progress.record("variants", len(log_state.variants))
+            variants = filter_variants(
+                log_state.variants, max_variants, variant_coverage
+            )
+            # the directly-follows counts of the state only match the variants when none were dropped
+            if len(variants) == len(log_state.variants):
+                directly_follows = log_state.get_directly_follows()
+            else:
+                directly_follows = get_directly_follows_counts(variants)
+            model_key = get_model_key(
+                variants,
+                directly_follows,
+                miner=miner,
+                noise_threshold=noise_threshold,
+            )
+            # the cached model already holds the coordinates of its layout engine
+            model_cache_key = make_cache_key(model_key, layout=layout)
+            task_to_role = log_state.get_task_role_map(role_conflict_policy)
+            role_event_counts = log_state.get_role_event_counts()
+            lane_roles = get_lane_roles(task_to_role, lane_order, role_event_counts)
+
+        # the diagram only depends on the mined structure and the lanes, so it is reused as long as
+        # the appended events change neither of them
+        cache_key = make_cache_key(
+            model_cache_key, task_to_role=task_to_role, lane_roles=lane_roles
+        )
+        model_reused = True
+        layout_reused = RESULT_CACHE.get(cache_key) is not None
+        if not layout_reused:
+            cached_model = MODEL_CACHE.read(model_cache_key)
+            if cached_model is not None:
+                bpmn_root = parse_bpmn_string(cached_model)
+            else:
+                model_reused = False
+                with progress.phase("mine"):
+                    bpmn_model = discover_bpmn(
+                        variants,
+                        miner=miner,
+                        noise_threshold=noise_threshold,
+                        directly_follows=directly_follows,
+                    )
+                with progress.phase("serialize"):
+                    bpmn_root = serialize_bpmn_model(bpmn_model, layout)
+                write_bpmn_file(MODEL_CACHE.get_path(model_cache_key), bpmn_root)
+
+            layout_bpmn(
+                bpmn_root,
+                lambda task_names: get_model_lanes(
+                    task_to_role, task_names, lane_order, role_event_counts
+                ),
+                RESULT_CACHE.get_path(cache_key),
+                layout=layout,
+                output_svg_path=get_svg_output_path(cache_key),
+                progress=progress,
+            )
+
+        with progress.phase("save_state"):
+            save_log_state(log_state, log_state_path)
+
+    return {
+        "cache_key": cache_key,
+        "model_reused": model_reused,
+        "layout_reused": layout_reused,
+        "log": log_state.describe(),
+        "report": metrics.report() if metrics is not None else None,
+    }
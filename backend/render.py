@@ -0,0 +1,397 @@
+import io
+import textwrap
+import xml.etree.ElementTree as ET
+
+from typing import Callable, List, Tuple
+from constants import *
+from config import *
+from cache import write_file_atomically
+from bpmn_index import BpmnIndex
+from geometry import EdgeGeometry, GeometryStore, ShapeGeometry
+
+SVG_NAMESPACE = "http://www.w3.org/2000/svg"
+
+
+class RenderError(ValueError):
+    pass
+
+
+def get_shape_kind(index: BpmnIndex, bpmn_element: str) -> str:
+    element = index.get_element(bpmn_element)
+    if element is None:
+        return ""
+    return element.tag.split("}")[-1]
+
+
+def get_label(index: BpmnIndex, bpmn_element: str) -> str:
+    element = index.get_element(bpmn_element)
+    if element is None:
+        return ""
+    return (element.get("name") or "").replace("_", " ")
+
+
+def get_diagram_bounds(geometry: GeometryStore) -> Tuple[float, float, float, float]:
+    # the smallest box around all shapes and flows, with a margin on every side
+    xs, ys = [], []
+    for shape in geometry.shapes.values():
+        xs += [shape.x, shape.x + shape.width]
+        ys += [shape.y, shape.y + shape.height]
+    for edge in geometry.edges.values():
+        xs += [x for x, _ in edge.waypoints]
+        ys += [y for _, y in edge.waypoints]
+    if not xs:
+        return 0.0, 0.0, 2.0 * PREVIEW_MARGIN, 2.0 * PREVIEW_MARGIN
+    return (
+        min(xs) - PREVIEW_MARGIN,
+        min(ys) - PREVIEW_MARGIN,
+        max(xs) + PREVIEW_MARGIN,
+        max(ys) + PREVIEW_MARGIN,
+    )
+
+
+def wrap_label(label: str, width: float, height: float) -> List[str]:
+    # the text is not measured, characters are assumed to be 0.6 of the font size wide
+    characters = max(1, int((width - 8) / (PREVIEW_FONT_SIZE * 0.6)))
+    lines = textwrap.wrap(label, characters) or [""]
+    maximum_lines = max(1, int(height / (PREVIEW_FONT_SIZE * 1.2)))
+    if len(lines) > maximum_lines:
+        lines = lines[:maximum_lines]
+        lines[-1] = lines[-1][: max(0, characters - 1)] + "…"
+    return lines
+
+
+def get_sorted_shapes(
+    index: BpmnIndex, geometry: GeometryStore
+) -> List[Tuple[str, ShapeGeometry]]:
+    # lanes are drawn first, so that everything else stays on top of them
+    return sorted(
+        (
+            (get_shape_kind(index, bpmn_element), shape)
+            for bpmn_element, shape in geometry.shapes.items()
+        ),
+        key=lambda item: item[0] != "lane",
+    )
+
+
+def render_svg(index: BpmnIndex, geometry: GeometryStore) -> bytes:
+    min_x, min_y, max_x, max_y = get_diagram_bounds(geometry)
+    width, height = max_x - min_x, max_y - min_y
+    svg = ET.Element(
+        "svg",
+        {
+            "xmlns": SVG_NAMESPACE,
+            "width": f"{width:.0f}",
+            "height": f"{height:.0f}",
+            "viewBox": f"{min_x:.1f} {min_y:.1f} {width:.1f} {height:.1f}",
+            "font-family": "Arial, sans-serif",
+            "font-size": str(PREVIEW_FONT_SIZE),
+        },
+    )
+    definitions = ET.SubElement(svg, "defs")
+    marker = ET.SubElement(
+        definitions,
+        "marker",
+        {
+            "id": "arrow",
+            "viewBox": "0 0 10 10",
+            "refX": "10",
+            "refY": "5",
+            "markerWidth": "8",
+            "markerHeight": "8",
+            "orient": "auto",
+        },
+    )
+    ET.SubElement(marker, "path", {"d": "M 0 0 L 10 5 L 0 10 z"})
+    ET.SubElement(
+        svg,
+        "rect",
+        {
+            "x": f"{min_x:.1f}",
+            "y": f"{min_y:.1f}",
+            "width": f"{width:.1f}",
+            "height": f"{height:.1f}",
+            "fill": "white",
+        },
+    )
+
+    for kind, shape in get_sorted_shapes(index, geometry):
+        add_svg_shape(svg, kind, shape, get_label(index, shape.bpmn_element))
+    for edge in geometry.edges.values():
+        add_svg_edge(svg, edge)
+
+    return ET.tostring(svg, encoding="utf-8", xml_declaration=True)
+
+
+def add_svg_text(
+    parent: ET.Element, lines: List[str], x: float, y: float, **attributes
+) -> None:
+    # the lines are centred vertically on y
+    text = ET.SubElement(
+        parent,
+        "text",
+        {"x": f"{x:.1f}", "y": f"{y:.1f}", "text-anchor": "middle", **attributes},
+    )
+    first_line = -(len(lines) - 1) / 2 * 1.2 + 0.35
+    for number, line in enumerate(lines):
+        span = ET.SubElement(
+            text,
+            "tspan",
+            {"x": f"{x:.1f}", "dy": f"{first_line if number == 0 else 1.2:.2f}em"},
+        )
+        span.text = line
+
+
+def add_svg_shape(svg: ET.Element, kind: str, shape: ShapeGeometry, label: str) -> None:
+    stroke = {"fill": "white", "stroke": "black", "stroke-width": "1.5"}
+    center_x, center_y = shape.x + shape.width / 2, shape.y + shape.height / 2
+    if kind == "lane":
+        ET.SubElement(
+            svg,
+            "rect",
+            {
+                "x": f"{shape.x:.1f}",
+                "y": f"{shape.y:.1f}",
+                "width": f"{shape.width:.1f}",
+                "height": f"{shape.height:.1f}",
+                **stroke,
+                "stroke-width": "1",
+            },
+        )
+        # the name is written upwards in a band on the left of the lane
+        label_x = shape.x + PREVIEW_LANE_LABEL_WIDTH / 2
+        add_svg_text(
+            svg,
+            wrap_label(label, shape.height, PREVIEW_LANE_LABEL_WIDTH),
+            label_x,
+            center_y,
+            transform=f"rotate(-90 {label_x:.1f} {center_y:.1f})",
+        )
+    elif kind.endswith("Gateway"):
+        points = [
+            (center_x, shape.y),
+            (shape.x + shape.width, center_y),
+            (center_x, shape.y + shape.height),
+            (shape.x, center_y),
+        ]
+        ET.SubElement(
+            svg,
+            "polygon",
+            {"points": " ".join(f"{x:.1f},{y:.1f}" for x, y in points), **stroke},
+        )
+        for (x1, y1), (x2, y2) in get_gateway_marker(kind, shape):
+            ET.SubElement(
+                svg,
+                "line",
+                {
+                    "x1": f"{x1:.1f}",
+                    "y1": f"{y1:.1f}",
+                    "x2": f"{x2:.1f}",
+                    "y2": f"{y2:.1f}",
+                    "stroke": "black",
+                    "stroke-width": "3",
+                },
+            )
+    elif kind.endswith("Event"):
+        ET.SubElement(
+            svg,
+            "circle",
+            {
+                "cx": f"{center_x:.1f}",
+                "cy": f"{center_y:.1f}",
+                "r": f"{min(shape.width, shape.height) / 2:.1f}",
+                **stroke,
+                "stroke-width": "4" if kind == "endEvent" else "1.5",
+            },
+        )
+    else:
+        ET.SubElement(
+            svg,
+            "rect",
+            {
+                "x": f"{shape.x:.1f}",
+                "y": f"{shape.y:.1f}",
+                "width": f"{shape.width:.1f}",
+                "height": f"{shape.height:.1f}",
+                "rx": "10",
+                **stroke,
+            },
+        )
+        add_svg_text(
+            svg, wrap_label(label, shape.width, shape.height), center_x, center_y
+        )
+
+
+def add_svg_edge(svg: ET.Element, edge: EdgeGeometry) -> None:
+    if len(edge.waypoints) < 2:
+        return
+    ET.SubElement(
+        svg,
+        "polyline",
+        {
+            "points": " ".join(f"{x:.1f},{y:.1f}" for x, y in edge.waypoints),
+            "fill": "none",
+            "stroke": "black",
+            "stroke-width": "1.5",
+            "marker-end": "url(#arrow)",
+        },
+    )
+
+
+def get_gateway_marker(
+    kind: str, shape: ShapeGeometry
+) -> List[Tuple[Tuple[float, float], Tuple[float, float]]]:
+    # a cross for exclusive and a plus for parallel gateways, a quarter of the size inside
+    center_x, center_y = shape.x + shape.width / 2, shape.y + shape.height / 2
+    size = min(shape.width, shape.height) / 4
+    if kind == "parallelGateway":
+        return [
+            ((center_x - size, center_y), (center_x + size, center_y)),
+            ((center_x, center_y - size), (center_x, center_y + size)),
+        ]
+    size *= 0.75
+    return [
+        ((center_x - size, center_y - size), (center_x + size, center_y + size)),
+        ((center_x - size, center_y + size), (center_x + size, center_y - size)),
+    ]
+
+
+def render_png(index: BpmnIndex, geometry: GeometryStore) -> bytes:
+    # Pillow is only needed for PNG previews, so it is not a hard dependency
+    try:
+        from PIL import Image, ImageDraw, ImageFont
+    except ImportError:
+        raise RenderError("PNG previews need the 'Pillow' package installed")
+
+    min_x, min_y, max_x, max_y = get_diagram_bounds(geometry)
+    # big diagrams are scaled down, so that the image stays within the configured size
+    scale = min(
+        PREVIEW_PNG_SCALE,
+        PREVIEW_PNG_MAX_SIDE / max(max_x - min_x, max_y - min_y),
+    )
+    image = Image.new(
+        "RGB",
+        (
+            max(1, round((max_x - min_x) * scale)),
+            max(1, round((max_y - min_y) * scale)),
+        ),
+        "white",
+    )
+    draw = ImageDraw.Draw(image)
+    font = ImageFont.load_default(size=max(1, round(PREVIEW_FONT_SIZE * scale)))
+    line_width = max(1, round(1.5 * scale))
+
+    def point(x: float, y: float) -> Tuple[float, float]:
+        return (x - min_x) * scale, (y - min_y) * scale
+
+    def draw_lines(lines: List[str], x: float, y: float) -> None:
+        draw.multiline_text(
+            point(x, y),
+            "\n".join(lines),
+            fill="black",
+            font=font,
+            anchor="mm",
+            align="center",
+        )
+
+    for kind, shape in get_sorted_shapes(index, geometry):
+        box = [
+            point(shape.x, shape.y),
+            point(shape.x + shape.width, shape.y + shape.height),
+        ]
+        center_x, center_y = shape.x + shape.width / 2, shape.y + shape.height / 2
+        label = get_label(index, shape.bpmn_element)
+        if kind == "lane":
+            draw.rectangle(box, outline="black", width=max(1, round(scale)))
+            # Pillow cannot rotate text in place, so the name of the lane is drawn on its own
+            # image and pasted rotated
+            lines = wrap_label(label, shape.height, PREVIEW_LANE_LABEL_WIDTH)
+            label_image = Image.new(
+                "RGB",
+                (
+                    max(1, round(shape.height * scale) - 2),
+                    max(1, round(PREVIEW_LANE_LABEL_WIDTH * scale) - 2),
+                ),
+                "white",
+            )
+            ImageDraw.Draw(label_image).multiline_text(
+                (label_image.width / 2, label_image.height / 2),
+                "\n".join(lines),
+                fill="black",
+                font=font,
+                anchor="mm",
+                align="center",
+            )
+            left, top = point(shape.x, shape.y)
+            image.paste(
+                label_image.rotate(90, expand=True), (round(left) + 1, round(top) + 1)
+            )
+        elif kind.endswith("Gateway"):
+            draw.polygon(
+                [
+                    point(center_x, shape.y),
+                    point(shape.x + shape.width, center_y),
+                    point(center_x, shape.y + shape.height),
+                    point(shape.x, center_y),
+                ],
+                fill="white",
+                outline="black",
+                width=line_width,
+            )
+            for start, end in get_gateway_marker(kind, shape):
+                draw.line(
+                    [point(*start), point(*end)], fill="black", width=line_width * 2
+                )
+        elif kind.endswith("Event"):
+            radius = min(shape.width, shape.height) / 2
+            draw.ellipse(
+                [
+                    point(center_x - radius, center_y - radius),
+                    point(center_x + radius, center_y + radius),
+                ],
+                fill="white",
+                outline="black",
+                width=line_width * 3 if kind == "endEvent" else line_width,
+            )
+        else:
+            draw.rounded_rectangle(
+                box, radius=10 * scale, fill="white", outline="black", width=line_width
+            )
+            draw_lines(wrap_label(label, shape.width, shape.height), center_x, center_y)
+
+    for edge in geometry.edges.values():
+        if len(edge.waypoints) < 2:
+            continue
+        draw.line(
+            [point(x, y) for x, y in edge.waypoints], fill="black", width=line_width
+        )
+        draw.polygon(get_arrow_head(edge.waypoints, point), fill="black")
+
+    output = io.BytesIO()
+    image.save(output, format="PNG", optimize=True)
+    return output.getvalue()
+
+
+def get_arrow_head(
+    waypoints: List[Tuple[float, float]],
+    point: Callable[[float, float], Tuple[float, float]],
+) -> List[Tuple[float, float]]:
+    (x1, y1), (x2, y2) = waypoints[-2], waypoints[-1]
+    length = max(((x2 - x1) ** 2 + (y2 - y1) ** 2) ** 0.5, 1e-9)
+    dx, dy = (x2 - x1) / length, (y2 - y1) / length
+    return [
+        point(x2, y2),
+        point(x2 - 8 * dx - 4 * dy, y2 - 8 * dy + 4 * dx),
+        point(x2 - 8 * dx + 4 * dy, y2 - 8 * dy - 4 * dx),
+    ]
+
+
+PREVIEW_RENDERERS = {"svg": render_svg, "png": render_png}
+PREVIEW_MEDIA_TYPES = {"svg": "image/svg+xml", "png": "image/png"}
+
+
+def render_preview(bpmn_path: str, preview_path: str, preview_format: str) -> None:
+    index = BpmnIndex(ET.parse(bpmn_path).getroot())
+    geometry = GeometryStore(index)
+    write_file_atomically(
+        preview_path, PREVIEW_RENDERERS[preview_format](index, geometry)
+    )
@@ -0,0 +1,68 @@
+import hashlib
+import numpy as np
+import pandas as pd
+
+from typing import Dict, Union
+
+HASH_RANGE = 2**64
+
+
+class CaseSample:
+    # a case is sampled by a seeded hash of its id, so every event of a case gets the same decision
+    # wherever it is in the file, and the sample only depends on the log and the seed;
+    # a fraction keeps the cases hashing below that share of the hash range, a number of cases
+    # keeps the cases with the smallest hashes
+    def __init__(
+        self,
+        case_id_field_name: str,
+        cases: Union[int, None] = None,
+        fraction: Union[float, None] = None,
+        seed: int = 0,
+    ):
+        self.case_id_field_name = case_id_field_name
+        self.cases = cases
+        self.fraction = fraction
+        self.seed = seed
+        self.hash_key = hashlib.sha256(str(seed).encode("utf-8")).hexdigest()[:16]
+        self.smallest_hashes = np.array([], dtype=np.uint64)
+
+    def get_case_hashes(self, dataframe: pd.DataFrame) -> np.ndarray:
+        return pd.util.hash_pandas_object(
+            dataframe[self.case_id_field_name].astype(str),
+            index=False,
+            hash_key=self.hash_key,
+        ).to_numpy()
+
+    def filter(self, chunk: pd.DataFrame) -> pd.DataFrame:
+        # called for every chunk while the log is read; with a number of cases, chunks may keep
+        # cases that a later chunk pushes out of the sample, finish drops them
+        hashes = self.get_case_hashes(chunk)
+        if self.cases is None:
+            return chunk[hashes < int(self.fraction * HASH_RANGE)]
+
+        self.smallest_hashes = np.unique(
+            np.concatenate([self.smallest_hashes, hashes])
+        )[: self.cases]
+        if len(self.smallest_hashes) == 0:
+            return chunk
+        return chunk[hashes <= self.smallest_hashes[-1]]
+
+    def finish(self, dataframe: pd.DataFrame) -> pd.DataFrame:
+        if self.cases is None or len(self.smallest_hashes) == 0:
+            return dataframe
+        hashes = self.get_case_hashes(dataframe)
+        return dataframe[hashes <= self.smallest_hashes[-1]].reset_index(drop=True)
+
+    def describe(self) -> Dict[str, Union[int, float, None]]:
+        return {"cases": self.cases, "fraction": self.fraction, "seed": self.seed}
+
+
+def make_case_sample(
+    case_id_field_name: str, sample: Union[float, None], seed: int = 0
+) -> Union[CaseSample, None]:
+    # sample is either a fraction of the cases, below 1, or a number of cases
+    if sample is None:
+        return None
+    if sample < 1:
+        return CaseSample(case_id_field_name, fraction=sample, seed=seed)
+    return CaseSample(case_id_field_name, cases=int(sample), seed=seed)
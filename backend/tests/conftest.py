@@ -0,0 +1,24 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def api_client(tmp_path, monkeypatch):
+    # the app keeps its caches in the working directory, every test gets its own empty ones;
+    # main is only imported here, so that the other tests do not need fastapi
+    from fastapi.testclient import TestClient
+
+    monkeypatch.chdir(tmp_path)
+    import main
+
+    for cache in (main.RESULT_CACHE, main.MODEL_CACHE, main.LOG_STATE_CACHE):
+        cache.create_directory()
+    monkeypatch.setattr(
+        main, "JOB_STORE", main.JobStore(str(tmp_path / "jobs.sqlite3"))
+    )
+    with TestClient(main.app) as client:
+        yield client
@@ -0,0 +1,131 @@
+import json
+
+from constants import *
+from batch import (
+    DEFAULT_PARAMETERS,
+    REPORT_FILE_NAME,
+    read_directory,
+    read_manifest,
+    run_batch,
+    validate_entries,
+)
+
+PARAMETERS = {
+    **DEFAULT_PARAMETERS,
+    "case_id_field_name": "case",
+    "activity_field_name": "activity",
+    "timestamp_field_name": "timestamp",
+    "role_field_name": "role",
+    "layout": LAYOUT_LAYERED,
+}
+
+
+def write_log(path, activity: str = "Check") -> None:
+    path.write_text(
+        "\n".join(
+            [
+                "case,activity,timestamp,role",
+                "1,Register,2024-01-01 08:00:00,Clerk",
+                f"1,{activity},2024-01-01 09:00:00,Manager",
+                "2,Register,2024-01-02 08:00:00,Clerk",
+            ]
+        )
+        + "\n"
+    )
+
+
+def read_report(output_dir):
+    return json.loads((output_dir / REPORT_FILE_NAME).read_text())
+
+
+def test_manifest_values_are_coerced(tmp_path):
+    manifest_path = tmp_path / "logs.json"
+    manifest_path.write_text(
+        json.dumps(
+            [
+                {"path": "a.csv", "noise_threshold": "0.2", "max_variants": "5"},
+                {"path": "b.csv", "max_variants": 2.0, "sample": 3},
+                {"path": "c.csv", "noise_threshold": "low"},
+                {"path": "d.csv", "max_variants": 2.5},
+                {"path": "e.csv", "case_id_field_name": 1},
+                {"path": "f.csv", "lane_order": "random"},
+                {"path": "g.csv", "colour": "red"},
+            ]
+        )
+    )
+    entries = read_manifest(str(manifest_path), PARAMETERS)
+
+    assert validate_entries(entries) == []
+    assert entries[0]["parameters"]["noise_threshold"] == 0.2
+    assert entries[0]["parameters"]["max_variants"] == 5
+    assert entries[1]["parameters"]["max_variants"] == 2
+    assert entries[1]["parameters"]["sample"] == 3.0
+    assert "error" not in entries[0] and "error" not in entries[1]
+    assert [entry["error"].split()[0] for entry in entries[2:]] == [
+        "noise_threshold",
+        "max_variants",
+        "case_id_field_name",
+        "lane_order",
+        "unknown",
+    ]
+
+
+def test_output_used_twice_stops_the_batch(tmp_path):
+    manifest_path = tmp_path / "logs.json"
+    manifest_path.write_text(json.dumps([{"path": "a.csv"}, {"path": "b/a.csv"}]))
+    errors = validate_entries(read_manifest(str(manifest_path), PARAMETERS))
+    assert len(errors) == 1 and "a.bpmn is used twice" in errors[0]
+
+
+def test_manifest_reports_failures_per_log(tmp_path):
+    write_log(tmp_path / "a.csv")
+    write_log(tmp_path / "b.csv")
+    manifest_path = tmp_path / "logs.json"
+    manifest_path.write_text(
+        json.dumps(
+            [
+                {"path": "a.csv", "output": "first.bpmn", "noise_threshold": "0.2"},
+                {"path": "b.csv", "max_variants": "many"},
+                {"path": "missing.csv"},
+            ]
+        )
+    )
+    entries = read_manifest(str(manifest_path), PARAMETERS)
+    assert validate_entries(entries) == []
+
+    output_dir = tmp_path / "diagrams"
+    run_batch(entries, str(output_dir), workers=2)
+    report = read_report(output_dir)
+    assert (report["generated"], report["skipped"], report["failed"]) == (1, 0, 2)
+    assert report["logs"]["first.bpmn"]["status"] == "generated"
+    assert "max_variants" in report["logs"]["b.bpmn"]["error"]
+    assert report["logs"]["missing.bpmn"]["status"] == "failed"
+    assert (output_dir / "first.bpmn").exists()
+    assert not (output_dir / "b.bpmn").exists()
+
+
+def test_directory_skips_unchanged_logs(tmp_path):
+    log_dir = tmp_path / "logs"
+    log_dir.mkdir()
+    write_log(log_dir / "a.csv")
+    write_log(log_dir / "b.csv")
+    (log_dir / ".hidden").write_text("not a log")
+    output_dir = tmp_path / "diagrams"
+
+    def run(force: bool = False):
+        entries = read_directory(str(log_dir), PARAMETERS)
+        assert validate_entries(entries) == []
+        run_batch(entries, str(output_dir), workers=2, force=force)
+        report = read_report(output_dir)
+        return {
+            output_name: result["status"]
+            for output_name, result in report["logs"].items()
+        }
+
+    assert run() == {"a.bpmn": "generated", "b.bpmn": "generated"}
+    assert run() == {"a.bpmn": "skipped", "b.bpmn": "skipped"}
+    write_log(log_dir / "b.csv", activity="Approve")
+    assert run() == {"a.bpmn": "skipped", "b.bpmn": "generated"}
+    (output_dir / "a.bpmn").unlink()
+    assert run() == {"a.bpmn": "generated", "b.bpmn": "skipped"}
+    assert run(force=True) == {"a.bpmn": "generated", "b.bpmn": "generated"}
@@ -0,0 +1,83 @@
+import os
+import sys
+
+import pandas as pd
+
+sys.path.insert(
+    0,
+    os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"
+    ),
+)
+
+from generate_log import (
+    ACTIVITY_FIELD_NAME,
+    CASE_ID_FIELD_NAME,
+    ROLE_FIELD_NAME,
+    TIMESTAMP_FIELD_NAME,
+    generate_log,
+)
+from bench_pipeline import summarize_runs
+
+
+def get_traces(dataframe: pd.DataFrame):
+    return dataframe.groupby(CASE_ID_FIELD_NAME, sort=False)[ACTIVITY_FIELD_NAME].agg(
+        tuple
+    )
+
+
+def test_generated_log_is_deterministic():
+    first = generate_log(2000, seed=1)
+    pd.testing.assert_frame_equal(first, generate_log(2000, seed=1))
+    assert not first.equals(generate_log(2000, seed=2))
+
+
+def test_generated_log_has_the_requested_shape():
+    dataframe = generate_log(5000, activities=12, roles=4, seed=3)
+
+    assert 4000 < len(dataframe) < 6000
+    assert dataframe[ACTIVITY_FIELD_NAME].nunique() == 12
+    assert dataframe[ROLE_FIELD_NAME].nunique() == 4
+    # every activity is always performed by the same role
+    assert (
+        dataframe.groupby(ACTIVITY_FIELD_NAME)[ROLE_FIELD_NAME].nunique() == 1
+    ).all()
+    # events are listed case by case, in the order they happened
+    timestamps = dataframe.groupby(CASE_ID_FIELD_NAME)[TIMESTAMP_FIELD_NAME]
+    assert timestamps.apply(lambda column: column.is_monotonic_increasing).all()
+
+
+def test_parallelism_and_loops_add_variants():
+    sequential = generate_log(3000, activities=10, parallelism=0, loop_density=0)
+    assert get_traces(sequential).nunique() == 1
+    assert len(get_traces(sequential).iloc[0]) == 10
+
+    varied = generate_log(3000, activities=10, parallelism=0.5, loop_density=0.3)
+    assert get_traces(varied).nunique() > 10
+    assert get_traces(varied).map(len).max() > 10
+
+
+def test_runs_are_summarized_by_their_median():
+    reports = [
+        {
+            "sizes": {"events": 10},
+            "total_wall_seconds": total,
+            "stages": [
+                {
+                    "name": "mine",
+                    "wall_seconds": total / 2,
+                    "cpu_seconds": total / 4,
+                    "peak_rss_bytes": rss,
+                }
+            ],
+        }
+        for total, rss in [(1.0, 100), (9.0, 300), (2.0, None)]
+    ]
+
+    assert summarize_runs(reports) == {
+        "sizes": {"events": 10},
+        "total_wall_seconds": 2.0,
+        "stages": {
+            "mine": {"wall_seconds": 1.0, "cpu_seconds": 0.5, "peak_rss_bytes": 300}
+        },
+    }
@@ -0,0 +1,147 @@
+import xml.etree.ElementTree as ET
+
+from constants import *
+from utils import add_lane, add_lane_di, add_lane_set
+from bpmn_index import BpmnIndex
+from geometry import GeometryStore
+
+BPMN_XML = f"""<?xml version="1.0" encoding="UTF-8"?>
+<definitions xmlns="{NS['bpmn']}" xmlns:bpmndi="{NS['bpmndi']}" xmlns:omgdc="{NS['omgdc']}" xmlns:omgdi="{NS['ns6']}">
+  <process id="process">
+    <startEvent id="start" name="start"/>
+    <task id="register" name="Register"/>
+    <exclusiveGateway id="split" gatewayDirection="Diverging"/>
+    <task id="check" name="Check"/>
+    <task id="archive" name="Archive"/>
+    <exclusiveGateway id="join" gatewayDirection="Converging"/>
+    <endEvent id="end" name="end"/>
+    <sequenceFlow id="f1" sourceRef="start" targetRef="register"/>
+    <sequenceFlow id="f2" sourceRef="register" targetRef="split"/>
+    <sequenceFlow id="f3" sourceRef="split" targetRef="check"/>
+    <sequenceFlow id="f4" sourceRef="split" targetRef="archive"/>
+    <sequenceFlow id="f5" sourceRef="check" targetRef="join"/>
+    <sequenceFlow id="f6" sourceRef="archive" targetRef="join"/>
+    <sequenceFlow id="f7" sourceRef="join" targetRef="end"/>
+  </process>
+  <bpmndi:BPMNDiagram id="diagram">
+    <bpmndi:BPMNPlane id="plane" bpmnElement="process">
+      <bpmndi:BPMNShape id="start_gui" bpmnElement="start"><omgdc:Bounds x="0" y="100" width="36" height="36"/></bpmndi:BPMNShape>
+      <bpmndi:BPMNShape id="register_gui" bpmnElement="register"><omgdc:Bounds x="80" y="90" width="100" height="60"/></bpmndi:BPMNShape>
+      <bpmndi:BPMNShape id="split_gui" bpmnElement="split"><omgdc:Bounds x="220" y="95" width="50" height="50"/></bpmndi:BPMNShape>
+      <bpmndi:BPMNShape id="check_gui" bpmnElement="check"><omgdc:Bounds x="310" y="20" width="100" height="60"/></bpmndi:BPMNShape>
+      <bpmndi:BPMNShape id="archive_gui" bpmnElement="archive"><omgdc:Bounds x="310" y="160" width="100" height="60"/></bpmndi:BPMNShape>
+      <bpmndi:BPMNShape id="join_gui" bpmnElement="join"><omgdc:Bounds x="450" y="95" width="50" height="50"/></bpmndi:BPMNShape>
+      <bpmndi:BPMNShape id="end_gui" bpmnElement="end"><omgdc:Bounds x="540" y="100" width="36" height="36"/></bpmndi:BPMNShape>
+      <bpmndi:BPMNEdge id="f1_gui" bpmnElement="f1"><omgdi:waypoint x="36" y="118"/><omgdi:waypoint x="80" y="120"/></bpmndi:BPMNEdge>
+      <bpmndi:BPMNEdge id="f2_gui" bpmnElement="f2"><omgdi:waypoint x="180" y="120"/><omgdi:waypoint x="220" y="120"/></bpmndi:BPMNEdge>
+      <bpmndi:BPMNEdge id="f3_gui" bpmnElement="f3"><omgdi:waypoint x="245" y="95"/><omgdi:waypoint x="310" y="50"/></bpmndi:BPMNEdge>
+      <bpmndi:BPMNEdge id="f4_gui" bpmnElement="f4"><omgdi:waypoint x="245" y="145"/><omgdi:waypoint x="310" y="190"/></bpmndi:BPMNEdge>
+      <bpmndi:BPMNEdge id="f5_gui" bpmnElement="f5"><omgdi:waypoint x="410" y="50"/><omgdi:waypoint x="475" y="95"/></bpmndi:BPMNEdge>
+      <bpmndi:BPMNEdge id="f6_gui" bpmnElement="f6"><omgdi:waypoint x="410" y="190"/><omgdi:waypoint x="475" y="145"/></bpmndi:BPMNEdge>
+      <bpmndi:BPMNEdge id="f7_gui" bpmnElement="f7"><omgdi:waypoint x="500" y="120"/><omgdi:waypoint x="540" y="118"/></bpmndi:BPMNEdge>
+    </bpmndi:BPMNPlane>
+  </bpmndi:BPMNDiagram>
+</definitions>
+"""
+
+
+def parse_model() -> ET.Element:
+    return ET.fromstring(BPMN_XML)
+
+
+def test_index_finds_every_element():
+    root = parse_model()
+    index = BpmnIndex(root)
+
+    assert index.process is root.find("bpmn:process", NS)
+    assert index.plane is root.find("bpmndi:BPMNDiagram/bpmndi:BPMNPlane", NS)
+    assert index.lane_set is None
+    assert index.start_event.get("id") == "start"
+    assert index.end_event.get("id") == "end"
+    # the lists keep the order of the document
+    assert [task.get("id") for task in index.tasks] == ["register", "check", "archive"]
+    assert [gateway.get("id") for gateway in index.gateways] == ["split", "join"]
+    assert [flow.get("id") for flow in index.sequence_flows] == [
+        f"f{number}" for number in range(1, 8)
+    ]
+
+
+def test_lookups_match_a_scan_of_the_tree():
+    root = parse_model()
+    index = BpmnIndex(root)
+
+    for element in root.iter():
+        if element.get("id") is not None:
+            assert index.get_element(element.get("id")) is element
+    for shape in root.iter(f"{{{NS['bpmndi']}}}BPMNShape"):
+        assert index.get_shape(shape.get("bpmnElement")) is shape
+        assert index.get_bounds(shape) is shape.find("omgdc:Bounds", NS)
+    for edge in root.iter(f"{{{NS['bpmndi']}}}BPMNEdge"):
+        assert index.get_edge(edge.get("bpmnElement")) is edge
+    assert index.get_element("missing") is None
+    assert index.get_shape("missing") is None
+
+
+def test_added_lanes_are_registered():
+    index = BpmnIndex(parse_model())
+
+    lane_set = add_lane_set(index.process, "custom_laneSet")
+    index.add_element(lane_set)
+    lane = add_lane(lane_set, "Clerk")
+    lane_shape = add_lane_di(index.plane, lane, 0, 0, 600)
+    index.add_element(lane)
+    index.add_element(lane_shape)
+
+    assert index.lane_set is lane_set
+    assert index.get_element("Lane_Clerk") is lane
+    assert index.get_shape("Lane_Clerk") is lane_shape
+    assert index.get_bounds(lane_shape).get("width") == "600"
+    assert [task.get("id") for task in index.tasks] == ["register", "check", "archive"]
+
+
+def test_geometry_is_read_as_floats():
+    geometry = GeometryStore(BpmnIndex(parse_model()))
+
+    shape = geometry.get_shape("split")
+    assert (shape.x, shape.y, shape.width, shape.height) == (220.0, 95.0, 50.0, 50.0)
+    assert geometry.get_edge("f3").waypoints == [(245.0, 95.0), (310.0, 50.0)]
+    assert len(geometry.shapes) == 7 and len(geometry.edges) == 7
+
+
+def test_geometry_is_written_back_once():
+    root = parse_model()
+    index = BpmnIndex(root)
+    geometry = GeometryStore(index)
+    bounds = index.get_bounds(index.get_shape("check"))
+
+    shape = geometry.get_shape("check")
+    shape.x += 10.5
+    shape.y = 40.0
+    geometry.get_edge("f5").waypoints = [(420.5, 70.0), (450.0, 70.0), (475.0, 95.0)]
+    # nothing is written before write_back
+    assert bounds.get("x") == "310"
+
+    geometry.write_back()
+    # the bounds element is updated in place, not replaced
+    assert index.get_bounds(index.get_shape("check")) is bounds
+    assert (bounds.get("x"), bounds.get("y")) == ("320.5", "40.0")
+    waypoints = index.get_edge("f5").findall("ns6:waypoint", NS)
+    assert [(point.get("x"), point.get("y")) for point in waypoints] == [
+        ("420.5", "70.0"),
+        ("450.0", "70.0"),
+        ("475.0", "95.0"),
+    ]
+    assert GeometryStore(BpmnIndex(root)).get_shape("check").x == 320.5
+
+
+def test_added_lane_gets_its_geometry():
+    index = BpmnIndex(parse_model())
+    geometry = GeometryStore(index)
+
+    lane = add_lane(add_lane_set(index.process, "custom_laneSet"), "Clerk")
+    lane_shape = add_lane_di(index.plane, lane, -100, 0, 700)
+    index.add_element(lane_shape)
+    shape = geometry.add_shape(lane_shape)
+
+    assert shape is geometry.get_shape("Lane_Clerk")
+    assert (shape.x, shape.width, shape.height) == (-100.0, 700.0, LANE_HEIGHT)
@@ -0,0 +1,138 @@
+import os
+import time
+
+import cache
+from constants import *
+from cache import FileCache, make_cache_key, write_file_atomically
+
+
+def make_cache(tmp_path, **settings) -> FileCache:
+    settings = {"max_entries": 10, **settings}
+    file_cache = FileCache(str(tmp_path / "cache"), ".bpmn", **settings)
+    file_cache.create_directory()
+    return file_cache
+
+
+def test_read_returns_cached_content(tmp_path):
+    file_cache = make_cache(tmp_path)
+    write_file_atomically(file_cache.get_path("key"), b"<definitions/>")
+    assert file_cache.read("key") == b"<definitions/>"
+    assert file_cache.read("missing") is None
+
+
+def test_entry_evicted_during_get_is_a_miss(tmp_path, monkeypatch):
+    file_cache = make_cache(tmp_path)
+    path = file_cache.get_path("key")
+    write_file_atomically(path, b"<definitions/>")
+
+    utime = os.utime
+
+    def evict_then_utime(path, *args, **kwargs):
+        # another worker evicts the entry right after it was found
+        os.unlink(path)
+        utime(path, *args, **kwargs)
+
+    monkeypatch.setattr(cache.os, "utime", evict_then_utime)
+    assert file_cache.get("key") is None
+
+
+def add_entry(file_cache: FileCache, key: str, age: float, size: int = 10) -> None:
+    path = file_cache.get_path(key)
+    write_file_atomically(path, b"x" * size)
+    modified_at = time.time() - age
+    os.utime(path, (modified_at, modified_at))
+
+
+def list_keys(file_cache: FileCache):
+    return sorted(
+        filename.split(".")[0] for filename in os.listdir(file_cache.directory)
+    )
+
+
+def test_cache_key_depends_on_content_and_parameters():
+    key = make_cache_key("digest", layout="layered", miner="dfg")
+    assert key == make_cache_key("digest", miner="dfg", layout="layered")
+    assert key != make_cache_key("other", layout="layered", miner="dfg")
+    assert key != make_cache_key("digest", layout="pm4py", miner="dfg")
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    file_cache = make_cache(tmp_path, max_entries=2)
+    for age, key in enumerate(["new", "middle", "old"]):
+        add_entry(file_cache, key, age=(age + 1) * 10)
+    # a hit makes the oldest entry the most recently used one
+    assert file_cache.get("old") is not None
+
+    file_cache.evict()
+    assert list_keys(file_cache) == ["new", "old"]
+
+
+def test_expired_entries_are_misses(tmp_path):
+    file_cache = make_cache(tmp_path, max_age_seconds=60)
+    add_entry(file_cache, "fresh", age=10)
+    add_entry(file_cache, "stale", age=120)
+
+    assert file_cache.get("stale") is None
+    assert file_cache.get("fresh") is not None
+    assert list_keys(file_cache) == ["fresh"]
+
+
+def test_companions_count_and_go_with_their_entry(tmp_path):
+    file_cache = FileCache(
+        str(tmp_path / "cache"),
+        ".bpmn",
+        max_entries=10,
+        companion_suffixes=(".svg",),
+        max_bytes=150,
+    )
+    file_cache.create_directory()
+    add_entry(file_cache, "new", age=10, size=50)
+    add_entry(file_cache, "old", age=20, size=50)
+    # the preview of the newer entry pushes the older one over the size limit
+    write_file_atomically(file_cache.get_companion_path("new", ".svg"), b"x" * 60)
+    write_file_atomically(file_cache.get_companion_path("old", ".svg"), b"x" * 10)
+
+    file_cache.evict()
+    assert sorted(os.listdir(file_cache.directory)) == ["new.bpmn", "new.svg"]
+
+
+def test_recently_used_entries_are_not_evicted_for_space(tmp_path):
+    file_cache = make_cache(tmp_path, max_entries=1, min_age_seconds=60)
+    add_entry(file_cache, "new", age=10)
+    add_entry(file_cache, "recent", age=20)
+    add_entry(file_cache, "old", age=120)
+
+    file_cache.evict()
+    assert list_keys(file_cache) == ["new", "recent"]
+
+
+def post_log(api_client, **data):
+    log = "\n".join(
+        [
+            "Case ID,Activity,Start Timestamp,Resource",
+            "1,Register,2024-01-01 08:00:00,Clerk",
+            "1,Check,2024-01-01 09:00:00,Manager",
+        ]
+    )
+    return api_client.post(
+        "/generate_bpmn/",
+        files={"csv_file": ("log.csv", log.encode(), "text/csv")},
+        data={"layout": LAYOUT_LAYERED, **data},
+    )
+
+
+def test_identical_uploads_are_served_from_the_cache(api_client):
+    first = post_log(api_client)
+    second = post_log(api_client)
+    other = post_log(api_client, lane_order="name")
+
+    assert first.status_code == second.status_code == other.status_code == 200
+    assert 'cache;desc="hit"' not in first.headers["Server-Timing"]
+    assert second.headers["Server-Timing"] == 'cache;desc="hit"'
+    assert 'cache;desc="hit"' not in other.headers["Server-Timing"]
+    assert second.json()["diagram_url"] == first.json()["diagram_url"]
+    assert other.json()["diagram_url"] != first.json()["diagram_url"]
+
+    # the diagram itself is served by the static files of the cache directory
+    path = first.json()["diagram_url"].split("/", 3)[-1]
+    assert api_client.get(f"/{path}").content.startswith(b"<?xml")
@@ -0,0 +1,44 @@
+import multiprocessing
+
+from constants import *
+from incremental import load_log_state
+from pipeline import (
+    LOG_STATE_CACHE,
+    MODEL_CACHE,
+    RESULT_CACHE,
+    run_incremental_generation_logic,
+)
+
+
+def append_case(case: int) -> None:
+    events = "\n".join(
+        [
+            "case,activity,timestamp,role",
+            f"{case},Register,2024-01-01 08:00:00,Clerk",
+            f"{case},Check,2024-01-01 09:00:00,Manager",
+            f"{case},Archive,2024-01-01 10:00:00,Clerk",
+        ]
+    )
+    run_incremental_generation_logic(
+        events.encode(),
+        "log",
+        case_id_field_name="case",
+        activity_field_name="activity",
+        timestamp_field_name="timestamp",
+        role_field_name="role",
+        layout=LAYOUT_LAYERED,
+    )
+
+
+def test_concurrent_appends_keep_all_events(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    for cache in (RESULT_CACHE, MODEL_CACHE, LOG_STATE_CACHE):
+        cache.create_directory()
+
+    # every process appends its own case to the same log
+    cases = list(range(8))
+    with multiprocessing.get_context("fork").Pool(4) as pool:
+        pool.map(append_case, cases)
+
+    log_state = load_log_state(LOG_STATE_CACHE.get_path("log"))
+    assert sorted(log_state.case_variants) == [str(case) for case in cases]
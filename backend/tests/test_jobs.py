@@ -0,0 +1,109 @@
+import time
+
+import pytest
+
+from constants import *
+from jobs import *
+from pipeline import run_bpmn_generation_logic
+
+LOG = "\n".join(
+    [
+        "Case ID,Activity,Start Timestamp,Resource",
+        "1,Register,2024-01-01 08:00:00,Clerk",
+        "1,Check,2024-01-01 09:00:00,Manager",
+        "2,Register,2024-01-02 08:00:00,Clerk",
+    ]
+)
+
+
+def submit_job(api_client, log: str) -> str:
+    response = api_client.post(
+        "/jobs/",
+        files={"csv_file": ("log.csv", log.encode(), "text/csv")},
+        data={"layout": LAYOUT_LAYERED},
+    )
+    assert response.status_code == 202
+    assert response.json()["status_url"] == f"/jobs/{response.json()['job_id']}"
+    return response.json()["job_id"]
+
+
+def wait_for_job(api_client, job_id: str):
+    # the job runs in the background of the app, which keeps running between requests
+    for _ in range(300):
+        job = api_client.get(f"/jobs/{job_id}").json()
+        if job["status"] in FINISHED_JOB_STATUSES:
+            return job
+        time.sleep(0.1)
+    raise AssertionError(f"Job {job_id} did not finish")
+
+
+def test_failed_phase_is_finished(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    store.create("job")
+    progress = JobProgress(store, "job")
+
+    with progress.phase("parse"):
+        pass
+    with pytest.raises(KeyError):
+        with progress.phase("mine"):
+            raise KeyError("activity")
+
+    phases = store.get("job")["phases"]
+    assert [phase["name"] for phase in phases] == ["parse", "mine"]
+    assert all("finished_at" in phase for phase in phases)
+    assert [phase.get("failed", False) for phase in phases] == [False, True]
+
+
+def test_job_is_done(api_client):
+    job_id = submit_job(api_client, LOG)
+    job = wait_for_job(api_client, job_id)
+
+    assert job["status"] == JOB_DONE
+    assert job["diagram_url"].endswith(".bpmn")
+    assert job["phases"] and all("finished_at" in phase for phase in job["phases"])
+    # an identical log is served from the cache right away
+    job = api_client.get(f"/jobs/{submit_job(api_client, LOG)}").json()
+    assert job["status"] == JOB_DONE and job["phases"] == []
+
+    response = api_client.delete(f"/jobs/{job_id}")
+    assert response.status_code == 409
+
+
+def test_failed_job_reports_its_error(api_client):
+    job = wait_for_job(
+        api_client, submit_job(api_client, LOG.replace("Resource", "Role"))
+    )
+
+    assert job["status"] == JOB_FAILED
+    assert "Resource" in job["error"]
+    assert job["phases"][-1]["failed"]
+
+
+def test_unknown_job_is_not_found(api_client):
+    assert api_client.get("/jobs/unknown").status_code == 404
+    assert api_client.delete("/jobs/unknown").status_code == 404
+
+
+def test_cancelled_job_stops_before_its_next_phase(api_client, tmp_path):
+    import main
+
+    main.JOB_STORE.create("job")
+    response = api_client.delete("/jobs/job")
+    assert response.status_code == 202
+    assert response.json()["cancel_requested"]
+
+    log_path = tmp_path / "log.csv"
+    log_path.write_text(LOG)
+    with pytest.raises(JobCancelledError):
+        run_bpmn_generation_logic(
+            str(log_path),
+            case_id_field_name="Case ID",
+            activity_field_name="Activity",
+            timestamp_field_name="Start Timestamp",
+            role_field_name="Resource",
+            output_bpmn_path=str(tmp_path / "log.bpmn"),
+            layout=LAYOUT_LAYERED,
+            progress=JobProgress(main.JOB_STORE, "job"),
+        )
+    assert main.JOB_STORE.get("job")["phases"] == []
+    assert not (tmp_path / "log.bpmn").exists()
@@ -0,0 +1,355 @@
+import os
+import shutil
+import xml.etree.ElementTree as ET
+from types import SimpleNamespace
+from collections import Counter
+from typing import List
+
+import pandas as pd
+import pytest
+
+from constants import *
+from utils import LogFormatError, get_lane_roles, get_task_role_map
+from miners import (
+    END_NODE,
+    START_NODE,
+    filter_directly_follows,
+    get_directly_follows_counts,
+)
+from pm4py.objects.bpmn.obj import BPMN
+
+from bpmn_index import BpmnIndex
+from canonical import sort_bpmn_model
+from geometry import (
+    GeometryStore,
+    ShapeGeometry,
+    find_nearest_tasks,
+    find_overlapping_clusters,
+)
+from pipeline import fix_overlaps, run_bpmn_generation_logic
+
+EXAMPLE_LOGS_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+    "example_logs",
+)
+
+
+def skip_without_graphviz(layout: str):
+    # the pm4py layout runs graphviz while the model is serialized
+    if layout == LAYOUT_PM4PY and shutil.which("dot") is None:
+        pytest.skip("graphviz is not installed")
+
+
+def make_shape(bpmn_element: str, x: float, y: float, width=100, height=80):
+    return ShapeGeometry(bpmn_element, None, x, y, width, height)
+
+
+def test_overlaps_are_not_chained():
+    # every shape only conflicts with the next one
+    shapes = [make_shape(f"Task_{i}", i * 60, 0) for i in range(5)]
+    clusters = find_overlapping_clusters(shapes)
+    assert all(len(cluster) == 2 for cluster in clusters)
+
+
+def test_gateways_get_the_nearest_task():
+    # a -> g1 -> g2 -> b and c -> g2, g2 is one flow away from c but two from a
+    predecessors = {"a": [], "b": ["g2"], "c": [], "g1": ["a"], "g2": ["g1", "c"]}
+    successors = {"a": ["g1"], "g1": ["g2"], "g2": ["b"], "c": ["g2"]}
+    gateway_ids = {"g1", "g2"}
+    assert find_nearest_tasks(["a", "b", "c"], successors, gateway_ids) == {
+        "g1": "a",
+        "g2": "c",
+    }
+    assert find_nearest_tasks(["a", "b", "c"], predecessors, gateway_ids) == {
+        "g2": "b",
+        "g1": "b",
+    }
+
+
+def test_overlapping_cluster_stays_in_its_lane():
+    lanes = [
+        make_shape("Lane_a", 0, 0, 1000, LANE_HEIGHT),
+        make_shape("Lane_b", 0, LANE_HEIGHT, 1000, LANE_HEIGHT),
+    ]
+    # five shapes on top of each other close to the bottom of lane a
+    tasks = [make_shape(f"Task_{i}", 100, LANE_HEIGHT - 90) for i in range(5)]
+    geometry = SimpleNamespace(
+        shapes={shape.bpmn_element: shape for shape in lanes + tasks}
+    )
+
+    fix_overlaps(geometry)
+
+    for task in tasks:
+        assert task.y >= 0
+        assert task.y + task.height <= LANE_HEIGHT
+    assert len({task.y for task in tasks}) == len(tasks)
+
+
+@pytest.mark.parametrize("layout", LAYOUTS)
+def test_tasks_stay_inside_their_lanes(tmp_path, layout):
+    skip_without_graphviz(layout)
+
+    log_path = os.path.join(EXAMPLE_LOGS_DIR, "purchasingExample.csv")
+    output_bpmn_path = str(tmp_path / "purchasingExample.bpmn")
+    run_bpmn_generation_logic(
+        log_path,
+        case_id_field_name="Case ID",
+        activity_field_name="Activity",
+        timestamp_field_name="Complete Timestamp",
+        role_field_name="Role",
+        output_bpmn_path=output_bpmn_path,
+        role_conflict_policy="most_frequent",
+        layout=layout,
+    )
+
+    task_to_role = get_task_role_map(
+        pd.read_csv(log_path), "Activity", "Role", "most_frequent"
+    )
+    index = BpmnIndex(ET.parse(output_bpmn_path).getroot())
+    geometry = GeometryStore(index)
+    for task in index.tasks:
+        shape = geometry.get_shape(task.get("id"))
+        lane = geometry.get_shape(f"Lane_{task_to_role[task.get('name')]}")
+        assert lane.y <= shape.y
+        assert shape.y + shape.height <= lane.y + lane.height
+
+
+@pytest.mark.parametrize("layout", LAYOUTS)
+def test_activity_without_role_is_reported(tmp_path, layout):
+    skip_without_graphviz(layout)
+    log_path = tmp_path / "log.csv"
+    rows = ["case,activity,timestamp,role"]
+    for case in range(3):
+        rows.append(f"{case},Register,2024-01-0{case + 1} 08:00:00,Clerk")
+        rows.append(f"{case},Check,2024-01-0{case + 1} 09:00:00,")
+        rows.append(f"{case},Archive,2024-01-0{case + 1} 10:00:00,Clerk")
+    log_path.write_text("\n".join(rows) + "\n")
+
+    with pytest.raises(LogFormatError, match="Check"):
+        run_bpmn_generation_logic(
+            str(log_path),
+            case_id_field_name="case",
+            activity_field_name="activity",
+            timestamp_field_name="timestamp",
+            role_field_name="role",
+            output_bpmn_path=str(tmp_path / "log.bpmn"),
+            layout=layout,
+        )
+
+
+@pytest.mark.parametrize("layout", LAYOUTS)
+def test_log_without_roles_is_reported(tmp_path, layout):
+    skip_without_graphviz(layout)
+    log_path = tmp_path / "log.csv"
+    rows = ["case,activity,timestamp,role"]
+    for case in range(3):
+        rows.append(f"{case},Register,2024-01-0{case + 1} 08:00:00,")
+        rows.append(f"{case},Archive,2024-01-0{case + 1} 10:00:00,")
+    log_path.write_text("\n".join(rows) + "\n")
+
+    with pytest.raises(LogFormatError):
+        run_bpmn_generation_logic(
+            str(log_path),
+            case_id_field_name="case",
+            activity_field_name="activity",
+            timestamp_field_name="timestamp",
+            role_field_name="role",
+            output_bpmn_path=str(tmp_path / "log.bpmn"),
+            layout=layout,
+        )
+
+
+@pytest.mark.parametrize("layout", LAYOUTS)
+def test_output_is_reproducible(tmp_path, layout):
+    skip_without_graphviz(layout)
+
+    log_path = os.path.join(EXAMPLE_LOGS_DIR, "repairExample.csv")
+    outputs = []
+    for run in range(2):
+        output_bpmn_path = tmp_path / f"repairExample_{run}.bpmn"
+        run_bpmn_generation_logic(
+            log_path,
+            case_id_field_name="Case ID",
+            activity_field_name="Activity",
+            timestamp_field_name="Start Timestamp",
+            role_field_name="Resource",
+            output_bpmn_path=str(output_bpmn_path),
+            layout=layout,
+        )
+        outputs.append(output_bpmn_path.read_bytes())
+    assert outputs[0] == outputs[1]
+
+
+def build_model(reverse: bool) -> BPMN:
+    # start -> split -> (A | B) -> join -> end, with the elements added in either order
+    start = BPMN.StartEvent(name="start")
+    split = BPMN.ParallelGateway(
+        name="", gateway_direction=BPMN.Gateway.Direction.DIVERGING
+    )
+    first = BPMN.Task(name="A")
+    second = BPMN.Task(name="B")
+    join = BPMN.ParallelGateway(
+        name="", gateway_direction=BPMN.Gateway.Direction.CONVERGING
+    )
+    end = BPMN.NormalEndEvent(name="end")
+    nodes = [start, split, first, second, join, end]
+    flows = [
+        (start, split),
+        (split, first),
+        (split, second),
+        (first, join),
+        (second, join),
+        (join, end),
+    ]
+    if reverse:
+        nodes.reverse()
+        flows.reverse()
+
+    bpmn_model = BPMN()
+    for node in nodes:
+        bpmn_model.add_node(node)
+    for source, target in flows:
+        bpmn_model.add_flow(BPMN.SequenceFlow(source, target))
+    return bpmn_model
+
+
+def get_graph_order(bpmn_model: BPMN) -> List:
+    graph = bpmn_model.get_graph()
+    return [(type(node).__name__, node.get_name()) for node in graph.nodes] + [
+        (source.get_name(), target.get_name()) for source, target in graph.edges()
+    ]
+
+
+def test_model_order_does_not_depend_on_insertion_order():
+    # graphviz lays out the nodes in the order pm4py declares them, which is the order of the graph
+    models = [build_model(reverse) for reverse in (False, True)]
+    assert get_graph_order(models[0]) != get_graph_order(models[1])
+    for bpmn_model in models:
+        sort_bpmn_model(bpmn_model)
+    assert get_graph_order(models[0]) == get_graph_order(models[1])
+    assert get_graph_order(models[0])[0] == ("StartEvent", "start")
+
+
+def write_log_with_rare_activity(log_path) -> None:
+    # X only occurs in one rare variant and is the only activity of the Auditor role
+    rows = ["case,activity,timestamp,role"]
+    for case in range(5):
+        rows.append(f"{case},A,2024-01-01 0{case}:00:00,Clerk")
+        rows.append(f"{case},B,2024-01-01 0{case}:30:00,Clerk")
+    rows.append("9,A,2024-01-02 08:00:00,Clerk")
+    rows.append("9,X,2024-01-02 09:00:00,Auditor")
+    rows.append("9,B,2024-01-02 10:00:00,Clerk")
+    log_path.write_text("\n".join(rows) + "\n")
+
+
+def get_lane_names(bpmn_path: str) -> List[str]:
+    index = BpmnIndex(ET.parse(bpmn_path).getroot())
+    return [lane.get("name") for lane in index.lane_set]
+
+
+@pytest.mark.parametrize("layout", LAYOUTS)
+def test_filtered_activity_leaves_no_lane(tmp_path, layout):
+    skip_without_graphviz(layout)
+
+    log_path = tmp_path / "log.csv"
+    write_log_with_rare_activity(log_path)
+    output_bpmn_path = str(tmp_path / "log.bpmn")
+    run_bpmn_generation_logic(
+        str(log_path),
+        case_id_field_name="case",
+        activity_field_name="activity",
+        timestamp_field_name="timestamp",
+        role_field_name="role",
+        output_bpmn_path=output_bpmn_path,
+        layout=layout,
+        max_variants=1,
+    )
+    assert get_lane_names(output_bpmn_path) == ["Clerk"]
+
+
+@pytest.mark.parametrize("miner", MINERS)
+def test_variant_coverage_leaves_no_lane(tmp_path, miner):
+    log_path = tmp_path / "log.csv"
+    write_log_with_rare_activity(log_path)
+    output_bpmn_path = str(tmp_path / "log.bpmn")
+    run_bpmn_generation_logic(
+        str(log_path),
+        case_id_field_name="case",
+        activity_field_name="activity",
+        timestamp_field_name="timestamp",
+        role_field_name="role",
+        output_bpmn_path=output_bpmn_path,
+        layout=LAYOUT_LAYERED,
+        miner=miner,
+        variant_coverage=0.8,
+    )
+    assert get_lane_names(output_bpmn_path) == ["Clerk"]
+
+
+def test_directly_follows_noise_keeps_every_activity():
+    # rare arcs are dropped, but never the last arc into or out of an activity
+    directly_follows = get_directly_follows_counts(
+        Counter({("A", "B"): 50, ("A", "X", "B"): 1})
+    )
+    kept = filter_directly_follows(directly_follows, noise_threshold=0.9)
+    assert {activity for arc in kept for activity in arc} == {
+        START_NODE,
+        "A",
+        "B",
+        "X",
+        END_NODE,
+    }
+
+
+def test_lane_orders():
+    task_to_role = {"Register": "Clerk", "Check": "Manager", "Audit": "Auditor"}
+    role_event_counts = {"Clerk": 5, "Manager": 9, "Auditor": 5}
+
+    assert get_lane_roles(task_to_role, "appearance") == ["Clerk", "Manager", "Auditor"]
+    assert get_lane_roles(task_to_role, "name") == ["Auditor", "Clerk", "Manager"]
+    # ties keep the order of appearance
+    assert get_lane_roles(task_to_role, "frequency", role_event_counts) == [
+        "Manager",
+        "Clerk",
+        "Auditor",
+    ]
+    with pytest.raises(ValueError):
+        get_lane_roles(task_to_role, "random")
+
+
+@pytest.mark.parametrize("layout", LAYOUTS)
+def test_lanes_are_stacked_in_the_requested_order(tmp_path, layout):
+    skip_without_graphviz(layout)
+
+    # the Clerk shows up first, but the Manager performs most of the events
+    rows = ["case,activity,timestamp,role"]
+    for case in range(3):
+        rows.append(f"{case},Register,2024-01-01 0{case}:00:00,Clerk")
+        rows.append(f"{case},Check,2024-01-01 0{case}:10:00,Manager")
+        rows.append(f"{case},Approve,2024-01-01 0{case}:20:00,Manager")
+    log_path = tmp_path / "log.csv"
+    log_path.write_text("\n".join(rows) + "\n")
+
+    for lane_order, expected_roles in [
+        ("appearance", ["Clerk", "Manager"]),
+        ("frequency", ["Manager", "Clerk"]),
+    ]:
+        output_bpmn_path = tmp_path / f"{lane_order}.bpmn"
+        run_bpmn_generation_logic(
+            str(log_path),
+            case_id_field_name="case",
+            activity_field_name="activity",
+            timestamp_field_name="timestamp",
+            role_field_name="role",
+            output_bpmn_path=str(output_bpmn_path),
+            lane_order=lane_order,
+            layout=layout,
+        )
+        index = BpmnIndex(ET.parse(output_bpmn_path).getroot())
+        assert get_lane_names(str(output_bpmn_path)) == expected_roles
+
+        # lanes are placed one below the other, all of the same width
+        geometry = GeometryStore(index)
+        lanes = [geometry.get_shape(lane.get("id")) for lane in index.lane_set]
+        assert len({(lane.x, lane.width, lane.height) for lane in lanes}) == 1
+        assert lanes[1].y == lanes[0].y + LANE_HEIGHT
@@ -0,0 +1,177 @@
+import gzip
+import io
+
+import pandas as pd
+import pytest
+
+from miners import get_trace_variants
+from utils import LogFormatError, concat_chunks, parse_timestamp_column
+from log_formats import *
+from pipeline import convert_log_to_dataframe
+
+
+def test_concat_chunks_keeps_categories():
+    chunks = [
+        pd.DataFrame({"activity": pd.Categorical(["a", "b"])}),
+        pd.DataFrame({"activity": pd.Categorical(["c"])}),
+    ]
+    dataframe = concat_chunks(chunks)
+    assert isinstance(dataframe["activity"].dtype, pd.CategoricalDtype)
+    assert list(dataframe["activity"]) == ["a", "b", "c"]
+
+
+def test_concat_chunks_without_chunks():
+    with pytest.raises(LogFormatError):
+        concat_chunks([])
+
+
+def test_mixed_timestamp_formats_are_parsed():
+    column = pd.Series(
+        ["2024-01-02 10:00:00", "03/01/2024 09:00", "2024-01-01T08:00:00"],
+        name="timestamp",
+    )
+    parsed = parse_timestamp_column(column)
+    assert pd.api.types.is_datetime64_any_dtype(parsed)
+    assert list(parsed.sort_values().index) == [2, 0, 1]
+
+
+def test_invalid_timestamps_are_reported():
+    column = pd.Series(["2024-01-01 08:00:00", "yesterday"], name="timestamp")
+    with pytest.raises(LogFormatError, match="timestamp"):
+        parse_timestamp_column(column)
+
+
+def test_trace_variants_follow_mixed_timestamps():
+    dataframe = pd.DataFrame(
+        {
+            "case": ["1", "1", "1"],
+            "activity": ["Archive", "Register", "Check"],
+            "timestamp": [
+                "2024-01-10 08:00:00",
+                "2024-01-09 08:00:00",
+                "01/09/2024 12:00",
+            ],
+        }
+    )
+    dataframe["timestamp"] = parse_timestamp_column(dataframe["timestamp"])
+    variants = get_trace_variants(dataframe, "case", "activity", "timestamp")
+    assert list(variants) == [("Register", "Check", "Archive")]
+
+
+LOG = pd.DataFrame(
+    {
+        "case": ["1", "1", "2"],
+        "activity": ["Register", "Check", "Register"],
+        "timestamp": [
+            "2024-01-01 08:00:00",
+            "2024-01-01 09:00:00",
+            "2024-01-02 08:00:00",
+        ],
+        "role": ["Clerk", "Manager", "Clerk"],
+    }
+)
+
+XES_LOG = """<?xml version="1.0" encoding="UTF-8"?>
+<log xes.version="1.0" xmlns="http://www.xes-standard.org/">
+  <trace>
+    <string key="concept:name" value="1"/>
+    <event>
+      <string key="concept:name" value="Register"/>
+      <string key="org:resource" value="Clerk"/>
+      <date key="time:timestamp" value="2024-01-01T08:00:00.000+00:00"/>
+    </event>
+    <event>
+      <string key="concept:name" value="Check"/>
+      <string key="org:resource" value="Manager"/>
+      <date key="time:timestamp" value="2024-01-01T09:00:00.000+00:00"/>
+    </event>
+  </trace>
+</log>
+"""
+
+
+def write_log(log_format: str) -> bytes:
+    output = io.BytesIO()
+    if log_format == LOG_FORMAT_PARQUET:
+        pytest.importorskip("pyarrow")
+        LOG.to_parquet(output)
+    elif log_format == LOG_FORMAT_FEATHER:
+        pytest.importorskip("pyarrow")
+        LOG.to_feather(output)
+    elif log_format == COMPRESSION_ZSTD:
+        zstandard = pytest.importorskip("zstandard")
+        output.write(
+            zstandard.ZstdCompressor().compress(LOG.to_csv(index=False).encode())
+        )
+    elif log_format == COMPRESSION_GZIP:
+        output.write(gzip.compress(LOG.to_csv(index=False).encode()))
+    else:
+        output.write(LOG.to_csv(index=False).encode())
+    return output.getvalue()
+
+
+@pytest.mark.parametrize(
+    "log_format, detected",
+    [
+        (LOG_FORMAT_CSV, (LOG_FORMAT_CSV, None)),
+        (COMPRESSION_GZIP, (LOG_FORMAT_CSV, COMPRESSION_GZIP)),
+        (COMPRESSION_ZSTD, (LOG_FORMAT_CSV, COMPRESSION_ZSTD)),
+        (LOG_FORMAT_PARQUET, (LOG_FORMAT_PARQUET, None)),
+        (LOG_FORMAT_FEATHER, (LOG_FORMAT_FEATHER, None)),
+    ],
+)
+@pytest.mark.parametrize("from_path", [False, True])
+def test_log_round_trip(tmp_path, log_format, detected, from_path):
+    log_source = write_log(log_format)
+    if from_path:
+        log_path = tmp_path / "log"
+        log_path.write_bytes(log_source)
+        log_source = str(log_path)
+
+    assert detect_log_format(log_source) == detected
+    dataframe = read_log(log_source, columns=["case", "activity"])
+    assert list(dataframe.columns) == ["case", "activity"]
+    assert dataframe.astype(str).to_dict("list") == {
+        "case": list(LOG["case"]),
+        "activity": list(LOG["activity"]),
+    }
+
+
+@pytest.mark.parametrize("compression", [None, COMPRESSION_GZIP])
+def test_xes_log_is_read(compression):
+    log_source = XES_LOG.encode()
+    if compression == COMPRESSION_GZIP:
+        log_source = gzip.compress(log_source)
+
+    assert detect_log_format(log_source) == (LOG_FORMAT_XES, compression)
+    dataframe = read_log(
+        log_source,
+        columns=["case:concept:name", "concept:name", "org:resource"],
+        categorical_columns=["concept:name"],
+    )
+    assert dataframe.to_dict("list") == {
+        "case:concept:name": ["1", "1"],
+        "concept:name": ["Register", "Check"],
+        "org:resource": ["Clerk", "Manager"],
+    }
+    assert isinstance(dataframe["concept:name"].dtype, pd.CategoricalDtype)
+
+
+@pytest.mark.parametrize(
+    "log_format",
+    [
+        LOG_FORMAT_CSV,
+        COMPRESSION_GZIP,
+        COMPRESSION_ZSTD,
+        LOG_FORMAT_PARQUET,
+        LOG_FORMAT_FEATHER,
+    ],
+)
+def test_missing_columns_are_reported(log_format):
+    with pytest.raises(LogFormatError, match="resource"):
+        convert_log_to_dataframe(write_log(log_format), columns=["case", "resource"])
+
+
+def test_missing_xes_columns_are_reported():
+    with pytest.raises(LogFormatError, match="org:role"):
+        convert_log_to_dataframe(XES_LOG.encode(), columns=["concept:name", "org:role"])
@@ -0,0 +1,114 @@
+import tracemalloc
+
+from constants import *
+from jobs import PipelineProgress
+from metrics import MetricsRegistry, StageMetrics, format_server_timing
+
+LOG = "\n".join(
+    [
+        "Case ID,Activity,Start Timestamp,Resource",
+        "1,Register,2024-01-01 08:00:00,Clerk",
+        "1,Check,2024-01-01 09:00:00,Manager",
+        "2,Register,2024-01-02 08:00:00,Clerk",
+    ]
+)
+
+
+class RecordingProgress(PipelineProgress):
+    def __init__(self):
+        self.events = []
+
+    def record(self, name: str, value: int) -> None:
+        self.events.append((name, value))
+
+
+def make_report():
+    return {
+        "stages": [
+            {
+                "name": "parse",
+                "wall_seconds": 0.25,
+                "cpu_seconds": 0.2,
+                "peak_rss_bytes": 1000,
+            },
+            {
+                "name": "mine",
+                "wall_seconds": 0.5,
+                "cpu_seconds": 0.5,
+                "peak_rss_bytes": 3000,
+            },
+        ],
+        "sizes": {"events": 3, "cases": 2},
+        "total_wall_seconds": 1.0,
+    }
+
+
+def test_stages_are_measured():
+    progress = RecordingProgress()
+    metrics = StageMetrics(progress, trace_memory=True)
+    try:
+        with metrics.phase("parse"):
+            metrics.record("events", 3)
+            data = list(range(100_000))
+        with metrics.phase("mine"):
+            pass
+        del data
+    finally:
+        # tracing slows down everything that runs after it
+        tracemalloc.stop()
+
+    report = metrics.report()
+    assert [stage["name"] for stage in report["stages"]] == ["parse", "mine"]
+    assert report["sizes"] == {"events": 3}
+    # the sizes also reach the progress of the job
+    assert progress.events == [("events", 3)]
+    parse = report["stages"][0]
+    assert parse["wall_seconds"] >= 0 and parse["cpu_seconds"] >= 0
+    assert parse["peak_rss_bytes"] > 0
+    assert parse["peak_traced_bytes"] > 100_000
+
+
+def test_server_timing_lists_every_stage():
+    assert (
+        format_server_timing(make_report())
+        == "parse;dur=250.0, mine;dur=500.0, total;dur=1000.0"
+    )
+
+
+def test_registry_renders_prometheus_text():
+    registry = MetricsRegistry()
+    registry.observe(make_report())
+    registry.observe(make_report())
+    registry.increment("result_cache_hits")
+    text = registry.render()
+
+    assert "# TYPE bpmn_generations_total counter" in text
+    assert "bpmn_generations_total 2\n" in text
+    assert "bpmn_result_cache_hits_total 1\n" in text
+    assert 'bpmn_stage_wall_seconds_total{stage="mine"} 1.0\n' in text
+    assert 'bpmn_stage_peak_rss_bytes{stage="mine"} 3000\n' in text
+    assert 'bpmn_input_size_total{metric="events"} 6\n' in text
+    assert "peak_traced_bytes" not in text
+
+
+def test_generation_is_reported(api_client, monkeypatch):
+    import main
+
+    monkeypatch.setattr(main, "METRICS_REGISTRY", MetricsRegistry())
+    response = api_client.post(
+        "/generate_bpmn/",
+        files={"csv_file": ("log.csv", LOG.encode(), "text/csv")},
+        data={"layout": LAYOUT_LAYERED},
+    )
+
+    stages = [
+        part.split(";")[0] for part in response.headers["Server-Timing"].split(", ")
+    ]
+    assert stages[0] == "parse" and stages[-1] == "total"
+    assert {"mine", "layout", "write"} <= set(stages)
+
+    text = api_client.get("/metrics").text
+    assert "bpmn_generations_total 1\n" in text
+    assert 'bpmn_input_size_total{metric="events"} 3\n' in text
+    assert 'bpmn_input_size_total{metric="cases"} 2\n' in text
+    assert 'bpmn_stage_runs_total{stage="mine"} 1\n' in text
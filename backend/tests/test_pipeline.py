@@ -0,0 +1,106 @@
+import os
+import xml.etree.ElementTree as ET
+
+from constants import *
+from bpmn_index import BpmnIndex
+from pipeline import MODEL_CACHE, run_bpmn_generation_logic
+
+LOG = "\n".join(
+    [
+        "Case ID,Activity,Start Timestamp,Resource,Team",
+        "1,Register,2024-01-01 08:00:00,Clerk,Front",
+        "1,Check,2024-01-01 09:00:00,Manager,Back",
+        "1,Archive,2024-01-01 10:00:00,Clerk,Back",
+        "2,Register,2024-01-02 08:00:00,Clerk,Front",
+        "2,Archive,2024-01-02 09:00:00,Clerk,Back",
+    ]
+)
+
+
+def generate(output_bpmn_path, **parameters):
+    parameters = {
+        "case_id_field_name": "Case ID",
+        "activity_field_name": "Activity",
+        "timestamp_field_name": "Start Timestamp",
+        "role_field_name": "Resource",
+        "layout": LAYOUT_LAYERED,
+        **parameters,
+    }
+    return run_bpmn_generation_logic(
+        LOG.encode(), output_bpmn_path=str(output_bpmn_path), **parameters
+    )
+
+
+def test_generation_writes_only_the_diagram(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    generate(tmp_path / "log.bpmn")
+
+    # the mined model goes to the layout in memory, without temp files next to the output
+    assert os.listdir(tmp_path) == ["log.bpmn"]
+    index = BpmnIndex(ET.parse(tmp_path / "log.bpmn").getroot())
+    assert sorted(task.get("name") for task in index.tasks) == [
+        "Archive",
+        "Check",
+        "Register",
+    ]
+    assert all(index.get_shape(task.get("id")) is not None for task in index.tasks)
+    assert [lane.get("name") for lane in index.lane_set] == ["Clerk", "Manager"]
+
+
+def get_stage_names(report):
+    return [stage["name"] for stage in report["stages"]]
+
+
+def test_mined_model_is_reused_for_other_roles(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    MODEL_CACHE.create_directory()
+
+    first = generate(tmp_path / "resource.bpmn", model_cache_key="model")
+    assert "mine" in get_stage_names(first)
+    assert MODEL_CACHE.get("model") is not None
+
+    # only the lanes change, so the model is read from the cache instead of being mined
+    second = generate(
+        tmp_path / "team.bpmn", model_cache_key="model", role_field_name="Team"
+    )
+    assert "mine" not in get_stage_names(second)
+    index = BpmnIndex(ET.parse(tmp_path / "team.bpmn").getroot())
+    assert [lane.get("name") for lane in index.lane_set] == ["Front", "Back"]
+
+    first_index = BpmnIndex(ET.parse(tmp_path / "resource.bpmn").getroot())
+    assert [task.get("id") for task in index.tasks] == [
+        task.get("id") for task in first_index.tasks
+    ]
+
+
+def test_model_cache_key_ignores_the_role_field(tmp_path, monkeypatch):
+    # main creates its caches in the working directory when it is imported
+    monkeypatch.chdir(tmp_path)
+    from main import get_cache_keys
+
+    parameters = {
+        "role_field_name": "Resource",
+        "activity_field_name": "Activity",
+        "case_id_field_name": "Case ID",
+        "timestamp_field_name": "Start Timestamp",
+        "role_conflict_policy": DEFAULT_ROLE_CONFLICT_POLICY,
+        "lane_order": DEFAULT_LANE_ORDER,
+        "layout": LAYOUT_LAYERED,
+        "timestamp_format": None,
+        "miner": DEFAULT_MINER,
+        "noise_threshold": DEFAULT_NOISE_THRESHOLD,
+        "max_variants": None,
+        "variant_coverage": None,
+        "sample": None,
+        "sample_seed": 0,
+    }
+    cache_key, model_cache_key = get_cache_keys("digest", parameters)
+
+    for name, value in [("role_field_name", "Team"), ("lane_order", "name")]:
+        other_key, other_model_key = get_cache_keys(
+            "digest", {**parameters, name: value}
+        )
+        assert other_key != cache_key and other_model_key == model_cache_key
+    for name, value in [("miner", MINER_DFG), ("activity_field_name", "Task")]:
+        _, other_model_key = get_cache_keys("digest", {**parameters, name: value})
+        assert other_model_key != model_cache_key
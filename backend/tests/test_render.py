@@ -0,0 +1,124 @@
+import xml.etree.ElementTree as ET
+
+import pytest
+
+from constants import *
+from config import *
+from bpmn_index import BpmnIndex
+from geometry import GeometryStore
+from render import SVG_NAMESPACE, render_png, render_svg
+from pipeline import run_bpmn_generation_logic
+
+LOG = "\n".join(
+    [
+        "Case ID,Activity,Start Timestamp,Resource",
+        "1,Register,2024-01-01 08:00:00,Clerk",
+        "1,Check,2024-01-01 09:00:00,Manager",
+        "1,Archive,2024-01-01 10:00:00,Clerk",
+        "2,Register,2024-01-02 08:00:00,Clerk",
+        "2,Archive,2024-01-02 09:00:00,Clerk",
+    ]
+)
+
+
+def generate_diagram(tmp_path) -> GeometryStore:
+    bpmn_path = tmp_path / "diagram.bpmn"
+    run_bpmn_generation_logic(
+        LOG.encode(),
+        case_id_field_name="Case ID",
+        activity_field_name="Activity",
+        timestamp_field_name="Start Timestamp",
+        role_field_name="Resource",
+        output_bpmn_path=str(bpmn_path),
+        layout=LAYOUT_LAYERED,
+    )
+    return GeometryStore(BpmnIndex(ET.parse(bpmn_path).getroot()))
+
+
+def post_log(api_client) -> str:
+    response = api_client.post(
+        "/generate_bpmn/",
+        files={"csv_file": ("log.csv", LOG.encode(), "text/csv")},
+        data={"layout": LAYOUT_LAYERED},
+    )
+    assert response.status_code == 200
+    return response.json()["preview_url"].split("/")[-2]
+
+
+def test_svg_draws_every_shape_and_flow(tmp_path):
+    geometry = generate_diagram(tmp_path)
+    svg = ET.fromstring(render_svg(geometry.index, geometry))
+
+    assert svg.tag == f"{{{SVG_NAMESPACE}}}svg"
+    # the background, the lanes and the tasks are rectangles
+    kinds = [
+        geometry.index.get_element(bpmn_element).tag.split("}")[-1]
+        for bpmn_element in geometry.shapes
+    ]
+    shapes = len(svg.findall(f"{{{SVG_NAMESPACE}}}rect")) - 1
+    shapes += len(svg.findall(f"{{{SVG_NAMESPACE}}}polygon"))
+    shapes += len(svg.findall(f"{{{SVG_NAMESPACE}}}circle"))
+    assert shapes == len(kinds)
+    assert kinds.count("lane") == 2
+    assert len(svg.findall(f"{{{SVG_NAMESPACE}}}polyline")) == len(geometry.edges)
+
+    labels = {
+        "".join(span.text for span in text)
+        for text in svg.iter(f"{{{SVG_NAMESPACE}}}text")
+    }
+    assert {"Register", "Check", "Archive", "Clerk", "Manager"} <= labels
+
+
+def test_svg_view_box_contains_the_diagram(tmp_path):
+    geometry = generate_diagram(tmp_path)
+    svg = ET.fromstring(render_svg(geometry.index, geometry))
+
+    min_x, min_y, width, height = map(float, svg.get("viewBox").split())
+    for shape in geometry.shapes.values():
+        assert min_x <= shape.x and shape.x + shape.width <= min_x + width
+        assert min_y <= shape.y and shape.y + shape.height <= min_y + height
+
+
+def test_png_is_an_image(tmp_path):
+    Image = pytest.importorskip("PIL.Image")
+    geometry = generate_diagram(tmp_path)
+    png_path = tmp_path / "diagram.png"
+    png_path.write_bytes(render_png(geometry.index, geometry))
+
+    with Image.open(png_path) as image:
+        assert image.format == "PNG"
+        assert max(image.size) <= PREVIEW_PNG_MAX_SIDE
+
+
+def test_preview_is_served_as_svg(api_client):
+    cache_key = post_log(api_client)
+
+    response = api_client.get(f"/diagrams/{cache_key}/preview")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/svg+xml"
+    assert ET.fromstring(response.content).tag == f"{{{SVG_NAMESPACE}}}svg"
+
+
+def test_preview_is_served_as_png(api_client):
+    pytest.importorskip("PIL")
+    cache_key = post_log(api_client)
+
+    response = api_client.get(
+        f"/diagrams/{cache_key}/preview", params={"format": "png"}
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/png"
+    assert response.content.startswith(b"\x89PNG\r\n\x1a\n")
+
+
+def test_preview_of_unknown_diagram_is_not_found(api_client):
+    cache_key = post_log(api_client)
+
+    assert (
+        api_client.get(f"/diagrams/{'0' * len(cache_key)}/preview").status_code == 404
+    )
+    assert api_client.get("/diagrams/..%2Fmain.py/preview").status_code == 404
+    response = api_client.get(
+        f"/diagrams/{cache_key}/preview", params={"format": "pdf"}
+    )
+    assert response.status_code == 422
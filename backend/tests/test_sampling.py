@@ -0,0 +1,90 @@
+import pandas as pd
+import pytest
+
+import log_formats
+from constants import *
+from log_formats import read_log
+from sampling import make_case_sample
+
+
+def make_log(cases: int = 200) -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "case": [f"case {case}" for case in range(cases) for _ in range(3)],
+            "activity": ["Register", "Check", "Archive"] * cases,
+            "timestamp": ["2024-01-01 08:00", "2024-01-01 09:00", "2024-01-01 10:00"]
+            * cases,
+            "role": ["Clerk", "Manager", "Clerk"] * cases,
+        }
+    )
+
+
+def get_sampled_cases(sample, dataframe: pd.DataFrame):
+    return set(sample.finish(sample.filter(dataframe))["case"])
+
+
+@pytest.mark.parametrize("size", [0.25, 20])
+def test_sample_is_deterministic(size):
+    dataframe = make_log()
+    cases = get_sampled_cases(make_case_sample("case", size, seed=1), dataframe)
+
+    assert cases == get_sampled_cases(make_case_sample("case", size, seed=1), dataframe)
+    assert cases != get_sampled_cases(make_case_sample("case", size, seed=2), dataframe)
+    # the same cases are picked whatever the order of the events
+    shuffled = dataframe.sample(frac=1, random_state=0)
+    assert cases == get_sampled_cases(make_case_sample("case", size, seed=1), shuffled)
+
+
+def test_sample_keeps_whole_cases():
+    dataframe = make_log()
+    sample = make_case_sample("case", 20, seed=3)
+    sampled = sample.finish(sample.filter(dataframe))
+
+    assert sampled["case"].nunique() == 20
+    assert (sampled.groupby("case").size() == 3).all()
+    assert sample.describe() == {"cases": 20, "fraction": None, "seed": 3}
+
+
+def test_fraction_is_about_right():
+    sample = make_case_sample("case", 0.25)
+    cases = get_sampled_cases(sample, make_log(2000))
+
+    assert 400 < len(cases) < 600
+    assert sample.describe() == {"cases": None, "fraction": 0.25, "seed": 0}
+
+
+@pytest.mark.parametrize("size", [0.25, 20])
+def test_sample_does_not_depend_on_chunks(tmp_path, monkeypatch, size):
+    log_path = tmp_path / "log.csv"
+    make_log().to_csv(log_path, index=False)
+
+    whole = read_log(str(log_path), sample=make_case_sample("case", size))
+    # a number of cases is taken over all chunks, cases from early chunks can be dropped later
+    monkeypatch.setattr(log_formats, "SAMPLE_CHUNK_SIZE", 7)
+    chunked = read_log(str(log_path), sample=make_case_sample("case", size))
+
+    pd.testing.assert_frame_equal(
+        whole.reset_index(drop=True), chunked.reset_index(drop=True)
+    )
+
+
+def test_no_sample():
+    assert make_case_sample("case", None) is None
+
+
+def test_response_describes_the_sample(api_client):
+    response = api_client.post(
+        "/generate_bpmn/",
+        files={"csv_file": ("log.csv", make_log().to_csv(index=False).encode())},
+        data={
+            "case_id_field_name": "case",
+            "activity_field_name": "activity",
+            "timestamp_field_name": "timestamp",
+            "role_field_name": "role",
+            "layout": LAYOUT_LAYERED,
+            "sample": "5",
+            "sample_seed": "7",
+        },
+    )
+    assert response.status_code == 200
+    assert response.json()["sample"] == {"cases": 5, "fraction": None, "seed": 7}
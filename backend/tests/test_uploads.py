@@ -0,0 +1,63 @@
+import asyncio
+import hashlib
+import io
+import os
+
+from constants import *
+
+LOG = "\n".join(
+    [
+        "Case ID,Activity,Start Timestamp,Resource",
+        "1,Register,2024-01-01 08:00:00,Clerk",
+        "1,Check,2024-01-01 09:00:00,Manager",
+    ]
+).encode()
+
+
+def receive(content: bytes):
+    import main
+    from fastapi import UploadFile
+
+    upload = UploadFile(io.BytesIO(content), size=len(content), filename="log.csv")
+    return asyncio.run(main.receive_upload(upload))
+
+
+def test_small_upload_is_kept_in_memory(api_client, tmp_path):
+    log_source, log_digest = receive(LOG)
+
+    assert log_source == LOG
+    assert log_digest == hashlib.sha256(LOG).hexdigest()
+    assert not [name for name in os.listdir(tmp_path) if name.startswith("temp_")]
+
+
+def test_big_upload_goes_to_its_own_temp_file(api_client, monkeypatch):
+    import main
+
+    monkeypatch.setattr(main, "UPLOAD_MEMORY_LIMIT_BYTES", 0)
+    first_source, first_digest = receive(LOG)
+    second_source, second_digest = receive(LOG)
+
+    # uploads with the same file name do not share a temp file
+    assert first_source != second_source
+    assert first_digest == second_digest == hashlib.sha256(LOG).hexdigest()
+    with open(first_source, "rb") as log_file:
+        assert log_file.read() == LOG
+
+
+def test_temp_files_are_removed(api_client, tmp_path, monkeypatch):
+    import main
+
+    monkeypatch.setattr(main, "UPLOAD_MEMORY_LIMIT_BYTES", 0)
+    # the last log fails, its temp file is removed all the same
+    logs = [LOG, LOG + b"\n2,Register,2024-01-02 08:00:00,Clerk\n", b"a,b\n"]
+    statuses = [
+        api_client.post(
+            "/generate_bpmn/",
+            files={"csv_file": ("log.csv", content, "text/csv")},
+            data={"layout": LAYOUT_LAYERED},
+        ).status_code
+        for content in logs
+    ]
+
+    assert statuses == [200, 200, 422]
+    assert not [name for name in os.listdir(tmp_path) if name.startswith("temp_")]
@@ -0,0 +1,80 @@
+import asyncio
+
+import pytest
+
+from config import *
+from constants import *
+from workers import GenerationPool, PoolSaturatedError
+
+LOG = "\n".join(
+    [
+        "Case ID,Activity,Start Timestamp,Resource",
+        "1,Register,2024-01-01 08:00:00,Clerk",
+        "1,Check,2024-01-01 09:00:00,Manager",
+    ]
+)
+
+
+def test_pool_runs_functions_in_workers():
+    pool = GenerationPool(max_workers=1, max_queued=1)
+
+    async def run():
+        results = await asyncio.gather(pool.run(pow, 2, 10), pool.run(pow, 3, 2))
+        with pytest.raises(ValueError):
+            await pool.run(int, "not a number")
+        return results
+
+    try:
+        assert asyncio.run(run()) == [1024, 9]
+    finally:
+        pool.shutdown()
+    # failed runs give their place back
+    assert pool.pending == 0
+
+
+def test_saturated_pool_rejects_work():
+    pool = GenerationPool(max_workers=1, max_queued=1)
+
+    async def run():
+        # one running and one queued, the third one does not fit
+        running = [asyncio.create_task(pool.run(pow, 2, 10)) for _ in range(2)]
+        await asyncio.sleep(0)
+        assert pool.is_saturated()
+        with pytest.raises(PoolSaturatedError):
+            await pool.run(pow, 2, 10)
+        return await asyncio.gather(*running)
+
+    try:
+        assert asyncio.run(run()) == [1024, 1024]
+    finally:
+        pool.shutdown()
+    assert not pool.is_saturated()
+
+
+def post_log(api_client, path: str):
+    return api_client.post(
+        path,
+        files={"csv_file": ("log.csv", LOG.encode(), "text/csv")},
+        data={"layout": LAYOUT_LAYERED},
+    )
+
+
+def test_saturated_server_asks_to_retry(api_client, monkeypatch):
+    import main
+
+    assert post_log(api_client, "/generate_bpmn/").status_code == 200
+    monkeypatch.setattr(main.GENERATION_POOL, "pending", main.GENERATION_POOL.capacity)
+
+    for path in ["/jobs/", "/logs/log/events/"]:
+        response = post_log(api_client, path)
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == str(RETRY_AFTER_SECONDS)
+    # a cached diagram needs no worker, so it is still served
+    assert post_log(api_client, "/generate_bpmn/").status_code == 200
+    response = api_client.post(
+        "/generate_bpmn/",
+        files={"csv_file": ("log.csv", LOG.encode() + b"\n", "text/csv")},
+        data={"layout": LAYOUT_LAYERED},
+    )
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == str(RETRY_AFTER_SECONDS)
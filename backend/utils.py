@@ -3,61 +3,21 @@ import xml.etree.ElementTree as ET
 import pandas as pd
 
 from typing import Tuple, List, Union, Dict
+from pandas.api.types import union_categoricals
 from constants import *
 
 
-def get_most_top_left_position(root: ET.Element) -> Tuple[float, float]:
-    bpmn_plane = find_BPMN_plane(root)
-
-    x_positions = []
-    y_positions = []
-    for element in bpmn_plane.iter():
-        if element.tag.endswith("Bounds"):
-            x_positions.append(element.get("x"))
-            y_positions.append(element.get("y"))
-    x_positions = [float(x) for x in x_positions if x is not None]
-    y_positions = [float(y) for y in y_positions if y is not None]
-    return min(x_positions), min(y_positions)
-
-
-def get_most_top_right_position(root: ET.Element) -> Tuple[float, float]:
-    bpmn_plane = find_BPMN_plane(root)
-
-    x_positions = []
-    y_positions = []
-    for element in bpmn_plane.iter():
-        if element.tag.endswith("Bounds"):
-            x_positions.append(element.get("x"))
-            y_positions.append(element.get("y"))
-    x_positions = [float(x) for x in x_positions if x is not None]
-    y_positions = [float(y) for y in y_positions if y is not None]
-    return max(x_positions), min(y_positions)
-
-
-def get_lane_count(root: ET.Element) -> int:
-    bpmn_plane = find_BPMN_plane(root)
-
-    lane_count = 0
-    for element in bpmn_plane.iter():
-        if element.tag.endswith("BPMNShape") and element.get("id").startswith("Lane"):
-            lane_count += 1
-
-    return lane_count
-
-
-def add_lane_set(root: ET.Element, lane_set_name: str) -> ET.Element:
-    parent_process = find_bpmn_process(root)
+def add_lane_set(process: ET.Element, lane_set_name: str) -> ET.Element:
     return ET.SubElement(
-        parent_process,
+        process,
         f"{{{NS['bpmn']}}}laneSet",
         {"id": f"LaneSet_{lane_set_name}", "name": lane_set_name},
     )
 
 
-def add_lane(root: ET.Element, lane_name: str) -> ET.Element:
-    parent_lane_set = find_lane_set(root)
+def add_lane(lane_set: ET.Element, lane_name: str) -> ET.Element:
     return ET.SubElement(
-        parent_lane_set,
+        lane_set,
         f"{{{NS['bpmn']}}}lane",
         {
             "id": f"Lane_{lane_name}",
@@ -66,145 +26,184 @@ def add_lane(root: ET.Element, lane_name: str) -> ET.Element:
     )
 
 
-def add_lane_di(root: ET.Element, lane: ET.Element) -> Tuple[float, float, str]:
-    # since logic for calculating lane count is based on graphical elements,
-    # the count is queried before the creation of new graphical lane
-    lane_count = get_lane_count(root)
-
-    bpmn_plane = find_BPMN_plane(root)
+def add_lane_di(
+    plane: ET.Element, lane: ET.Element, x: float, y: float, width: float
+) -> ET.Element:
     shape = ET.SubElement(
-        bpmn_plane,
+        plane,
         f"{{{NS['bpmndi']}}}BPMNShape",
         {"id": f"{lane.get('id')}_di", "bpmnElement": f"{lane.get('id')}"},
     )
-
-    x, y = get_most_top_left_position(root)
-    LANE_WIDTH, _ = get_most_top_right_position(root)
-
-    # the width of the lane needs to be adjusted to the size of BPMN Diagram and extended a bit more to the right just to look better
-    LANE_WIDTH = LANE_WIDTH + INITIAL_LANE_HORIZONTAL_SHIFT_RIGHT
-    if lane_count == 0:
-        # first graphical lane needs to be shifted to the left and top - just for visualization purposes
-        x = x - INITIAL_LANE_HORIZONTAL_SHIFT_LEFT
-        y = y - INITIAL_LANE_VERTICAL_SHIFT
-    else:
-        # new lanes needs to be placed lower to avoid overlapping with previously created ones
-        y = y + lane_count * LANE_HEIGHT
-
-    bounds = ET.SubElement(
-        shape,
-        f"{{{NS['omgdc']}}}Bounds",
-        {
-            "x": str(x),
-            "y": str(y),
-            "width": str(LANE_WIDTH),
-            "height": str(LANE_HEIGHT),
-        },
-    )
-
-    return x, y, lane.get("id")
-
-
-# unique fields are process or laneSet or BPMNPlane and possibly few more
-def find_unique_field(root: ET.Element, suffix: str) -> Union[ET.Element, None]:
-    for element in root.iter():
-        if element.tag.endswith(suffix):
-            return element
-    return None
-
-
-def find_bpmn_process(root: ET.Element) -> Union[ET.Element, None]:
-    return find_unique_field(root, "process")
-
-
-def find_bpmn_start_event(root: ET.Element) -> Union[ET.Element, None]:
-    return find_unique_field(root, "startEvent")
-
-
-def find_bpmn_end_event(root: ET.Element) -> Union[ET.Element, None]:
-    return find_unique_field(root, "endEvent")
-
-
-def find_lane_set(root: ET.Element) -> Union[ET.Element, None]:
-    return find_unique_field(root, "laneSet")
-
-
-def find_BPMN_plane(root: ET.Element) -> Union[ET.Element, None]:
-    return find_unique_field(root, "BPMNPlane")
-
-
-def find_element_by_id(root: ET.Element, id: str) -> Union[ET.Element, None]:
-    for element in root.iter():
-        if element.get("id") == id:
-            return element
-    return None
-
-
-def find_bpmn_shape_by_bpmn_element(
-    root: ET.Element, bpmn_element: str
-) -> Union[ET.Element, None]:
-    bpmn_plane = find_BPMN_plane(root)
-    for element in bpmn_plane.iter():
-        if (
-            element.tag.endswith("BPMNShape")
-            and element.get("bpmnElement") == bpmn_element
-        ):
-            return element
-
-    return None
-
-
-def find_bpmn_edge_by_bpmn_element(
-    root: ET.Element, bpmn_element: str
-) -> Union[ET.Element, None]:
-    bpmn_plane = find_BPMN_plane(root)
-    for element in bpmn_plane.iter():
-
-        if (
-            element.tag.endswith("BPMNEdge")
-            and element.get("bpmnElement") == bpmn_element
-        ):
-            return element
-
-    return None
-
-
-def find_all_incoming_waypoints_for_task(task: ET.Element) -> List[str]:
-    list_of_ids_of_sequence_flow = []
-    for element in task.iter():
-        if element.tag.endswith("incoming"):
-            list_of_ids_of_sequence_flow.append(element.text)
-    return list_of_ids_of_sequence_flow
-
-
-def find_all_outgoing_waypoints_for_task(task: ET.Element) -> List[str]:
-    list_of_ids_of_sequence_flow = []
-    for element in task.iter():
-        if element.tag.endswith("outgoing"):
-            list_of_ids_of_sequence_flow.append(element.text)
-    return list_of_ids_of_sequence_flow
-
-
-def get_all_tasks(root: ET.Element) -> List[ET.Element]:
-    tasks = []
-    for element in root.iter():
-        if element.tag.endswith("task"):
-            tasks.append(element)
-    return tasks
+    create_bounds_element(shape, x, y, width, LANE_HEIGHT)
+    return shape
+
+
+class LogFormatError(ValueError):
+    pass
+
+
+def concat_chunks(chunks: List[pd.DataFrame]) -> pd.DataFrame:
+    if len(chunks) == 0:
+        raise LogFormatError("Log has no events")
+    # chunks get their own categories, which would make pd.concat fall back to object columns
+    categorical_columns = [
+        column
+        for column in chunks[0].columns
+        if isinstance(chunks[0][column].dtype, pd.CategoricalDtype)
+    ]
+    dataframe = pd.concat(chunks, ignore_index=True)
+    for column in categorical_columns:
+        dataframe[column] = union_categoricals(
+            [chunk[column] for chunk in chunks], ignore_order=True
+        )
+    return dataframe
+
+
+def parse_timestamp_column(
+    column: pd.Series, timestamp_format: Union[str, None] = None
+) -> pd.Series:
+    if timestamp_format is not None:
+        try:
+            return pd.to_datetime(column, format=timestamp_format, utc=True)
+        except ValueError as e:
+            raise LogFormatError(
+                f"Column '{column.name}' does not match timestamp format '{timestamp_format}'"
+            ) from e
+    try:
+        # pandas infers the format from the first value and applies it to the whole column
+        return pd.to_datetime(column, utc=True)
+    except (ValueError, TypeError):
+        pass
+    try:
+        # when the values do not share one format, every value is parsed on its own, which is slower
+        return pd.to_datetime(column, format="mixed", utc=True)
+    except (ValueError, TypeError) as e:
+        raise LogFormatError(
+            f"Column '{column.name}' contains values that are not timestamps"
+        ) from e
+
+
+class TaskRoleConflictError(ValueError):
+    def __init__(self, conflicts: Dict[str, List[str]]):
+        self.conflicts = conflicts
+        details = "; ".join(
+            f"{task}: {', '.join(roles)}" for task, roles in conflicts.items()
+        )
+        super().__init__(f"Activities performed by more than one role - {details}")
+
+    def __reduce__(self):
+        # needed to pass the error back from a worker process
+        return (TaskRoleConflictError, (self.conflicts,))
+
+
+def get_task_role_events(
+    dataframe: pd.DataFrame, task_field_name: str, role_field_name: str
+) -> pd.DataFrame:
+    # columns are renamed, since the same log column may be used as both the task and the role
+    return pd.DataFrame(
+        {"task": dataframe[task_field_name], "role": dataframe[role_field_name]}
+    ).dropna()
+
+
+def count_task_roles(
+    dataframe: pd.DataFrame,
+    task_field_name: str = "Activity",
+    role_field_name: str = "Role",
+) -> pd.Series:
+    # number of events for every (task, role) pair, in order of first appearance in the log
+    events = get_task_role_events(dataframe, task_field_name, role_field_name)
+    counts = events.groupby(["task", "role"], sort=False, observed=True).size()
+    # space is not allowed within BPMN or xml fields, that is why spaces are replaced with underscores;
+    # it is done on the unique pairs only, which may merge roles differing just by spaces and underscores
+    tasks = counts.index.get_level_values(0)
+    roles = counts.index.get_level_values(1).astype(str).str.replace(" ", "_")
+    return counts.groupby([tasks, roles], sort=False, observed=True).sum()
+
+
+def get_role_activity_counts(
+    dataframe: pd.DataFrame,
+    task_field_name: str = "Activity",
+    role_field_name: str = "Role",
+) -> Dict[str, Dict[str, int]]:
+    role_activity_counts = {}
+    counts = count_task_roles(dataframe, task_field_name, role_field_name)
+    for (task, role), count in counts.items():
+        role_activity_counts.setdefault(role, {})[task] = int(count)
+    return role_activity_counts
 
 
 def get_task_role_map(
     dataframe: pd.DataFrame,
     task_field_name: str = "Activity",
     role_field_name: str = "Role",
+    conflict_policy: str = DEFAULT_ROLE_CONFLICT_POLICY,
 ) -> Dict[str, str]:
-    task_to_role = {}
-    for _, data in dataframe.iterrows():
-        # space is not allowed within BPMN or xml fields, that is why spaces are replaced with underscores
-        role_name = data[role_field_name].replace(" ", "_")
-        task_to_role[data[task_field_name]] = role_name
-
-    return task_to_role
+    if conflict_policy not in ROLE_CONFLICT_POLICIES:
+        raise ValueError(
+            f"Unknown role conflict policy '{conflict_policy}', expected one of {ROLE_CONFLICT_POLICIES}"
+        )
+
+    if conflict_policy == "most_frequent":
+        counts = count_task_roles(dataframe, task_field_name, role_field_name)
+        most_frequent = counts[
+            counts
+            == counts.groupby(level=0, sort=False, observed=True).transform("max")
+        ]
+        # on a tie the role that shows up first in the log wins
+        most_frequent = most_frequent[
+            ~most_frequent.index.get_level_values(0).duplicated()
+        ]
+        return {task: role for task, role in most_frequent.index}
+
+    if conflict_policy == "report":
+        counts = count_task_roles(dataframe, task_field_name, role_field_name)
+        tasks = counts.index.get_level_values(0)
+        conflicting = counts[tasks.duplicated(keep=False)]
+        if len(conflicting) > 0:
+            conflicts = {}
+            for task, role in conflicting.index:
+                conflicts.setdefault(task, []).append(role)
+            raise TaskRoleConflictError(conflicts)
+
+    events = get_task_role_events(dataframe, task_field_name, role_field_name)
+    last_events = events.drop_duplicates(subset="task", keep="last")
+    roles = last_events["role"].astype(str).str.replace(" ", "_", regex=False)
+    task_to_last_role = dict(zip(last_events["task"], roles))
+
+    # tasks are kept in order of their first appearance in the log
+    return {task: task_to_last_role[task] for task in events["task"].drop_duplicates()}
+
+
+def get_role_event_counts(
+    dataframe: pd.DataFrame,
+    task_field_name: str = "Activity",
+    role_field_name: str = "Role",
+) -> Dict[str, int]:
+    return {
+        role: sum(task_counts.values())
+        for role, task_counts in get_role_activity_counts(
+            dataframe, task_field_name, role_field_name
+        ).items()
+    }
+
+
+def get_lane_roles(
+    task_to_role: Dict[str, str],
+    lane_order: str = DEFAULT_LANE_ORDER,
+    role_event_counts: Union[Dict[str, int], None] = None,
+) -> List[str]:
+    # roles of the lanes from top to bottom; sorting is stable, so ties keep the order of appearance
+    if lane_order not in LANE_ORDERS:
+        raise ValueError(
+            f"Unknown lane order '{lane_order}', expected one of {LANE_ORDERS}"
+        )
+
+    roles = list(dict.fromkeys(task_to_role.values()))
+    if lane_order == "name":
+        return sorted(roles)
+    if lane_order == "frequency":
+        return sorted(roles, key=lambda role: -role_event_counts.get(role, 0))
+    return roles
 
 
 def create_bounds_element(
@@ -0,0 +1,49 @@
+import asyncio
+import functools
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Union
+
+
+class PoolSaturatedError(Exception):
+    pass
+
+
+class GenerationPool:
+    # at most max_workers generations run at once and at most max_queued wait for a free worker,
+    # anything above that is rejected right away instead of piling up behind the others
+    def __init__(self, max_workers: int, max_queued: int):
+        self.max_workers = max_workers
+        self.capacity = max_workers + max_queued
+        self.pending = 0
+        self.executor: Union[ProcessPoolExecutor, None] = None
+
+    def start(self) -> None:
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers=self.max_workers)
+
+    def shutdown(self) -> None:
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    def is_saturated(self) -> bool:
+        return self.pending >= self.capacity
+
+    def describe(self) -> str:
+        return f"All {self.max_workers} workers are busy and the queue is full"
+
+    async def run(self, function: Callable, *args, **kwargs) -> Any:
+        # the counter is only touched from the event loop, so it needs no lock
+        if self.is_saturated():
+            raise PoolSaturatedError(self.describe())
+
+        self.start()
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self.executor, functools.partial(function, *args, **kwargs)
+            )
+        finally:
+            self.pending -= 1
@@ -2,6 +2,9 @@ import React, { useState } from 'react';
 import { useNavigate } from 'react-router-dom';
 import './LogUploadPage.css'; // Import the CSS file
 
+// the backend detects the format from the file content, the extensions only filter the file picker
+const LOG_FILE_EXTENSIONS = ['.csv', '.csv.gz', '.csv.zst', '.parquet', '.feather', '.arrow', '.xes', '.xes.gz'];
+
 function LogUploadPage() {
   const [selectedFile, setSelectedFile] = useState(null);
   const [isLoading, setIsLoading] = useState(false);
@@ -15,12 +18,12 @@ function LogUploadPage() {
 
   const handleFileChange = (event) => {
     const file = event.target.files[0];
-    if (file && file.type === 'text/csv') {
+    if (file && LOG_FILE_EXTENSIONS.some((extension) => file.name.toLowerCase().endsWith(extension))) {
       setSelectedFile(file);
       setError(null);
     } else {
       setSelectedFile(null);
-      alert('Please select a CSV file.');
+      alert('Please select a CSV, Parquet, Feather or XES file.');
     }
   };
 
@@ -77,8 +80,8 @@ function LogUploadPage() {
       <h2>Upload Log CSV File & Configure Parameters</h2>
       
       <div className="input-group">
-        <label htmlFor="csvFile" className="label">CSV File:</label>
-        <input id="csvFile" type="file" accept=".csv" onChange={handleFileChange} className="file-input-field" />
+        <label htmlFor="csvFile" className="label">Log File:</label>
+        <input id="csvFile" type="file" accept={LOG_FILE_EXTENSIONS.join(',')} onChange={handleFileChange} className="file-input-field" />
       </div>
 
       <fieldset className="config-fieldset">